@@ -4,6 +4,7 @@ from sqlalchemy import select
 from app.db.session import get_db
 from app.db.models import User, Account, Task
 from app.services.calendar_service import calendar_service
+from app.services.response_cache import response_cache
 from datetime import datetime, timedelta
 from typing import Optional
 
@@ -33,11 +34,7 @@ async def get_calendar_events(
         
         if account and account.access_token and account.refresh_token:
             try:
-                calendar_events = calendar_service.list_upcoming_events(
-                    account.access_token,
-                    account.refresh_token,
-                    days=days
-                )
+                calendar_events = await calendar_service.list_upcoming_events(account, days=days)
                 
                 for event in calendar_events[:limit]:
                     start = event.get('start', {}).get('dateTime') or event.get('start', {}).get('date')
@@ -136,15 +133,15 @@ async def create_calendar_event(
         if not account or not account.access_token or not account.refresh_token:
             raise HTTPException(status_code=404, detail="Account not found or not connected")
         
-        event = calendar_service.create_event(
-            account.access_token,
-            account.refresh_token,
+        event = await calendar_service.create_event(
+            account,
             summary,
             start_time,
             end_time,
             description or "Created by Kyra"
         )
         
+        response_cache.invalidate_user(user.id, "calendar event created")
         return {"status": "created", "event": event}
         
     except HTTPException:
@@ -175,9 +172,8 @@ async def check_conflicts(
         if not account or not account.access_token or not account.refresh_token:
             raise HTTPException(status_code=404, detail="Account not found or not connected")
         
-        conflicts = calendar_service.check_conflicts(
-            account.access_token,
-            account.refresh_token,
+        conflicts = await calendar_service.check_conflicts(
+            account,
             start_time,
             end_time
         )
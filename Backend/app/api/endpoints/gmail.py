@@ -2,7 +2,10 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.session import get_db
 from app.services.draft_service import draft_service
-from app.services.gmail import gmail_service
+from app.services.gmail_async import async_gmail_service
+from app.services.google_clients import google_clients
+from app.services.job_queue import job_queue
+from app.services.response_cache import response_cache
 from app.db.models import Account
 from sqlalchemy import select, desc
 from pydantic import BaseModel
@@ -23,6 +26,36 @@ class SendRequest(BaseModel):
     body: str
     thread_id: Optional[str] = None
 
+@router.get("/sync", status_code=202)
+async def sync_emails(email: str, db: AsyncSession = Depends(get_db)):
+    """
+    Queue a background sync for a user email.
+    Returns immediately with a job id; poll /sync/jobs/{job_id} for the result.
+    Repeated calls while a sync for the account is still pending return the same job.
+    """
+    result = await db.execute(select(Account).where(Account.email_address == email))
+    account = result.scalars().first()
+    
+    if not account:
+        raise HTTPException(status_code=404, detail="Account not found")
+    
+    job = await job_queue.enqueue(
+        "gmail_sync",
+        {"account_id": str(account.id)},
+        key=f"gmail_sync:{account.id}"
+    )
+    return {"job_id": job.id, "status": job.status}
+
+@router.get("/sync/jobs/{job_id}")
+async def get_sync_job(job_id: str):
+    """
+    Get the status (and result, once finished) of a sync job.
+    """
+    job = await job_queue.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
 @router.post("/draft")
 async def generate_draft_endpoint(request: DraftRequest, db: AsyncSession = Depends(get_db)):
     """
@@ -50,22 +83,9 @@ async def send_email_endpoint(request: SendRequest, db: AsyncSession = Depends(g
         raise HTTPException(status_code=404, detail="Account not found")
 
     try:
-        from google.oauth2.credentials import Credentials
-        from app.core.config import settings
-        from app.services.gmail import SCOPES
-        
-        creds = Credentials(
-            token=account.access_token,
-            refresh_token=account.refresh_token,
-            token_uri="https://oauth2.googleapis.com/token",
-            client_id=settings.GOOGLE_CLIENT_ID,
-            client_secret=settings.GOOGLE_CLIENT_SECRET,
-            scopes=SCOPES
-        )
-        
-        service = gmail_service.build_service(creds)
+        service = await google_clients.gmail_session(account)
         
-        sent_msg = gmail_service.send_email(
+        sent_msg = await async_gmail_service.send_email(
             service, 
             request.recipient, 
             request.subject, 
@@ -90,10 +110,23 @@ async def list_messages(
     """
     List emails from the database.
     """
-    from app.db.models import Email
+    from app.db.models import Email, SenderProfile
+    from app.services.sender_profiles import sender_profile_service, sender_address_sql
+    from sqlalchemy import and_, func
     
-    # Simple query ordering by Importance, then Date
-    query = select(Email).order_by(desc(Email.importance_score), desc(Email.received_at))
+    # Page by Importance (plus the sender boost, so order is stable across pages), then Date
+    query = (
+        select(Email)
+        .outerjoin(Account, Email.account_id == Account.id)
+        .outerjoin(SenderProfile, and_(
+            SenderProfile.user_id == Account.user_id,
+            SenderProfile.sender == sender_address_sql(Email.sender)
+        ))
+        .order_by(
+            desc(func.coalesce(Email.importance_score, 0) + sender_profile_service.rank_boost_sql()),
+            desc(Email.received_at)
+        )
+    )
     
     if category and category != 'All':
         query = query.where(Email.category == category)
@@ -207,6 +240,7 @@ async def mark_email_as_read(
         email.is_read = True
         await db.commit()
         await db.refresh(email)
+        response_cache.invalidate_accounts([email.account_id], "email read state")
         
         return {"status": "marked_as_read", "id": str(email.id)}
     except HTTPException:
@@ -0,0 +1,54 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from app.db.session import get_db
+from app.db.models import User
+from app.core.permissions import accessible_account_ids
+from app.schemas.search import SearchResponse, SearchResult
+from app.services.search_service import search_service, SEARCH_MODES
+
+router = APIRouter()
+
+@router.get("/", response_model=SearchResponse)
+async def search_emails(
+    q: str,
+    email: str,
+    mode: str = "hybrid",
+    limit: int = Query(10, ge=1, le=50),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Search the user's emails and attachments.
+    mode=lexical is the fast path (full-text only, no embedding call);
+    mode=hybrid fuses full-text and vector results; mode=semantic is vector only.
+    """
+    if mode not in SEARCH_MODES:
+        raise HTTPException(status_code=422, detail=f"mode must be one of {', '.join(SEARCH_MODES)}")
+    
+    result = await db.execute(select(User).where(User.email == email))
+    user = result.scalars().first()
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    account_ids = await accessible_account_ids(user.id, db)
+    hits = await search_service.search(db, q, account_ids, limit=limit, mode=mode, caller=f"search:{user.id}")
+    
+    return SearchResponse(
+        query=q,
+        mode=mode,
+        results=[
+            SearchResult(
+                id=hit.email.id,
+                gmail_id=hit.email.gmail_id,
+                thread_id=hit.email.thread_id,
+                subject=hit.email.subject,
+                sender=hit.email.sender,
+                received_at=hit.email.received_at,
+                snippet=(hit.email.body_plain or "")[:200],
+                attachments=[a.filename for a in hit.email.attachments],
+                score=hit.score,
+                matched=hit.matched
+            )
+            for hit in hits
+        ]
+    )
@@ -3,6 +3,8 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, desc
 from app.db.session import get_db
 from app.db.models import Task, User
+from app.services.response_cache import response_cache
+import uuid
 
 router = APIRouter()
 
@@ -37,3 +39,25 @@ async def list_tasks(email: str, db: AsyncSession = Depends(get_db)):
     except Exception as e:
         print(f"Error fetching tasks: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+
+TASK_STATUSES = ("pending", "done", "dismissed")
+
+@router.patch("/{task_id}/status")
+async def update_task_status(task_id: str, status: str, db: AsyncSession = Depends(get_db)):
+    """
+    Set a task's status (pending, done or dismissed).
+    """
+    if status not in TASK_STATUSES:
+        raise HTTPException(status_code=400, detail=f"Status must be one of {', '.join(TASK_STATUSES)}")
+    try:
+        task = await db.get(Task, uuid.UUID(task_id))
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Task not found")
+    if not task:
+        raise HTTPException(status_code=404, detail="Task not found")
+
+    task.status = status
+    await db.commit()
+    # Cached chat answers about pending work are now stale
+    response_cache.invalidate_user(task.user_id, "task status changed")
+    return {"id": str(task.id), "status": task.status}
@@ -1,8 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.db.session import get_db
+from app.db.session import get_db, AsyncSessionLocal
 from app.schemas.chat import ChatRequest, ChatResponse
 from app.services.chat_service import chat_service
+import json
 import logging
 
 router = APIRouter()
@@ -28,9 +30,43 @@ async def chat_endpoint(
             query=request.query,
             user_id=user_id,
             conversation_id=request.conversation_id,
-            db=db
+            db=db,
+            use_cache=not request.no_cache
         )
         return response
     except Exception as e:
         logger.error(f"Error in chat endpoint: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@router.post("/stream")
+async def chat_stream_endpoint(request: ChatRequest):
+    """
+    Chat with the agent, streamed as Server-Sent Events:
+    `sources` (retrieved email subjects) first, then `token` events as the answer is
+    generated, then `done`. An `error` event replaces `done` if the turn fails.
+    """
+    async def events():
+        # The stream outlives the request scope, so it owns its session
+        async with AsyncSessionLocal() as db:
+            try:
+                async for event, data in chat_service.stream_response(
+                    query=request.query,
+                    user_id=request.user_id,
+                    conversation_id=request.conversation_id,
+                    db=db,
+                    use_cache=not request.no_cache
+                ):
+                    yield sse_event(event, data)
+            except Exception as e:
+                logger.error(f"Error in chat stream: {e}")
+                yield sse_event("error", {"detail": str(e)})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # No caching or proxy buffering, or the tokens arrive all at once
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
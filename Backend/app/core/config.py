@@ -1,4 +1,5 @@
 import os
+import json
 from pydantic_settings import BaseSettings
 from dotenv import load_dotenv
 
@@ -16,9 +17,158 @@ class Settings(BaseSettings):
     GOOGLE_CLIENT_SECRET: str = os.getenv("GOOGLE_CLIENT_SECRET")
     GOOGLE_REDIRECT_URI: str = os.getenv("GOOGLE_REDIRECT_URI", "http://localhost:8000/api/v1/auth/callback")
     
+    # GOOGLE API CLIENTS
+    GOOGLE_CLIENT_CACHE_SIZE: int = int(os.getenv("GOOGLE_CLIENT_CACHE_SIZE", "256"))
+    # Access tokens are refreshed only when they expire within this window
+    GOOGLE_TOKEN_REFRESH_MARGIN_SECONDS: int = int(os.getenv("GOOGLE_TOKEN_REFRESH_MARGIN_SECONDS", "300"))
+    
+    # GMAIL SYNC
+    # Upper bound on messages fetched when no usable historyId exists (first sync or expired history)
+    GMAIL_FULL_SYNC_LIMIT: int = int(os.getenv("GMAIL_FULL_SYNC_LIMIT", "50"))
+    
+    # GMAIL HTTP CLIENT (pooled async client shared by all accounts)
+    GMAIL_API_BASE_URL: str = os.getenv("GMAIL_API_BASE_URL", "https://gmail.googleapis.com/gmail/v1")
+    GMAIL_HTTP_TIMEOUT_SECONDS: float = float(os.getenv("GMAIL_HTTP_TIMEOUT_SECONDS", "30"))
+    GMAIL_HTTP_MAX_CONNECTIONS: int = int(os.getenv("GMAIL_HTTP_MAX_CONNECTIONS", "50"))
+    GMAIL_MAX_CONCURRENT_GETS: int = int(os.getenv("GMAIL_MAX_CONCURRENT_GETS", "25"))
+    
+    # GMAIL QUOTA (per-user limit is 250 units/s; messages.get costs 5)
+    GMAIL_QUOTA_UNITS_PER_SECOND: float = float(os.getenv("GMAIL_QUOTA_UNITS_PER_SECOND", "200"))
+    GMAIL_QUOTA_BURST_UNITS: float = float(os.getenv("GMAIL_QUOTA_BURST_UNITS", "250"))
+    GMAIL_INITIAL_BATCH_SIZE: int = int(os.getenv("GMAIL_INITIAL_BATCH_SIZE", "10"))
+    GMAIL_MAX_RETRIES: int = int(os.getenv("GMAIL_MAX_RETRIES", "4"))
+    GMAIL_BACKOFF_BASE_SECONDS: float = float(os.getenv("GMAIL_BACKOFF_BASE_SECONDS", "1"))
+    GMAIL_BACKOFF_MAX_SECONDS: float = float(os.getenv("GMAIL_BACKOFF_MAX_SECONDS", "32"))
+    
+    # BACKGROUND JOBS
+    # Empty REDIS_URL uses the in-process broker (single API process, tests)
+    REDIS_URL: str = os.getenv("REDIS_URL", "")
+    SYNC_WORKERS: int = int(os.getenv("SYNC_WORKERS", "2"))
+    JOB_MAX_ATTEMPTS: int = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+    JOB_RETRY_BASE_SECONDS: float = float(os.getenv("JOB_RETRY_BASE_SECONDS", "5"))
+    JOB_KEY_TTL_SECONDS: int = int(os.getenv("JOB_KEY_TTL_SECONDS", "3600"))
+    JOB_RESULT_TTL_SECONDS: int = int(os.getenv("JOB_RESULT_TTL_SECONDS", "86400"))
+    
+    # INGESTION PIPELINE (workers per stage, bounded queue between stages)
+    PIPELINE_QUEUE_SIZE: int = int(os.getenv("PIPELINE_QUEUE_SIZE", "100"))
+    PIPELINE_FETCH_CONCURRENCY: int = int(os.getenv("PIPELINE_FETCH_CONCURRENCY", "2"))
+    PIPELINE_FETCH_BATCH_SIZE: int = int(os.getenv("PIPELINE_FETCH_BATCH_SIZE", "10"))
+    PIPELINE_PARSE_CONCURRENCY: int = int(os.getenv("PIPELINE_PARSE_CONCURRENCY", "2"))
+    PIPELINE_CLASSIFY_CONCURRENCY: int = int(os.getenv("PIPELINE_CLASSIFY_CONCURRENCY", "2"))
+    PIPELINE_CLASSIFY_BATCH_SIZE: int = int(os.getenv("PIPELINE_CLASSIFY_BATCH_SIZE", "25"))
+    PIPELINE_TASK_CONCURRENCY: int = int(os.getenv("PIPELINE_TASK_CONCURRENCY", "4"))
+    PIPELINE_ATTACHMENT_CONCURRENCY: int = int(os.getenv("PIPELINE_ATTACHMENT_CONCURRENCY", "4"))
+    PIPELINE_EMBED_CONCURRENCY: int = int(os.getenv("PIPELINE_EMBED_CONCURRENCY", "2"))
+    PIPELINE_EMBED_BATCH_SIZE: int = int(os.getenv("PIPELINE_EMBED_BATCH_SIZE", "50"))
+    PIPELINE_CHUNK_CONCURRENCY: int = int(os.getenv("PIPELINE_CHUNK_CONCURRENCY", "2"))
+    PIPELINE_SUMMARIZE_CONCURRENCY: int = int(os.getenv("PIPELINE_SUMMARIZE_CONCURRENCY", "2"))
+    
     # GEMINI
     GEMINI_API_KEY: str = os.getenv("GEMINI_API_KEY")
     
+    # LLM GATEWAY (shared by every Gemini call in this process)
+    LLM_MAX_IN_FLIGHT: int = int(os.getenv("LLM_MAX_IN_FLIGHT", "8"))
+    LLM_DEFAULT_RPM: float = float(os.getenv("LLM_DEFAULT_RPM", "1000"))
+    LLM_DEFAULT_TPM: float = float(os.getenv("LLM_DEFAULT_TPM", "1000000"))
+    # Per-model overrides, e.g. {"gemini-2.0-flash": {"rpm": 2000, "tpm": 4000000}}
+    LLM_MODEL_LIMITS: dict = json.loads(os.getenv("LLM_MODEL_LIMITS", json.dumps({
+        "gemini-2.0-flash": {"rpm": 2000, "tpm": 4000000},
+        "text-embedding-004": {"rpm": 1500, "tpm": 1000000}
+    })))
+    
+    # PRE-CLASSIFIER (rules + sender history decide clear-cut emails without the LLM)
+    PRECLASSIFIER_ENABLED: bool = os.getenv("PRECLASSIFIER_ENABLED", "true").lower() == "true"
+    PRECLASSIFIER_MIN_CONFIDENCE: float = float(os.getenv("PRECLASSIFIER_MIN_CONFIDENCE", "0.85"))
+    # A sender's past scores count once it has this many classified emails within this standard deviation
+    PRECLASSIFIER_HISTORY_MIN_EMAILS: int = int(os.getenv("PRECLASSIFIER_HISTORY_MIN_EMAILS", "5"))
+    PRECLASSIFIER_HISTORY_MAX_SPREAD: float = float(os.getenv("PRECLASSIFIER_HISTORY_MAX_SPREAD", "10"))
+    # Share of locally decided emails also sent to the LLM to measure agreement
+    PRECLASSIFIER_AUDIT_RATE: float = float(os.getenv("PRECLASSIFIER_AUDIT_RATE", "0.05"))
+
+    # SENDER PROFILES (per-user sender reputation, updated on ingest and on interactions)
+    # Engagement and archive rates weigh recent behaviour; older activity halves every N days
+    SENDER_PROFILE_HALF_LIFE_DAYS: float = float(os.getenv("SENDER_PROFILE_HALF_LIFE_DAYS", "30"))
+    # Profiles with fewer emails than this do not affect ranking or the pre-classifier's engagement signals
+    SENDER_PROFILE_MIN_EMAILS: int = int(os.getenv("SENDER_PROFILE_MIN_EMAILS", "5"))
+    # Ranking points for a sender the user always engages with (negative for one always archived)
+    SENDER_RANK_BOOST: float = float(os.getenv("SENDER_RANK_BOOST", "10"))
+
+    # NEAR-DUPLICATES (automated mail reuses the result of a recent near-identical email)
+    NEAR_DUP_ENABLED: bool = os.getenv("NEAR_DUP_ENABLED", "true").lower() == "true"
+    # SimHash bits (of 64) that may differ; digit runs are masked before hashing
+    NEAR_DUP_MAX_DISTANCE: int = int(os.getenv("NEAR_DUP_MAX_DISTANCE", "3"))
+    NEAR_DUP_WINDOW_DAYS: int = int(os.getenv("NEAR_DUP_WINDOW_DAYS", "30"))
+    # Shorter texts are not fingerprinted
+    NEAR_DUP_MIN_TOKENS: int = int(os.getenv("NEAR_DUP_MIN_TOKENS", "8"))
+    NEAR_DUP_MAX_CANDIDATES: int = int(os.getenv("NEAR_DUP_MAX_CANDIDATES", "500"))
+
+    # BATCHED GENERATION (classification / task detection prompts packed per request)
+    LLM_BATCH_MAX_ITEMS: int = int(os.getenv("LLM_BATCH_MAX_ITEMS", "25"))
+    LLM_BATCH_MAX_TOKENS: int = int(os.getenv("LLM_BATCH_MAX_TOKENS", "12000"))
+    # Items missing or invalid in a JSON answer are asked for again up to N times (see schemas/llm.py)
+    LLM_OUTPUT_MAX_RETRIES: int = int(os.getenv("LLM_OUTPUT_MAX_RETRIES", "2"))
+    # Body characters sent per email for task extraction
+    TASK_BODY_CHARS: int = int(os.getenv("TASK_BODY_CHARS", "2000"))
+    # Emails scoring at least this are checked for tasks
+    TASK_DETECT_MIN_SCORE: int = int(os.getenv("TASK_DETECT_MIN_SCORE", "30"))
+    # Extract tasks in the classification call instead of a separate task-detection call
+    SYNC_TASKS_IN_CLASSIFY: bool = os.getenv("SYNC_TASKS_IN_CLASSIFY", "true").lower() == "true"
+    
+    # EMBEDDINGS (texts packed per embed_content request)
+    EMBED_BATCH_MAX_ITEMS: int = int(os.getenv("EMBED_BATCH_MAX_ITEMS", "100"))
+    EMBED_BATCH_MAX_TOKENS: int = int(os.getenv("EMBED_BATCH_MAX_TOKENS", "20000"))
+    EMBED_MAX_CHARS_PER_TEXT: int = int(os.getenv("EMBED_MAX_CHARS_PER_TEXT", "8200"))
+    # Embedding cache: in-process LRU entries, backed by the embedding_cache table
+    EMBED_CACHE_LRU_SIZE: int = int(os.getenv("EMBED_CACHE_LRU_SIZE", "5000"))
+    EMBED_CACHE_PERSIST: bool = os.getenv("EMBED_CACHE_PERSIST", "true").lower() == "true"
+    # Backfill reads and commits this many emails at a time, with up to N chunks in flight
+    BACKFILL_CHUNK_SIZE: int = int(os.getenv("BACKFILL_CHUNK_SIZE", "200"))
+    BACKFILL_PARALLELISM: int = int(os.getenv("BACKFILL_PARALLELISM", "2"))
+    
+    # VECTOR SEARCH (HNSW on emails.embedding; see migrate_add_hnsw_index.py)
+    VECTOR_HNSW_M: int = int(os.getenv("VECTOR_HNSW_M", "16"))
+    VECTOR_HNSW_EF_CONSTRUCTION: int = int(os.getenv("VECTOR_HNSW_EF_CONSTRUCTION", "64"))
+    # Default candidate list size per query; higher = better recall, slower
+    VECTOR_EF_SEARCH: int = int(os.getenv("VECTOR_EF_SEARCH", "40"))
+    # Scopes up to this many embedded emails are filtered by account first and ranked exactly
+    VECTOR_EXACT_SCAN_MAX_ROWS: int = int(os.getenv("VECTOR_EXACT_SCAN_MAX_ROWS", "20000"))
+    # "relaxed_order" enables filtered HNSW iterative scans (pgvector >= 0.8); empty disables
+    VECTOR_ITERATIVE_SCAN: str = os.getenv("VECTOR_ITERATIVE_SCAN", "")
+    
+    # HYBRID SEARCH (full-text + vector, reciprocal-rank fusion)
+    SEARCH_RRF_K: int = int(os.getenv("SEARCH_RRF_K", "60"))
+    # Each retriever returns limit * N candidates before fusion
+    SEARCH_CANDIDATE_MULTIPLIER: int = int(os.getenv("SEARCH_CANDIDATE_MULTIPLIER", "4"))
+    # Attachment text matches rank slightly below matches in the email itself
+    SEARCH_ATTACHMENT_WEIGHT: float = float(os.getenv("SEARCH_ATTACHMENT_WEIGHT", "0.8"))
+    
+    # CHAT INTENT (local classifier; the LLM is asked only below these thresholds)
+    INTENT_CACHE_SIZE: int = int(os.getenv("INTENT_CACHE_SIZE", "2000"))
+    # Cosine similarity to the nearest intent centroid, and its lead over the runner-up
+    INTENT_CENTROID_MIN_SIMILARITY: float = float(os.getenv("INTENT_CENTROID_MIN_SIMILARITY", "0.5"))
+    INTENT_CENTROID_MIN_MARGIN: float = float(os.getenv("INTENT_CENTROID_MIN_MARGIN", "0.03"))
+    
+    # CHAT MEMORY (recent turns verbatim + rolling summary of older ones)
+    CHAT_MEMORY_TURNS: int = int(os.getenv("CHAT_MEMORY_TURNS", "4"))
+    CHAT_MEMORY_MESSAGE_CHARS: int = int(os.getenv("CHAT_MEMORY_MESSAGE_CHARS", "1500"))
+    CHAT_MEMORY_SUMMARY_CHARS: int = int(os.getenv("CHAT_MEMORY_SUMMARY_CHARS", "1500"))
+    # Messages that must fall out of the verbatim window before the summary is refreshed
+    CHAT_MEMORY_SUMMARY_BATCH: int = int(os.getenv("CHAT_MEMORY_SUMMARY_BATCH", "4"))
+    
+    # CHAT RESPONSE CACHE (per user, matched on query-embedding similarity)
+    RESPONSE_CACHE_ENABLED: bool = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+    RESPONSE_CACHE_SIMILARITY: float = float(os.getenv("RESPONSE_CACHE_SIMILARITY", "0.95"))
+    RESPONSE_CACHE_TTL_SECONDS: int = int(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "1800"))
+    RESPONSE_CACHE_PER_USER: int = int(os.getenv("RESPONSE_CACHE_PER_USER", "50"))
+    
+    # CHUNK STORE (retrieval units for chat; token counts are estimates)
+    CHUNK_MAX_TOKENS: int = int(os.getenv("CHUNK_MAX_TOKENS", "300"))
+    CHUNK_OVERLAP_TOKENS: int = int(os.getenv("CHUNK_OVERLAP_TOKENS", "50"))
+    # Caps the chunks per email body / attachment so one huge PDF cannot flood the store
+    CHUNK_MAX_PER_DOCUMENT: int = int(os.getenv("CHUNK_MAX_PER_DOCUMENT", "40"))
+    # Chunks handed to the chat model as context
+    CHAT_CONTEXT_CHUNKS: int = int(os.getenv("CHAT_CONTEXT_CHUNKS", "8"))
+    
     # JWT
     JWT_SECRET_KEY: str = os.getenv("JWT_SECRET_KEY", "your-secret-key-change-in-production")
     JWT_ALGORITHM: str = "HS256"
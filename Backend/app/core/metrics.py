@@ -0,0 +1,48 @@
+import threading
+from collections import defaultdict
+from typing import Dict
+
+class Metrics:
+    """
+    Process-local counters and timings, exposed as JSON at /api/v1/metrics.
+    Names are dotted, e.g. "embedding_cache.misses".
+    """
+    def __init__(self):
+        self._counters: Dict[str, float] = defaultdict(float)
+        self._timings: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, value: float = 1):
+        with self._lock:
+            self._counters[name] += value
+
+    def get(self, name: str) -> float:
+        return self._counters.get(name, 0)
+
+    def observe(self, name: str, seconds: float):
+        """Records one duration; snapshot reports count, total, mean and max."""
+        with self._lock:
+            timing = self._timings.setdefault(name, {"count": 0, "total": 0.0, "max": 0.0})
+            timing["count"] += 1
+            timing["total"] += seconds
+            timing["max"] = max(timing["max"], seconds)
+
+    def ratio(self, part: str, *others: str) -> float:
+        """part / (part + others), 0.0 when nothing was counted."""
+        total = self.get(part) + sum(self.get(name) for name in others)
+        return self.get(part) / total if total else 0.0
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            timings = {
+                name: {**t, "mean": t["total"] / t["count"] if t["count"] else 0.0}
+                for name, t in self._timings.items()
+            }
+            return {"counters": dict(self._counters), "timings": timings}
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._timings.clear()
+
+metrics = Metrics()
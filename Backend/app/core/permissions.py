@@ -5,7 +5,7 @@ from sqlalchemy import select, and_
 from app.db.models import User, UserOrganization, OrganizationRole, Account
 from app.db.session import get_db
 from app.core.auth import get_current_user
-from typing import Optional
+from typing import List, Optional
 
 PERMISSIONS = {
     "read_emails": [OrganizationRole.owner, OrganizationRole.admin, OrganizationRole.member, OrganizationRole.viewer],
@@ -85,24 +85,21 @@ async def get_user_organization(
     result = await db.execute(stmt)
     return result.scalars().first()
 
-async def filter_emails_by_organization(
-    user: User,
+async def accessible_account_ids(
+    user_id,
     db: AsyncSession
-):
+) -> List:
     """
-    Helper to filter emails by user's organization memberships.
-    Returns a query filter that restricts emails to those accessible by the user's organizations.
+    Ids of the mail accounts a user may read: their own, plus those of every member
+    of the organizations they belong to.
     """
-    from app.db.models import Account, Email
-    
-    stmt_orgs = select(UserOrganization).where(UserOrganization.user_id == user.id)
+    stmt_orgs = select(UserOrganization.organization_id).where(UserOrganization.user_id == user_id)
     result = await db.execute(stmt_orgs)
-    user_orgs = result.scalars().all()
+    org_ids = result.scalars().all()
     
-    if not user_orgs:
-        org_user_ids = [user.id]
+    if not org_ids:
+        org_user_ids = [user_id]
     else:
-        org_ids = [uo.organization_id for uo in user_orgs]
         stmt_users = select(UserOrganization.user_id).where(
             UserOrganization.organization_id.in_(org_ids)
         )
@@ -111,7 +108,17 @@ async def filter_emails_by_organization(
     
     stmt_accounts = select(Account.id).where(Account.user_id.in_(org_user_ids))
     result_accounts = await db.execute(stmt_accounts)
-    account_ids = [aid for aid in result_accounts.scalars().all()]
+    return [aid for aid in result_accounts.scalars().all()]
+
+async def filter_emails_by_organization(
+    user: User,
+    db: AsyncSession
+):
+    """
+    Helper to filter emails by user's organization memberships.
+    Returns a query filter that restricts emails to those accessible by the user's organizations.
+    """
+    from app.db.models import Email
     
+    account_ids = await accessible_account_ids(user.id, db)
     return Email.account_id.in_(account_ids)
-
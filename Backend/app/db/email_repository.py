@@ -0,0 +1,100 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, insert, update, any_, bindparam, String
+from sqlalchemy.orm import aliased
+from sqlalchemy.dialects.postgresql import ARRAY, insert as pg_insert
+from app.db.models import Email, Attachment, Task, Chunk
+from typing import Dict, Iterable, List, Set
+import uuid
+
+# Keeps multi-row statements well below asyncpg's 32767 bind parameter limit
+CHUNK_SIZE = 1000
+
+def _chunks(rows: List[dict], size: int = CHUNK_SIZE):
+    for i in range(0, len(rows), size):
+        yield rows[i:i + size]
+
+class EmailRepository:
+    """
+    Set-based reads and writes for the ingestion path, so a batch of N messages
+    costs a handful of round trips instead of N.
+    """
+    async def existing_gmail_ids(self, db: AsyncSession, gmail_ids: Iterable[str]) -> Set[str]:
+        """
+        Returns the subset of gmail_ids already stored, using one `gmail_id = ANY(:ids)` query.
+        """
+        gmail_ids = list(set(gmail_ids))
+        if not gmail_ids:
+            return set()
+        stmt = select(Email.gmail_id).where(
+            Email.gmail_id == any_(bindparam("gmail_ids", gmail_ids, type_=ARRAY(String)))
+        )
+        result = await db.execute(stmt)
+        return set(result.scalars().all())
+
+    async def insert_new_emails(self, db: AsyncSession, rows: List[dict]) -> Dict[str, uuid.UUID]:
+        """
+        Inserts email rows with INSERT ... ON CONFLICT (gmail_id) DO NOTHING RETURNING.
+        Returns {gmail_id: id} for the rows actually written; rows that lost a race
+        with another writer are left out.
+        """
+        inserted = {}
+        for chunk in _chunks(rows):
+            chunk = [{"id": uuid.uuid4(), **row} if "id" not in row else row for row in chunk]
+            stmt = (
+                pg_insert(Email)
+                .values(chunk)
+                .on_conflict_do_nothing(index_elements=[Email.gmail_id])
+                .returning(Email.gmail_id, Email.id)
+            )
+            result = await db.execute(stmt)
+            inserted.update({gmail_id: email_id for gmail_id, email_id in result.all()})
+        return inserted
+
+    async def bulk_update_emails(self, db: AsyncSession, rows: List[dict]) -> int:
+        """
+        Updates emails by primary key; each row is {"id": ..., <column>: <value>, ...}.
+        Rows are grouped by their key set so each group is a single executemany.
+        """
+        groups: Dict[tuple, List[dict]] = {}
+        for row in rows:
+            groups.setdefault(tuple(sorted(row)), []).append(row)
+        for group in groups.values():
+            for chunk in _chunks(group):
+                await db.execute(update(Email), chunk)
+        return len(rows)
+
+    async def copy_embeddings(self, db: AsyncSession, sources: Dict[uuid.UUID, uuid.UUID]) -> int:
+        """
+        Sets each email's embedding to that of its source ({email_id: source_id}) inside
+        the database, one executemany, without sending vectors back and forth.
+        """
+        if not sources:
+            return 0
+        source = aliased(Email)
+        emails = Email.__table__
+        stmt = (
+            update(emails)
+            .where(emails.c.id == bindparam("target_id"))
+            .values(embedding=select(source.embedding).where(source.id == bindparam("source_id")).scalar_subquery())
+        )
+        params = [{"target_id": email_id, "source_id": source_id} for email_id, source_id in sources.items()]
+        for chunk in _chunks(params):
+            await db.execute(stmt, chunk)
+        return len(params)
+
+    async def bulk_insert_attachments(self, db: AsyncSession, rows: List[dict]) -> int:
+        return await self._bulk_insert(db, Attachment, rows)
+
+    async def bulk_insert_tasks(self, db: AsyncSession, rows: List[dict]) -> int:
+        return await self._bulk_insert(db, Task, rows)
+
+    async def bulk_insert_chunks(self, db: AsyncSession, rows: List[dict]) -> int:
+        return await self._bulk_insert(db, Chunk, rows)
+
+    async def _bulk_insert(self, db: AsyncSession, model, rows: List[dict]) -> int:
+        # executemany over insert() is sent as multi-row VALUES batches
+        for chunk in _chunks(rows):
+            await db.execute(insert(model), chunk)
+        return len(rows)
+
+email_repository = EmailRepository()
@@ -1,12 +1,25 @@
-from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, Boolean, Text, Float, func, Date, Enum
-from sqlalchemy.dialects.postgresql import UUID, JSONB
+from sqlalchemy import Column, String, Integer, BigInteger, DateTime, ForeignKey, Boolean, Text, Float, func, Date, Enum, Computed
+from sqlalchemy.dialects.postgresql import UUID, JSONB, TSVECTOR
 from pgvector.sqlalchemy import Vector
-from sqlalchemy.orm import relationship, declarative_base
+from sqlalchemy.orm import relationship, declarative_base, deferred
 import uuid
 import enum
 
 Base = declarative_base()
 
+# Full-text documents for hybrid search (kept in sync by Postgres as generated columns).
+# Long texts are cut so a document stays under the 1MB tsvector limit.
+EMAIL_SEARCH_DOCUMENT = (
+    "setweight(to_tsvector('english', coalesce(subject, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(sender, '')), 'A') || "
+    "setweight(to_tsvector('english', left(coalesce(body_plain, ''), 200000)), 'B')"
+)
+CHUNK_SEARCH_DOCUMENT = "to_tsvector('english', content)"
+ATTACHMENT_SEARCH_DOCUMENT = (
+    "setweight(to_tsvector('english', coalesce(filename, '')), 'A') || "
+    "setweight(to_tsvector('english', left(coalesce(extracted_text, ''), 200000)), 'C')"
+)
+
 class OrganizationRole(enum.Enum):
     owner = "owner"
     admin = "admin"
@@ -56,6 +69,11 @@ class Email(Base):
     confidence = Column(Float)
     embedding = Column(Vector(768)) # pgvector
     is_read = Column(Boolean, default=False)
+    pipeline_stage = Column(String) # last completed ingestion stage; NULL = ingested before staging
+    simhash = Column(BigInteger) # near-duplicate fingerprint of subject + cleaned body
+    duplicate_of = Column(UUID(as_uuid=True), ForeignKey("emails.id")) # classification / embedding reused from this email
+    duplicate_distance = Column(Integer) # SimHash bits that differed from duplicate_of
+    search_vector = deferred(Column(TSVECTOR, Computed(EMAIL_SEARCH_DOCUMENT, persisted=True)))
     
     account = relationship("Account", back_populates="emails")
     interactions = relationship("Interaction", back_populates="email")
@@ -69,6 +87,7 @@ class Attachment(Base):
     content_type = Column(String)
     size = Column(Integer)
     extracted_text = Column(Text)
+    search_vector = deferred(Column(TSVECTOR, Computed(ATTACHMENT_SEARCH_DOCUMENT, persisted=True)))
     
     email = relationship("Email", back_populates="attachments")
 
@@ -116,6 +135,9 @@ class Conversation(Base):
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"))
     title = Column(String, nullable=False)
+    # Rolling summary of the oldest `summarized_messages` messages (conversation memory)
+    summary = Column(Text, nullable=True)
+    summarized_messages = Column(Integer, default=0)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     
@@ -125,7 +147,7 @@ class Conversation(Base):
 class Message(Base):
     __tablename__ = "messages"
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    conversation_id = Column(UUID(as_uuid=True), ForeignKey("conversations.id"))
+    conversation_id = Column(UUID(as_uuid=True), ForeignKey("conversations.id"), index=True)
     role = Column(String, nullable=False)
     content = Column(Text, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -168,3 +190,71 @@ class UserOrganization(Base):
     
     user = relationship("User", back_populates="user_organizations")
     organization = relationship("Organization", back_populates="user_organizations")
+
+class BackfillCheckpoint(Base):
+    __tablename__ = "backfill_checkpoints"
+    name = Column(String, primary_key=True) # e.g. "email_embeddings"
+    last_id = Column(UUID(as_uuid=True)) # keyset cursor: every row up to here has been committed
+    status = Column(String, default="idle") # idle | running | completed | failed
+    run_id = Column(String) # set by whoever queued the run; a retried attempt keeps it
+    total = Column(Integer, default=0) # pending rows when the run (re)started
+    processed = Column(Integer, default=0)
+    succeeded = Column(Integer, default=0)
+    failed = Column(Integer, default=0)
+    error = Column(Text)
+    started_at = Column(DateTime(timezone=True))
+    finished_at = Column(DateTime(timezone=True))
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class EmbeddingCacheEntry(Base):
+    __tablename__ = "embedding_cache"
+    key = Column(String, primary_key=True) # "<model>:<dimensions>:<sha256 of normalized text>"
+    model = Column(String, nullable=False)
+    dimensions = Column(Integer, nullable=False)
+    embedding = Column(Vector(), nullable=False) # no fixed size; dimensions is part of the key
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class Chunk(Base):
+    """
+    A retrieval unit: an overlapping, token-bounded slice of an email body or of an
+    attachment's extracted text, with its own embedding.
+    """
+    __tablename__ = "chunks"
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    email_id = Column(UUID(as_uuid=True), ForeignKey("emails.id"), nullable=False, index=True)
+    attachment_id = Column(UUID(as_uuid=True), ForeignKey("attachments.id"), nullable=True) # NULL = email body
+    account_id = Column(UUID(as_uuid=True), ForeignKey("accounts.id")) # denormalized for tenant-scoped search
+    chunk_index = Column(Integer, nullable=False) # position within its email body / attachment
+    content = Column(Text, nullable=False)
+    token_count = Column(Integer)
+    embedding = Column(Vector(768))
+    search_vector = deferred(Column(TSVECTOR, Computed(CHUNK_SEARCH_DOCUMENT, persisted=True)))
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    email = relationship("Email")
+    attachment = relationship("Attachment")
+
+class SenderProfile(Base):
+    """
+    Per-user reputation of one sender address, kept up to date incrementally on ingest
+    and on interactions. exposure / engagement / dismissals are recency-weighted
+    (halved every SENDER_PROFILE_HALF_LIFE_DAYS) as of decayed_at.
+    """
+    __tablename__ = "sender_profiles"
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), primary_key=True)
+    sender = Column(String, primary_key=True) # normalized address, e.g. "coe@srmist.edu.in"
+    domain = Column(String, nullable=False, index=True)
+    emails_received = Column(Integer, nullable=False, default=0)
+    scored = Column(Integer, nullable=False, default=0) # emails with a classification
+    score_sum = Column(Float, nullable=False, default=0.0)
+    score_sq_sum = Column(Float, nullable=False, default=0.0)
+    opens = Column(Integer, nullable=False, default=0)
+    replies = Column(Integer, nullable=False, default=0)
+    stars = Column(Integer, nullable=False, default=0)
+    archives = Column(Integer, nullable=False, default=0)
+    exposure = Column(Float, nullable=False, default=0.0)
+    engagement = Column(Float, nullable=False, default=0.0)
+    dismissals = Column(Float, nullable=False, default=0.0)
+    decayed_at = Column(DateTime(timezone=True), server_default=func.now())
+    last_email_at = Column(DateTime(timezone=True))
+    last_interaction_at = Column(DateTime(timezone=True))
@@ -1,6 +1,6 @@
 import os
 import logging
-from fastapi import FastAPI, Depends, Request
+from fastapi import FastAPI, Depends, Request, HTTPException
 from fastapi.responses import RedirectResponse, JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.exceptions import RequestValidationError
@@ -10,7 +10,13 @@ from app.core.config import settings
 from app.core.logging_config import setup_logging
 from app.db.session import get_db
 from app.services.gmail import gmail_service
+from app.services.gmail_async import async_gmail_service
+from app.services.google_clients import google_clients
 from app.services.brain import brain_service
+from app.services.job_queue import job_queue
+from app.services.sync_service import sync_service
+from app.services.backfill_service import backfill_service, chunk_backfill_service
+from app.services.conversation_memory import conversation_memory
 
 setup_logging()
 logger = logging.getLogger(__name__)
@@ -47,7 +53,7 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-from app.api.endpoints import interactions, gmail, digest, tasks, auth, calendar, dashboard, organizations
+from app.api.endpoints import interactions, gmail, digest, tasks, auth, calendar, dashboard, organizations, search
 from app.api.routers import chat
 app.include_router(interactions.router, prefix=settings.API_V1_STR, tags=["interactions"])
 app.include_router(chat.router, prefix=f"{settings.API_V1_STR}/chat", tags=["chat"])
@@ -58,6 +64,20 @@ app.include_router(calendar.router, prefix=f"{settings.API_V1_STR}/calendar", ta
 app.include_router(dashboard.router, prefix=f"{settings.API_V1_STR}/dashboard", tags=["dashboard"])
 app.include_router(organizations.router, prefix=f"{settings.API_V1_STR}/organizations", tags=["organizations"])
 app.include_router(auth.router, prefix=f"{settings.API_V1_STR}/auth", tags=["auth"])
+app.include_router(search.router, prefix=f"{settings.API_V1_STR}/search", tags=["search"])
+
+@app.on_event("startup")
+async def start_job_workers():
+    job_queue.register("gmail_sync", sync_service.run_sync_job)
+    job_queue.register("embedding_backfill", backfill_service.run_backfill_job)
+    job_queue.register("chunk_backfill", chunk_backfill_service.run_backfill_job)
+    job_queue.register("conversation_summary", conversation_memory.run_summary_job)
+    job_queue.start(workers=settings.SYNC_WORKERS)
+
+@app.on_event("shutdown")
+async def stop_job_workers():
+    await job_queue.stop()
+    await async_gmail_service.close()
 
 @app.get("/")
 async def root():
@@ -86,8 +106,8 @@ async def callback(code: str, db: AsyncSession = Depends(get_db)):
         
         # Build service to get email address
         print("2. Fetching user profile...")
-        service = gmail_service.build_service(creds)
-        profile = gmail_service.get_profile(service)
+        service = async_gmail_service.build_service(creds)
+        profile = await async_gmail_service.get_profile(service)
         email_address = profile['emailAddress']
         
         # Database Operations
@@ -125,6 +145,8 @@ async def callback(code: str, db: AsyncSession = Depends(get_db)):
             
         await db.commit()
         await db.refresh(account)
+        # Drop cached clients built from the previous tokens
+        google_clients.invalidate(account.id)
         
         # Redirect to Frontend with User Info and JWT token
         from app.core.auth import create_access_token
@@ -141,216 +163,62 @@ async def callback(code: str, db: AsyncSession = Depends(get_db)):
         traceback.print_exc()
         return {"error": str(e)}
 
-@app.get(f"{settings.API_V1_STR}/gmail/sync")
-async def sync_emails(email: str, db: AsyncSession = Depends(get_db)):
+@app.get(f"{settings.API_V1_STR}/metrics")
+async def get_metrics():
     """
-    Trigger manual sync for a user email.
+    Process-local counters and timings (cache hit rates, LLM gateway load).
     """
-    from app.db.models import Account, Email
-    from sqlalchemy import select
-    from google.oauth2.credentials import Credentials
-    import datetime
-
-    # 1. Get Account
-    result = await db.execute(select(Account).where(Account.email_address == email))
-    account = result.scalars().first()
-    
-    if not account:
-        return {"error": "Account not found"}
-    
-    # 2. Reconstruct Credentials
-    creds = Credentials(
-        token=account.access_token,
-        refresh_token=account.refresh_token,
-        token_uri="https://oauth2.googleapis.com/token",
-        client_id=settings.GOOGLE_CLIENT_ID,
-        client_secret=settings.GOOGLE_CLIENT_SECRET,
-        scopes=['https://www.googleapis.com/auth/gmail.readonly', 'https://www.googleapis.com/auth/userinfo.email']
+    from app.core.metrics import metrics
+    from app.services.embedding_cache import embedding_cache
+    from app.services.response_cache import response_cache
+    from app.services.pre_classifier import pre_classifier
+    from app.services.near_duplicates import near_duplicate_index
+    from app.services.llm_gateway import llm_gateway
+    from app.services import structured_output
+    return {
+        **metrics.snapshot(),
+        "embedding_cache": embedding_cache.stats(),
+        "response_cache": response_cache.stats(),
+        "pre_classifier": pre_classifier.stats(),
+        "near_duplicates": near_duplicate_index.stats(),
+        "llm_gateway": llm_gateway.snapshot(),
+        "structured_output": structured_output.stats(),
+    }
+
+# target -> (job name, service)
+BACKFILLS = {
+    "embeddings": ("embedding_backfill", backfill_service),
+    "chunks": ("chunk_backfill", chunk_backfill_service),
+}
+
+def _backfill(target: str):
+    if target not in BACKFILLS:
+        raise HTTPException(status_code=400, detail=f"Unknown backfill target '{target}'")
+    return BACKFILLS[target]
+
+@app.get(f"{settings.API_V1_STR}/brain/backfill", status_code=202)
+async def backfill_embeddings(restart: bool = False, target: str = "embeddings"):
+    """
+    Queues a backfill: target=embeddings for emails without embeddings, target=chunks
+    for emails not yet in the chunk store.
+    The run resumes from its checkpoint unless restart=true; progress is at /brain/backfill/status.
+    """
+    import uuid
+    job_name, _ = _backfill(target)
+    job = await job_queue.enqueue(
+        job_name,
+        {"restart": restart, "run_id": str(uuid.uuid4())},
+        key=job_name
     )
-    
-    # 3. Build Service 
-    try:
-        service = gmail_service.build_service(creds)
-        
-        # 3.1 Get Profile for historyId (Latest State)
-        profile = gmail_service.get_profile(service)
-        current_history_id = profile.get('historyId')
-        
-        # 3.2 Fetch Emails
-        # LIMITATION: This fetches raw latest 50. 
-        # Ideally we use historyId to fetch ONLY what changed if account.last_sync_id exists.
-        # But per Phase 1 instructions: "Fetch the last 50 emails" initially.
-        emails_data = gmail_service.fetch_emails(service, limit=50)
-        
-        count = 0
-        new_emails_list = []
-        new_email_objects = {}
-        
-        for email_doc in emails_data:
-            # Check if exists
-            result = await db.execute(select(Email).where(Email.gmail_id == email_doc['gmail_id']))
-            existing = result.scalars().first()
-            
-            if not existing:
-                new_email = Email(
-                    account_id=account.id,
-                    gmail_id=email_doc['gmail_id'],
-                    thread_id=email_doc['thread_id'],
-                    sender=email_doc['metadata']['from'],
-                    subject=email_doc['metadata']['subject'],
-                    body_plain=email_doc['content']['cleaned_text'],
-                    received_at=datetime.datetime.fromisoformat(email_doc['metadata']['timestamp']),
-                    importance_score=0,
-                    category='Unprocessed'
-                )
-                db.add(new_email)
-                count += 1
-                
-                # Add to batch for classification
-                new_emails_list.append(email_doc)
-                new_email_objects[email_doc['gmail_id']] = new_email
+    return {"job_id": job.id, "status": job.status}
 
-        # 4. Batch Classify New Emails
-        if new_emails_list:
-            print(f"🧠 Classifying {len(new_emails_list)} new emails...")
-            try:
-                classification_map = brain_service.classify_emails_batch(new_emails_list)
-                
-                for gmail_id, result_data in classification_map.items():
-                    if gmail_id in new_email_objects:
-                        email_obj = new_email_objects[gmail_id]
-                        email_obj.importance_score = result_data.get('score', 0)
-                        email_obj.category = result_data.get('category', 'Uncategorized')
-                        email_obj.explanation = result_data.get('explanation', '')
-                        email_obj.confidence = result_data.get('confidence', 0.0)
-                        
-                        print(f"   scored {email_obj.importance_score}/100: {email_obj.subject[:30]}...")
-            except Exception as e:
-                print(f"❌ Classification Error: {e}")
-
-        # 5. Task Detection for New Emails
-        if new_email_objects:
-            print(f"🕵️ Detecting tasks in {len(new_email_objects)} new emails...")
-            from app.db.models import Task
-             
-            for gmail_id, email_obj in new_email_objects.items():
-                # Only check if it's Important or Critical to save tokens/time? 
-                # Or check all? "Soft tasks" might be in FYI. Let's check all for now or filter > 30 score.
-                if email_obj.importance_score >= 30:
-                    content_for_task = f"Subject: {email_obj.subject}\nBody: {email_obj.body_plain[:2000]}"
-                    task_data = brain_service.detect_tasks(content_for_task)
-                     
-                    if task_data.get('is_task'):
-                        print(f"   ✅ Task found: {task_data.get('description')}")
-                        new_task = Task(
-                            user_id=account.user_id,
-                            email_id=email_obj.id,
-                            description=task_data.get('description'),
-                            task_type=task_data.get('type'),
-                            priority=task_data.get('priority'),
-                            status='pending'
-                        )
-                        if task_data.get('due_date'):
-                            try:
-                                new_task.due_date = datetime.datetime.fromisoformat(task_data.get('due_date'))
-                            except:
-                                pass
-                         
-                        db.add(new_task)
-            
-            # 6. Attachment Parsing & Thread Summarization
-            print(f"📎 Processing attachments and threads for {len(new_email_objects)} new emails...")
-            from app.db.models import Attachment
-            
-            threads_to_summarize = set()
-            
-            for gmail_id, email_obj in new_email_objects.items():
-                # Attachments
-                doc = next((d for d in emails_data if d['gmail_id'] == gmail_id), None)
-                if doc and doc['content']['attachments']:
-                    for att in doc['content']['attachments']:
-                        # Fetch content
-                        print(f"   Downloading attachment {att['name']}...")
-                        content = gmail_service.get_attachment_content(service, gmail_id, att['id'])
-                        if content:
-                            extracted_text = attachment_service.parse_attachment(content, att['type'], att['name'])
-                            new_att = Attachment(
-                                email_id=email_obj.id,
-                                filename=att['name'],
-                                content_type=att['type'],
-                                size=att['size'],
-                                extracted_text=extracted_text
-                            )
-                            db.add(new_att)
-                            print(f"   Saved attachment: {att['name']}")
-                
-                # Collect thread ID for summarization
-                if email_obj.thread_id:
-                    threads_to_summarize.add(email_obj.thread_id)
-            
-            # Summarize Threads
-            if threads_to_summarize:
-                print(f"🧵 Summarizing {len(threads_to_summarize)} threads...")
-                for thread_id in threads_to_summarize:
-                    try:
-                        summary = await summarizer_service.summarize_thread(db, thread_id)
-                        if summary:
-                            print(f"   Summarized thread {thread_id}")
-                    except Exception as e:
-                        print(f"   Error summarizing thread {thread_id}: {e}")
-        
-        # 4. Update Sync State
-        if current_history_id:
-            account.last_sync_id = str(current_history_id)
-        
-        await db.commit()
-        return {
-            "message": "Sync complete", 
-            "emails_fetched": len(emails_data), 
-            "new_saved": count, 
-            "history_id": current_history_id
-        }
-        
-    except Exception as e:
-        import traceback
-        traceback.print_exc()
-        return {"error": str(e)}
-
-@app.get(f"{settings.API_V1_STR}/brain/backfill")
-async def backfill_embeddings(db: AsyncSession = Depends(get_db)):
+@app.get(f"{settings.API_V1_STR}/brain/backfill/status")
+async def backfill_status(target: str = "embeddings", db: AsyncSession = Depends(get_db)):
     """
-    Generates embeddings for emails that don't have them yet.
+    Checkpoint and progress counters of a backfill.
     """
-    from app.db.models import Email
-    from app.services.brain import brain_service
-    from sqlalchemy import select
-    
-    print("🧠 Starting embedding backfill...")
-    
-    # 1. Fetch emails with NULL embedding
-    result = await db.execute(select(Email).where(Email.embedding == None))
-    emails = result.scalars().all()
-    
-    print(f"Found {len(emails)} emails to process.")
-    
-    count = 0
-    for email in emails:
-        # Combine subject and body for the embedding text
-        # Truncate to avoid token limits if necessary, but Gemini is generous (1M tokens).
-        # We'll use a safe chunk of text.
-        text_to_embed = f"Subject: {email.subject}\n\n{email.body_plain[:8000]}"
-        
-        vector = brain_service.get_embedding(text_to_embed)
-        
-        if vector:
-            email.embedding = vector
-            count += 1
-            if count % 10 == 0:
-                print(f"   Processed {count}...")
-    
-    await db.commit()
-    print(f"✅ Backfill complete. Updated {count} emails.")
-    return {"message": "Backfill complete", "updated": count}
+    _, service = _backfill(target)
+    return await service.status(db)
 
 if __name__ == "__main__":
     import uvicorn
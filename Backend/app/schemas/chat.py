@@ -12,6 +12,7 @@ class ChatRequest(BaseModel):
     query: str
     conversation_id: Optional[UUID] = None
     user_id: str # Ideally this comes from auth context, but for MVP simplifying
+    no_cache: bool = False # skip the response cache and always generate
 
 class ChatResponse(BaseModel):
     response: str
@@ -20,3 +21,4 @@ class ChatResponse(BaseModel):
     sources: List[str] = [] # List of email subjects or IDs used for context
     intent: Optional[str] = None
     intent_rejected: bool = False
+    cached: bool = False # answered from the response cache
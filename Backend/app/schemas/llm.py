@@ -0,0 +1,42 @@
+from pydantic import BaseModel, Field, ValidationError, field_validator
+from typing import Literal, Optional
+
+# Shapes the LLM is asked to return. Responses are validated against these
+# (see structured_output); items that do not fit are re-requested.
+
+class TaskExtraction(BaseModel):
+    is_task: bool
+    description: Optional[str] = None
+    type: Optional[Literal["deadline", "meeting", "task"]] = None
+    due_date: Optional[str] = None # ISO 8601, parsed by the caller
+    priority: Optional[Literal["high", "medium", "low"]] = None
+
+class EmailClassification(BaseModel):
+    score: int = Field(ge=0, le=100)
+    category: str = "Uncategorized"
+    explanation: str = ""
+    confidence: float = Field(default=0.0, ge=0.0, le=1.0)
+    task: Optional[TaskExtraction] = None # only asked for when tasks are folded into classification
+
+    @field_validator("task", mode="before")
+    @classmethod
+    def lenient_task(cls, value):
+        # A bad task must not cost the classification: it is dropped, which leaves the
+        # email to task_detect. An explicit null is an answer ("no task") and is kept
+        if value is None:
+            return TaskExtraction(is_task=False)
+        try:
+            return TaskExtraction.model_validate(value)
+        except ValidationError:
+            return None
+
+class IntentResult(BaseModel):
+    intent: Literal["explain", "filter", "teach", "command", "chat"]
+    confidence: Literal["high", "medium", "low"] = "low"
+    reasoning: str = ""
+
+class ReplyAnalysis(BaseModel):
+    should_reply: bool
+    reason: str = ""
+    reply_type: Literal["acknowledgment", "quick_answer", "needs_human", "none"] = "none"
+    suggested_tone: Optional[Literal["Professional", "Casual", "Formal"]] = None
@@ -0,0 +1,21 @@
+from pydantic import BaseModel
+from typing import List, Optional
+from uuid import UUID
+from datetime import datetime
+
+class SearchResult(BaseModel):
+    id: UUID
+    gmail_id: str
+    thread_id: str
+    subject: Optional[str] = None
+    sender: str
+    received_at: Optional[datetime] = None
+    snippet: str
+    attachments: List[str] = [] # filenames
+    score: float
+    matched: List[str] = [] # "lexical" and/or "semantic"
+
+class SearchResponse(BaseModel):
+    query: str
+    mode: str
+    results: List[SearchResult]
@@ -1,6 +1,7 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from app.db.models import Email
+from app.schemas.llm import ReplyAnalysis
 from app.services.brain import brain_service
 from app.services.draft_service import draft_service
 import logging
@@ -48,12 +49,10 @@ class AutoReplyService:
             - Only suggest "acknowledgment" or "quick_answer" for simple, safe responses
             """
             
-            analysis_result = brain_service.generate_answer(analysis_prompt)
-            
-            import json
-            try:
-                analysis_json = json.loads(analysis_result)
-            except:
+            analysis_json = await brain_service.generate_structured(
+                analysis_prompt, ReplyAnalysis, caller=f"auto_reply:{email.account_id}"
+            )
+            if analysis_json is None:
                 analysis_json = {"should_reply": False, "reason": "Could not parse analysis"}
             
             if not analysis_json.get("should_reply", False):
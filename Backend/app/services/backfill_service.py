@@ -0,0 +1,221 @@
+from sqlalchemy import select, func
+from app.core.config import settings
+from app.db.models import Email, Chunk, BackfillCheckpoint
+from app.db.session import AsyncSessionLocal
+from app.db.email_repository import email_repository
+from app.services.brain import brain_service
+from app.services.chunk_service import chunk_service
+from typing import List, Optional, Tuple
+import asyncio
+import datetime
+import logging
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_BACKFILL = "email_embeddings"
+CHUNK_BACKFILL = "email_chunks"
+
+def _now():
+    return datetime.datetime.now(datetime.timezone.utc)
+
+class BackfillService:
+    """
+    Embedding backfill that walks `emails WHERE embedding IS NULL` in keyset pages ordered
+    by id. Only one page per worker is held in memory, every page is committed on its own,
+    and the checkpoint cursor only advances past pages that are fully committed, so a crashed
+    or retried run picks up where it stopped.
+    """
+    name = EMBEDDING_BACKFILL
+
+    def __init__(self, chunk_size: Optional[int] = None, parallelism: Optional[int] = None):
+        self.chunk_size = chunk_size or settings.BACKFILL_CHUNK_SIZE
+        self.parallelism = parallelism or settings.BACKFILL_PARALLELISM
+
+    def columns(self) -> tuple:
+        return (Email.id, Email.subject, Email.body_plain)
+
+    def pending(self):
+        """WHERE clause selecting the emails this backfill still has to process."""
+        return Email.embedding.is_(None)
+
+    async def fetch_chunk(self, after_id, limit: int) -> List[tuple]:
+        """Next page of columns() rows after the cursor, id first; no ORM objects."""
+        stmt = select(*self.columns()).where(self.pending())
+        if after_id is not None:
+            stmt = stmt.where(Email.id > after_id)
+        stmt = stmt.order_by(Email.id).limit(limit)
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(stmt)
+            return result.all()
+
+    async def process_chunk(self, rows: List[tuple]) -> Tuple[int, int]:
+        """Embeds and commits one page. Returns (succeeded, failed)."""
+        texts = [f"Subject: {subject}\n\n{(body or '')[:8000]}" for _, subject, body in rows]
+        vectors = await brain_service.get_embeddings_batch(texts, caller="backfill")
+        updates = [{"id": email_id, "embedding": vector} for (email_id, _, _), vector in zip(rows, vectors) if vector]
+        if updates:
+            async with AsyncSessionLocal() as db:
+                await email_repository.bulk_update_emails(db, updates)
+                await db.commit()
+        return len(updates), len(rows) - len(updates)
+
+    async def load_checkpoint(self, db) -> BackfillCheckpoint:
+        checkpoint = await db.get(BackfillCheckpoint, self.name)
+        if checkpoint is None:
+            checkpoint = BackfillCheckpoint(name=self.name, status="idle", total=0, processed=0, succeeded=0, failed=0)
+            db.add(checkpoint)
+        return checkpoint
+
+    async def start_run(self, restart: bool, run_id: Optional[str]):
+        """Marks the checkpoint running and returns the cursor to resume from."""
+        async with AsyncSessionLocal() as db:
+            checkpoint = await self.load_checkpoint(db)
+            retrying = run_id is not None and checkpoint.run_id == run_id
+            if (restart and not retrying) or checkpoint.status == "completed":
+                # A fresh pass also revisits rows that failed last time
+                checkpoint.last_id = None
+                checkpoint.processed = checkpoint.succeeded = checkpoint.failed = 0
+                checkpoint.started_at = _now()
+            checkpoint.started_at = checkpoint.started_at or _now()
+            checkpoint.status = "running"
+            checkpoint.run_id = run_id
+            checkpoint.error = None
+            checkpoint.finished_at = None
+            pending = select(func.count()).select_from(Email).where(self.pending())
+            if checkpoint.last_id is not None:
+                pending = pending.where(Email.id > checkpoint.last_id)
+            checkpoint.total = checkpoint.processed + (await db.execute(pending)).scalar_one()
+            await db.commit()
+            return checkpoint.last_id
+
+    async def save_progress(self, last_id, processed: int, succeeded: int, failed: int):
+        async with AsyncSessionLocal() as db:
+            checkpoint = await self.load_checkpoint(db)
+            checkpoint.last_id = last_id
+            checkpoint.processed = (checkpoint.processed or 0) + processed
+            checkpoint.succeeded = (checkpoint.succeeded or 0) + succeeded
+            checkpoint.failed = (checkpoint.failed or 0) + failed
+            await db.commit()
+
+    async def finish_run(self, status: str, error: Optional[str] = None) -> dict:
+        async with AsyncSessionLocal() as db:
+            checkpoint = await self.load_checkpoint(db)
+            checkpoint.status = status
+            checkpoint.error = error
+            checkpoint.finished_at = _now()
+            await db.commit()
+            return self._to_dict(checkpoint)
+
+    async def run(self, restart: bool = False, run_id: Optional[str] = None) -> dict:
+        cursor = await self.start_run(restart, run_id)
+        try:
+            await self._run_chunks(cursor)
+        except Exception as e:
+            await self.finish_run("failed", str(e))
+            raise
+        return await self.finish_run("completed")
+
+    async def _run_chunks(self, cursor):
+        # Bounded queue: at most `parallelism` pages wait while `parallelism` are embedded
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.parallelism)
+        finished = {}
+        next_seq = 0
+        lock = asyncio.Lock()
+
+        async def produce():
+            nonlocal cursor
+            seq = 0
+            while True:
+                rows = await self.fetch_chunk(cursor, self.chunk_size)
+                if not rows:
+                    break
+                cursor = rows[-1][0]
+                await queue.put((seq, rows))
+                seq += 1
+            for _ in range(self.parallelism):
+                await queue.put(None)
+
+        async def advance():
+            # Checkpoint only past the longest run of committed pages, in keyset order
+            nonlocal next_seq
+            async with lock:
+                while next_seq in finished:
+                    last_id, processed, succeeded, failed = finished.pop(next_seq)
+                    await self.save_progress(last_id, processed, succeeded, failed)
+                    next_seq += 1
+
+        async def work():
+            while True:
+                entry = await queue.get()
+                if entry is None:
+                    return
+                seq, rows = entry
+                succeeded, failed = await self.process_chunk(rows)
+                finished[seq] = (rows[-1][0], len(rows), succeeded, failed)
+                await advance()
+
+        workers = [asyncio.create_task(work()) for _ in range(self.parallelism)]
+        producer = asyncio.create_task(produce())
+        try:
+            await asyncio.gather(producer, *workers)
+        except Exception:
+            producer.cancel()
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(producer, *workers, return_exceptions=True)
+            raise
+
+    async def status(self, db) -> dict:
+        checkpoint = await db.get(BackfillCheckpoint, self.name)
+        if checkpoint is None:
+            return {"name": self.name, "status": "idle"}
+        return self._to_dict(checkpoint)
+
+    def _to_dict(self, checkpoint: BackfillCheckpoint) -> dict:
+        return {
+            "name": checkpoint.name,
+            "status": checkpoint.status,
+            "run_id": checkpoint.run_id,
+            "last_id": str(checkpoint.last_id) if checkpoint.last_id else None,
+            "total": checkpoint.total,
+            "processed": checkpoint.processed,
+            "succeeded": checkpoint.succeeded,
+            "failed": checkpoint.failed,
+            "error": checkpoint.error,
+            "started_at": checkpoint.started_at.isoformat() if checkpoint.started_at else None,
+            "finished_at": checkpoint.finished_at.isoformat() if checkpoint.finished_at else None,
+        }
+
+    async def run_backfill_job(self, payload: dict) -> dict:
+        """
+        Job-queue handler. A retried attempt (same run_id) resumes from the saved
+        checkpoint even when the run was queued with restart=True.
+        """
+        return await self.run(restart=payload.get("restart", False), run_id=payload.get("run_id"))
+
+class ChunkBackfillService(BackfillService):
+    """
+    Builds the chunk store for emails ingested before it existed (emails with no chunks),
+    and rebuilds emails that have a chunk whose embedding failed.
+    """
+    name = CHUNK_BACKFILL
+
+    def columns(self) -> tuple:
+        return (Email.id, Email.account_id, Email.subject, Email.body_plain)
+
+    def pending(self):
+        chunks = select(Chunk.id).where(Chunk.email_id == Email.id)
+        return ~chunks.exists() | chunks.where(Chunk.embedding.is_(None)).exists()
+
+    async def process_chunk(self, rows: List[tuple]) -> Tuple[int, int]:
+        emails = [
+            {"id": email_id, "account_id": account_id, "subject": subject, "body": body}
+            for email_id, account_id, subject, body in rows
+        ]
+        async with AsyncSessionLocal() as db:
+            _, failed = await chunk_service.index_emails(db, emails, caller="backfill")
+            await db.commit()
+        return len(rows) - failed, failed
+
+backfill_service = BackfillService()
+chunk_backfill_service = ChunkBackfillService()
@@ -1,36 +1,214 @@
 from google import genai
 from app.core.config import settings
+from app.services.llm_gateway import llm_gateway, estimate_tokens, pack_by_tokens
+from app.services.embedding_cache import embedding_cache, cache_key
+from app.services import structured_output
+from app.schemas.llm import EmailClassification, IntentResult, TaskExtraction
+from contextlib import aclosing
+from pydantic import BaseModel
+from typing import List, Optional, Type
+import asyncio
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Reasoning of the classify_intent fallback; callers use it to tell a failed call apart
+INTENT_FALLBACK_REASONING = "Classification error"
+
+# Appended to the classification prompt when tasks are extracted in the same pass
+TASK_FIELD_INSTRUCTIONS = """
+        - task: for emails with score >= 30, an object describing any actionable TASK,
+          DEADLINE or MEETING request, otherwise null:
+          {"is_task": boolean, "description": "short description",
+           "type": "deadline" | "meeting" | "task" | null,
+           "due_date": "YYYY-MM-DDTHH:MM:SS" | null (ISO 8601, assume current year 2025),
+           "priority": "high" | "medium" | "low"}
+          If "Vertex", "GitHub", "Vercel" mentioned -> task priority "high".
+        """
+
 class BrainService:
     def __init__(self):
         self.client = genai.Client(api_key=settings.GEMINI_API_KEY)
         self.model = 'text-embedding-004'
+        self.dimensions = 768
+        self.cache = embedding_cache
+        self.generation_model = 'gemini-2.0-flash'
+
+    async def _generate(self, contents, config=None, caller=None):
+        # All generation goes through the shared gateway (concurrency, RPM/TPM, fairness)
+        return await llm_gateway.submit(
+            self.generation_model,
+            lambda: self.client.aio.models.generate_content(
+                model=self.generation_model,
+                contents=contents,
+                config=config
+            ),
+            estimated_tokens=estimate_tokens(contents),
+            caller=caller
+        )
+
+    async def get_embedding(self, text: str, caller: str = None):
+        """
+        Generates a vector embedding for the given text (served from the embedding cache when possible).
+        """
+        embeddings = await self.get_embeddings_batch([text], caller=caller)
+        return embeddings[0]
 
-    def get_embedding(self, text: str):
+    async def get_embeddings_batch(self, texts: List[str], caller: str = None) -> List[Optional[list]]:
         """
-        Generates a vector embedding for the given text.
+        Embeds many texts with as few embed_content requests as possible.
+        Texts are packed by estimated tokens (EMBED_BATCH_MAX_ITEMS / EMBED_BATCH_MAX_TOKENS)
+        and the packed requests run concurrently through the gateway. A failed request is
+        split in half and retried, so one bad text only costs its own embedding.
+        Texts already in the embedding cache, or repeated within the call, are not re-embedded.
+        Returns one vector (or None) per input text, in order.
         """
+        texts = [(text or "")[:settings.EMBED_MAX_CHARS_PER_TEXT] for text in texts]
+        keys = [cache_key(self.model, self.dimensions, text) for text in texts]
+        vectors = await self.cache.get_many(keys)
+
+        pending = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors and key not in pending:
+                pending[key] = text
+        if pending:
+            fresh = await self._embed_texts(list(pending.values()), caller)
+            fresh = {key: vector for key, vector in zip(pending, fresh) if vector}
+            await self.cache.put_many(fresh, self.model, self.dimensions)
+            vectors.update(fresh)
+        return [vectors.get(key) for key in keys]
+
+    async def _embed_texts(self, texts: List[str], caller: str = None) -> List[Optional[list]]:
+        results: List[Optional[list]] = [None] * len(texts)
+        batches = pack_by_tokens(texts, settings.EMBED_BATCH_MAX_ITEMS, settings.EMBED_BATCH_MAX_TOKENS)
+        await asyncio.gather(*(self._embed_indexes(texts, batch, results, caller) for batch in batches))
+        return results
+
+    async def _embed_indexes(self, texts, indexes, results, caller):
+        contents = [texts[i] for i in indexes]
         try:
-            # New SDK usage
-            result = self.client.models.embed_content(
-                model=self.model,
-                contents=text,
-                config={'output_dimensionality': 768} # Ensure 768 dims
+            response = await llm_gateway.submit(
+                self.model,
+                lambda: self.client.aio.models.embed_content(
+                    model=self.model,
+                    contents=contents,
+                    config={'output_dimensionality': self.dimensions} # Ensure 768 dims
+                ),
+                estimated_tokens=estimate_tokens(contents),
+                caller=caller
             )
-            # The result object has an 'embeddings' attribute which is a list.
-            # We want the first one's values.
-            return result.embeddings[0].values
+            if len(response.embeddings) != len(indexes):
+                raise ValueError(f"Expected {len(indexes)} embeddings, got {len(response.embeddings)}")
+            for i, embedding in zip(indexes, response.embeddings):
+                results[i] = embedding.values
         except Exception as e:
-            logger.error(f"Error generating embedding: {e}")
-            return None
+            if len(indexes) == 1:
+                logger.error(f"Error generating embedding: {e}")
+                return
+            logger.warning(f"Embedding batch of {len(indexes)} failed ({e}); splitting")
+            middle = len(indexes) // 2
+            await asyncio.gather(
+                self._embed_indexes(texts, indexes[:middle], results, caller),
+                self._embed_indexes(texts, indexes[middle:], results, caller)
+            )
+
+    async def _generate_keyed_json(self, prompt: str, entries: List[tuple], schema: Type[BaseModel], caller: str = None) -> dict:
+        """
+        Runs `prompt` over many (id, text) entries whose answers come back as one JSON
+        object keyed by id. Entries are packed into requests by estimated tokens
+        (LLM_BATCH_MAX_ITEMS / LLM_BATCH_MAX_TOKENS), which run concurrently through the
+        gateway. Every answer is validated against `schema`; only the ids that came back
+        missing or invalid are asked for again, up to LLM_OUTPUT_MAX_RETRIES times.
+        A request that errors is split in half and retried, like embedding batches.
+        Returns {id: validated dict}; ids that never validated are absent.
+        """
+        results = {}
+        texts = [text for _, text in entries]
+        batches = pack_by_tokens(texts, settings.LLM_BATCH_MAX_ITEMS, settings.LLM_BATCH_MAX_TOKENS)
+        await asyncio.gather(*(self._generate_keyed_indexes(prompt, entries, batch, schema, results, caller) for batch in batches))
+        return results
+
+    async def _generate_keyed_indexes(self, prompt, entries, indexes, schema, results, caller, attempt=0):
+        user_content = "".join(entries[i][1] for i in indexes)
+        try:
+            # We use generation config to enforce JSON
+            response = await self._generate(
+                [prompt, user_content],
+                config={
+                    'response_mime_type': 'application/json'
+                },
+                caller=caller
+            )
+        except Exception as e:
+            if len(indexes) == 1:
+                logger.error(f"Error in batched generation for {entries[indexes[0]][0]}: {e}")
+                structured_output.record_dropped(1)
+                return
+            logger.warning(f"Generation batch of {len(indexes)} failed ({e}); splitting")
+            middle = len(indexes) // 2
+            await asyncio.gather(
+                self._generate_keyed_indexes(prompt, entries, indexes[:middle], schema, results, caller, attempt),
+                self._generate_keyed_indexes(prompt, entries, indexes[middle:], schema, results, caller, attempt)
+            )
+            return
 
-    def classify_emails_batch(self, emails_data: list):
+        parsed = structured_output.parse_json(response.text)
+        ids = {str(entries[i][0]): i for i in indexes}
+        valid, missing, invalid = structured_output.validate_keyed(parsed, ids, schema)
+        results.update(valid)
+        structured_output.record_batch(schema, attempt, len(indexes), len(valid), len(missing), len(invalid), malformed=parsed is None)
+
+        retry = [ids[key] for key in ids if key not in valid]
+        if not retry:
+            return
+        if attempt >= settings.LLM_OUTPUT_MAX_RETRIES:
+            logger.error(f"{schema.__name__}: giving up on {len(retry)} item(s) after {attempt + 1} attempts")
+            structured_output.record_dropped(len(retry))
+            return
+        structured_output.record_retry(len(retry), estimate_tokens([prompt] + [entries[i][1] for i in retry]))
+        # An unparseable response (often truncated) is retried in halves; otherwise
+        # the failed items go out together in one smaller request
+        if parsed is None and len(retry) > 1:
+            middle = len(retry) // 2
+            groups = [retry[:middle], retry[middle:]]
+        else:
+            groups = [retry]
+        await asyncio.gather(*(
+            self._generate_keyed_indexes(prompt, entries, group, schema, results, caller, attempt + 1) for group in groups
+        ))
+
+    async def generate_structured(self, contents, schema: Type[BaseModel], caller: str = None) -> Optional[dict]:
+        """
+        One JSON object validated against `schema`, asked again (up to
+        LLM_OUTPUT_MAX_RETRIES times) while the answer is unparseable or invalid.
+        Returns the validated dict, or None when no valid answer came back.
+        """
+        for attempt in range(settings.LLM_OUTPUT_MAX_RETRIES + 1):
+            try:
+                response = await self._generate(contents, config={'response_mime_type': 'application/json'}, caller=caller)
+            except Exception as e:
+                logger.warning(f"{schema.__name__} generation failed: {e}")
+                structured_output.record_dropped(1)
+                return None
+            parsed = structured_output.parse_json(response.text)
+            result = structured_output.validate_object(parsed, schema)
+            structured_output.record_batch(
+                schema, attempt, 1, int(result is not None), 0, int(result is None and parsed is not None),
+                malformed=parsed is None
+            )
+            if result is not None:
+                return result
+            if attempt < settings.LLM_OUTPUT_MAX_RETRIES:
+                structured_output.record_retry(1, estimate_tokens(contents))
+        structured_output.record_dropped(1)
+        return None
+
+    async def classify_emails_batch(self, emails_data: list, caller: str = None, with_tasks: bool = False):
         """
         Classifies a batch of emails using Gemini.
         Returns a dict mapped by gmail_id with score, category, explanation, confidence.
+        With with_tasks=True the same pass also extracts tasks: each value gains a "task"
+        object (see detect_tasks) for emails scoring 30 or more, so no second call is needed.
         """
         if not emails_data:
             return {}
@@ -62,43 +240,132 @@ class BrainService:
         - explanation (string, max 15 words)
         - confidence (float 0.0-1.0)
         """
+        if with_tasks:
+            prompt += TASK_FIELD_INSTRUCTIONS
         
-        user_content = ""
+        entries = []
         for email in emails_data:
-            user_content += f"ID: {email['gmail_id']}\\nFrom: {email['metadata']['from']}\\nSubject: {email['metadata']['subject']}\\nSnippet: {email['content']['raw_snippet'][:200]}\\n__\\n"
+            snippet = email['content']['raw_snippet'][:200]
+            if with_tasks:
+                # Task extraction needs more of the body than a priority label does
+                snippet = (email['content'].get('cleaned_text') or snippet)[:settings.TASK_BODY_CHARS]
+            entries.append((
+                email['gmail_id'],
+                f"ID: {email['gmail_id']}\nFrom: {email['metadata']['from']}\nSubject: {email['metadata']['subject']}\nSnippet: {snippet}\n__\n"
+            ))
 
-        try:
-            # We use generation config to enforce JSON
-            response = self.client.models.generate_content(
-                model='gemini-2.0-flash',
-                contents=[prompt, user_content],
-                config={
-                    'response_mime_type': 'application/json'
-                }
-            )
-            
-            import json
-            result = json.loads(response.text)
-            return result
-        except Exception as e:
-            logger.error(f"Error classifying batch: {e}")
+        return await self._generate_keyed_json(prompt, entries, EmailClassification, caller=caller)
+
+    async def detect_tasks_batch(self, emails: List[dict], caller: str = None) -> dict:
+        """
+        Batched detect_tasks. emails: [{"gmail_id", "subject", "body"}].
+        Returns {gmail_id: task object as in detect_tasks}; emails the model skipped are absent.
+        """
+        if not emails:
             return {}
 
-    def generate_answer(self, prompt: str):
+        prompt = """
+        Analyze each of the following emails and extract any actionable TASKS, DEADLINES, or MEETING requests.
+        
+        Task Types:
+        - "deadline": Hard deadlines (submission, due by, last date).
+        - "meeting": Requests to meet (zoom, in-person, time slots).
+        - "task": Soft action items (review, read, check).
+        
+        Rules:
+        - If clear date/time is mentioned, extract it in ISO 8601 format (approximate if needed, assume current year 2025).
+        - If "Vertex", "GitHub", "Vercel" mentioned -> Priority "high".
+        - If "Manual" or "Procedure" attachment implied -> Task "Read [Subject] Manual".
+        
+        **Input Format**:
+        ID: <gmail_id>
+        Subject: <subject>
+        Body: <body>
+        __
+        
+        Output JSON: an object keyed by ID, one entry per email:
+        {
+          "<gmail_id>": {
+            "is_task": boolean,
+            "description": "short description",
+            "type": "deadline" | "meeting" | "task" | null,
+            "due_date": "YYYY-MM-DDTHH:MM:SS" | null,
+            "priority": "high" | "medium" | "low"
+          }
+        }
+        """
+        entries = [
+            (email['gmail_id'], f"ID: {email['gmail_id']}\nSubject: {email['subject']}\nBody: {(email['body'] or '')[:settings.TASK_BODY_CHARS]}\n__\n")
+            for email in emails
+        ]
+        return await self._generate_keyed_json(prompt, entries, TaskExtraction, caller=caller)
+
+    async def classify_intent(self, query: str, caller: str = None) -> dict:
+        """
+        LLM intent label for a chat query (JSON mode, no free-text parsing).
+        Returns {"intent", "confidence", "reasoning"}; "chat"/"low" when the call fails.
+        """
+        prompt = """
+        Classify the intent of this user query related to email management.
+        
+        Possible intents:
+        - explain: Asking "why", "how", or requesting explanation about emails/decisions
+        - filter: Asking to show, filter, or find specific emails
+        - teach: Teaching preferences, correcting behavior, setting rules
+        - command: Asking to perform actions (archive, mark, etc.)
+        - chat: General conversation, unrelated questions, creative writing
+        
+        Output JSON:
+        {
+            "intent": "explain" | "filter" | "teach" | "command" | "chat",
+            "confidence": "high" | "medium" | "low",
+            "reasoning": "brief explanation"
+        }
+        """
+        
+        result = await self.generate_structured([prompt, f"Query: {query}"], IntentResult, caller=caller)
+        return result or {"intent": "chat", "confidence": "low", "reasoning": INTENT_FALLBACK_REASONING}
+
+    async def generate_answer(self, prompt: str, caller: str = None):
         """
         Generates a plain text response for a given prompt using Gemini.
         """
         try:
-            response = self.client.models.generate_content(
-                model='gemini-2.0-flash',
-                contents=prompt
-            )
+            response = await self._generate(prompt, caller=caller)
             return response.text
         except Exception as e:
             logger.error(f"Error generating answer: {e}")
             return "I'm sorry, I encountered an error while processing your request."
 
-    def detect_tasks(self, email_text: str):
+    async def stream_answer(self, prompt: str, caller: str = None):
+        """
+        Streams the response to a prompt as text fragments while Gemini generates it.
+        On failure the same apology as generate_answer is yielded, unless text was already sent.
+        """
+        sent = False
+        try:
+            stream = llm_gateway.stream(
+                self.generation_model,
+                lambda: self.client.aio.models.generate_content_stream(
+                    model=self.generation_model,
+                    contents=prompt
+                ),
+                estimated_tokens=estimate_tokens(prompt),
+                caller=caller
+            )
+            # aclosing: a client that disconnects mid-answer frees the gateway slot right away
+            async with aclosing(stream) as chunks:
+                async for chunk in chunks:
+                    text = chunk.text
+                    if text:
+                        sent = True
+                        yield text
+        except Exception as e:
+            logger.error(f"Error streaming answer: {e}")
+            if not sent:
+                yield "I'm sorry, I encountered an error while processing your request."
+
+    async def detect_tasks(self, email_text: str, caller: str = None):
         """
         Analyzes email content to detect tasks.
         Returns a JSON object with:
@@ -131,22 +398,10 @@ class BrainService:
         }
         """
         
-        try:
-            response = self.client.models.generate_content(
-                model='gemini-2.0-flash',
-                contents=[prompt, email_text],
-                config={'response_mime_type': 'application/json'}
-            )
-            import json
-            result = json.loads(response.text)
-            if isinstance(result, list):
-                return result[0] if result else {"is_task": False}
-            return result
-        except Exception as e:
-            logger.error(f"Task detection error: {e}")
-            return {"is_task": False}
+        result = await self.generate_structured([prompt, email_text], TaskExtraction, caller=caller)
+        return result or {"is_task": False}
 
-    def summarize_thread(self, thread_content: str):
+    async def summarize_thread(self, thread_content: str, caller: str = None):
         """
         Summarizes a long email thread.
         """
@@ -161,16 +416,35 @@ class BrainService:
         """
         
         try:
-            response = self.client.models.generate_content(
-                model='gemini-2.0-flash',
-                contents=[prompt, thread_content]
-            )
+            response = await self._generate([prompt, thread_content], caller=caller)
             return response.text
         except Exception as e:
             logger.error(f"Summarization error: {e}")
             return "Unable to generate summary."
 
-    def generate_digest(self, context: str):
+    async def summarize_conversation(self, previous_summary: str, transcript: str, caller: str = None):
+        """
+        Folds older chat turns into the conversation's running summary.
+        Returns None on failure so the caller keeps the previous summary.
+        """
+        prompt = """
+        You maintain the memory of a chat between a user and Kyra, their email assistant.
+        Update the running summary with the new messages below.
+        Keep facts the user stated, preferences, emails/tasks referred to, and open questions.
+        Drop pleasantries. Write at most 120 words, in plain sentences.
+        """
+        
+        try:
+            response = await self._generate(
+                [prompt, f"CURRENT SUMMARY:\n{previous_summary or '(none)'}", f"NEW MESSAGES:\n{transcript}"],
+                caller=caller
+            )
+            return response.text
+        except Exception as e:
+            logger.error(f"Conversation summary error: {e}")
+            return None
+
+    async def generate_digest(self, context: str, caller: str = None):
         """
         Generates a Daily Briefing from a given context of emails and tasks.
         """
@@ -190,10 +464,7 @@ class BrainService:
         """
         
         try:
-            response = self.client.models.generate_content(
-                model='gemini-2.0-flash',
-                contents=[prompt, context]
-            )
+            response = await self._generate([prompt, context], caller=caller)
             return response.text
         except Exception as e:
             logger.error(f"Digest generation error: {e}")
@@ -1,44 +1,35 @@
-from app.core.config import settings
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
+from app.db.models import Account
+from app.services.google_clients import google_clients
 import datetime
 
 class CalendarService:
-    def build_service(self, access_token, refresh_token):
-        # We need ALL scopes here because we might be using tokens that have Gmail + Calendar
-        # The credential object will just use what it has.
-        from app.services.gmail import SCOPES
-        creds = Credentials(
-            token=access_token,
-            refresh_token=refresh_token,
-            token_uri="https://oauth2.googleapis.com/token",
-            client_id=settings.GOOGLE_CLIENT_ID,
-            client_secret=settings.GOOGLE_CLIENT_SECRET,
-            scopes=SCOPES
-        )
-        return build('calendar', 'v3', credentials=creds)
+    async def build_service(self, account: Account):
+        # Built once per account and cached together with its credentials.
+        # We need ALL scopes here because we might be using tokens that have Gmail + Calendar.
+        # Requests go through google_clients.execute (off the event loop, own transport)
+        return await google_clients.calendar(account)
 
-    def list_upcoming_events(self, access_token, refresh_token, days=7):
+    async def list_upcoming_events(self, account: Account, days=7):
         try:
-            service = self.build_service(access_token, refresh_token)
+            service = await self.build_service(account)
             now = datetime.datetime.utcnow().isoformat() + 'Z'  # 'Z' indicates UTC time
             
-            events_result = service.events().list(
+            events_result = await google_clients.execute(account, service.events().list(
                 calendarId='primary', 
                 timeMin=now,
                 maxResults=10, 
                 singleEvents=True,
                 orderBy='startTime'
-            ).execute()
+            ))
             
             return events_result.get('items', [])
         except Exception as e:
             print(f"Calendar List Error: {e}")
             return []
 
-    def create_event(self, access_token, refresh_token, summary, start_time, end_time, description="Created by Kyra"):
+    async def create_event(self, account: Account, summary, start_time, end_time, description="Created by Kyra"):
         try:
-            service = self.build_service(access_token, refresh_token)
+            service = await self.build_service(account)
             
             event = {
                 'summary': summary,
@@ -61,25 +52,25 @@ class CalendarService:
                 },
             }
 
-            event = service.events().insert(calendarId='primary', body=event).execute()
+            event = await google_clients.execute(account, service.events().insert(calendarId='primary', body=event))
             print(f"Event created: {event.get('htmlLink')}")
             return event
         except Exception as e:
             print(f"Calendar Create Error: {e}")
             raise e
 
-    def check_conflicts(self, access_token, refresh_token, start_time, end_time):
+    async def check_conflicts(self, account: Account, start_time, end_time):
         """
         Simple check: fetch events in the window.
         """
         try:
-            service = self.build_service(access_token, refresh_token)
-            events_result = service.events().list(
+            service = await self.build_service(account)
+            events_result = await google_clients.execute(account, service.events().list(
                 calendarId='primary', 
                 timeMin=start_time,
                 timeMax=end_time,
                 singleEvents=True
-            ).execute()
+            ))
             return events_result.get('items', [])
         except Exception:
             return []
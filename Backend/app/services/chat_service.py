@@ -1,56 +1,70 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from sqlalchemy.orm import selectinload
+from app.core.config import settings
 from app.db.models import Email, Conversation, Message
+from app.core.metrics import metrics
+from app.db.session import AsyncSessionLocal
 from app.services.brain import brain_service
+from app.services.search_service import search_service, ChunkHit, SearchHit
+from app.services.intent_classifier import intent_classifier
+from app.services.conversation_memory import conversation_memory
+from app.services.response_cache import response_cache
+from app.core.permissions import accessible_account_ids
 from app.schemas.chat import ChatResponse
+from dataclasses import dataclass, field
+from typing import List, Optional, Union
 from uuid import UUID, uuid4
+import asyncio
+import datetime
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
+GENERATION_FAILED = "I'm having trouble thinking right now. Please check my logs."
+# Error texts from generation; never cached
+FAILED_ANSWERS = {GENERATION_FAILED, "I'm sorry, I encountered an error while processing your request."}
+
+SCHEDULE_KEYWORDS = ["schedule", "tomorrow", "today", "tasks", "due", "deadline", "meeting", "calendar"]
+
+def merge_context_hits(chunk_hits: List[ChunkHit], email_hits: List[SearchHit]) -> List[Union[ChunkHit, SearchHit]]:
+    """
+    Passages and whole emails in one list, best fused score first. Whole emails keep
+    mailboxes (or emails) that are not chunked yet in the context; an email that already
+    contributed a passage is not repeated.
+    """
+    chunked = {hit.chunk.email_id for hit in chunk_hits}
+    hits = list(chunk_hits) + [hit for hit in email_hits if hit.email.id not in chunked]
+    return sorted(hits, key=lambda hit: hit.score, reverse=True)
+
+@dataclass
+class ChatTurn:
+    """State of one chat turn between retrieval and generation."""
+    query: str
+    user_id: str
+    conversation_id: Optional[UUID] = None
+    intent: Optional[str] = None
+    prompt: str = ""
+    sources: List[str] = field(default_factory=list)
+    rejection: Optional[str] = None # refusal text when the intent is not allowed
+    started_at: datetime.datetime = field(default_factory=lambda: datetime.datetime.now(datetime.timezone.utc))
+    cached_response: Optional[str] = None # answer served from the response cache
+    cacheable: bool = False # answer may be stored in the response cache
+    query_embedding: Optional[List[float]] = None
+    account_ids: List = field(default_factory=list)
+
 class ChatService:
     ALLOWED_INTENTS = ["explain", "filter", "teach", "command"]
     
-    def _classify_intent(self, query: str) -> dict:
+    async def _classify_intent(self, query: str, user_id: str = None, embedding=None) -> dict:
         """
         Classify the user's intent from their query.
+        Keyword rules and the query embedding decide most queries locally; the LLM is
+        only asked when they are not confident (see intent_classifier).
         Returns intent classification with allowed/denied flag.
         """
-        intent_prompt = f"""
-        Classify the intent of this user query related to email management:
-        
-        Query: "{query}"
-        
-        Possible intents:
-        - explain: Asking "why", "how", or requesting explanation about emails/decisions
-        - filter: Asking to show, filter, or find specific emails
-        - teach: Teaching preferences, correcting behavior, setting rules
-        - command: Asking to perform actions (archive, mark, etc.)
-        - chat: General conversation, unrelated questions, creative writing
-        
-        Respond in JSON format:
-        {{
-            "intent": "explain" | "filter" | "teach" | "command" | "chat",
-            "confidence": "high" | "medium" | "low",
-            "reasoning": "brief explanation"
-        }}
-        """
-        
-        try:
-            result = brain_service.generate_answer(intent_prompt)
-            import json
-            import re
-            
-            json_match = re.search(r'\{[^}]+\}', result, re.DOTALL)
-            if json_match:
-                intent_data = json.loads(json_match.group())
-            else:
-                intent_data = {"intent": "chat", "confidence": "low", "reasoning": "Could not parse"}
-        except Exception as e:
-            logger.warning(f"Intent classification failed: {e}")
-            intent_data = {"intent": "chat", "confidence": "low", "reasoning": "Classification error"}
-        
+        intent_data = await intent_classifier.classify(query, embedding=embedding, caller=f"chat:{user_id}")
         intent = intent_data.get("intent", "chat")
         is_allowed = intent in self.ALLOWED_INTENTS
         
@@ -58,162 +72,323 @@ class ChatService:
             "intent": intent,
             "is_allowed": is_allowed,
             "confidence": intent_data.get("confidence", "low"),
-            "reasoning": intent_data.get("reasoning", "")
+            "reasoning": intent_data.get("reasoning", ""),
+            "source": intent_data.get("source")
         }
     
-    async def generate_response(self, query: str, user_id: str, db: AsyncSession, conversation_id: UUID = None) -> ChatResponse:
+    async def prepare_turn(self, query: str, user_id: str, db: AsyncSession, conversation_id: UUID = None, use_cache: bool = True) -> ChatTurn:
+        """
+        Everything before generation: intent check, conversation, retrieval and prompt.
+        Intent classification, retrieval (embedding + search) and the schedule lookup run
+        concurrently; retrieval is speculative and cancelled if the intent is rejected or
+        the response cache already has an answer (turn.cached_response).
+        A turn whose intent is rejected carries the refusal and no prompt.
+        """
+        started = time.perf_counter()
+        # One query embedding feeds both retrieval and the intent classifier's centroid tier
+        embedding = asyncio.create_task(self._timed("chat.embedding", brain_service.get_embedding(query, caller=f"chat:{user_id}")))
+        retrieval = asyncio.create_task(self._timed("chat.retrieval", self._retrieve_context(query, user_id, embedding=embedding)))
+        memory = asyncio.create_task(self._timed("chat.memory", conversation_memory.load(conversation_id)))
+        schedule = None
+        if any(k in query.lower() for k in SCHEDULE_KEYWORDS):
+            schedule = asyncio.create_task(self._timed("chat.schedule", self._schedule_context(user_id)))
+        intent_task = asyncio.create_task(self._timed("chat.intent", self._classify_intent(query, user_id, embedding=embedding)))
+        speculative = [task for task in (embedding, retrieval, memory, schedule, intent_task) if task]
+
         try:
-            # 0. Intent Validation
-            intent_classification = self._classify_intent(query)
-            
-            if not intent_classification["is_allowed"]:
-                intent = intent_classification["intent"]
-                error_message = f"I can only help with email management tasks. Your query seems to be: {intent}. "
-                error_message += "I can help you with: explaining email decisions, filtering/finding emails, teaching preferences, or executing commands."
-                error_message += "\n\nPlease rephrase your query to focus on email management."
-                
-                return ChatResponse(
-                    response=error_message,
-                    conversation_id=conversation_id or UUID(str(uuid4())),
-                    conversation_title="Intent Rejected",
-                    sources=[],
-                    intent=intent,
-                    intent_rejected=True
-                )
-            # 1. Manage Conversation
-            if not conversation_id:
-                logger.info(f"Creating new conversation for user {user_id}")
-                try:
-                    conversation = Conversation(
-                        user_id=UUID(user_id),
-                        title=query[:30] + "..." if len(query) > 30 else query
+            # Repeated question: answer from the response cache and drop everything else
+            use_cache = use_cache and settings.RESPONSE_CACHE_ENABLED
+            if not use_cache:
+                metrics.inc("response_cache.bypassed")
+            query_embedding, history = await self._cache_inputs(embedding, memory)
+            cacheable = use_cache and query_embedding is not None and not history
+            if cacheable:
+                hit = response_cache.lookup(user_id, query_embedding)
+                if hit:
+                    await self._cancel(speculative)
+                    conversation_id = await self._ensure_conversation(db, query, user_id, conversation_id)
+                    metrics.observe("chat.prepare", time.perf_counter() - started)
+                    return ChatTurn(
+                        query=query, user_id=user_id, conversation_id=conversation_id,
+                        intent=hit.intent, sources=hit.sources, cached_response=hit.response
                     )
-                    db.add(conversation)
-                    await db.flush()
-                    conversation_id = conversation.id
-                except Exception as e:
-                    logger.error(f"Failed to create conversation: {e}")
-                    raise e
-            
-            # 2. RAG Retrieval
-            logger.info(f"Generating embedding for query: {query}")
-            try:
-                query_embedding = brain_service.get_embedding(query)
-            except Exception as e:
-                logger.error(f"Brain Service Embedding Failed: {e}")
-                query_embedding = None # Fallback to no-context chat
 
-            sources = []
-            context_text = ""
-            
-            if query_embedding:
-                try:
-                    stmt = select(Email).options(selectinload(Email.attachments)).order_by(Email.embedding.cosine_distance(query_embedding)).limit(5)
-                    result = await db.execute(stmt)
-                    relevant_emails = result.scalars().all()
-                    
-                    context_parts = []
-                    for email in relevant_emails:
+            # 0. Intent Validation
+            intent_classification = await intent_task
+        except BaseException:
+            await self._cancel(speculative)
+            raise
+        turn = ChatTurn(
+            query=query, user_id=user_id, conversation_id=conversation_id, intent=intent_classification.get("intent"),
+            cacheable=cacheable, query_embedding=query_embedding
+        )
+
+        if not intent_classification["is_allowed"]:
+            await self._cancel(speculative)
+            metrics.inc("chat.speculation_cancelled")
+            intent = intent_classification["intent"]
+            error_message = f"I can only help with email management tasks. Your query seems to be: {intent}. "
+            error_message += "I can help you with: explaining email decisions, filtering/finding emails, teaching preferences, or executing commands."
+            error_message += "\n\nPlease rephrase your query to focus on email management."
+            turn.conversation_id = conversation_id or UUID(str(uuid4()))
+            turn.rejection = error_message
+            return turn
+
+        # 1. RAG Retrieval and live schedule (already running)
+        context_text, sources, turn.account_ids = await retrieval
+        if schedule:
+            context_text += await schedule
+        try:
+            history_text = conversation_memory.render(await memory)
+        except Exception as e:
+            logger.error(f"Conversation memory load failed: {e}")
+            history_text = ""
+
+        # 2. Manage Conversation (after retrieval, which shares this session)
+        conversation_id = await self._ensure_conversation(db, query, user_id, conversation_id)
+        metrics.observe("chat.prepare", time.perf_counter() - started)
+
+        # 3. Construct Prompt with Persona
+        system_prompt = """
+        You are Kyra, a high-intelligence email intelligence agent for a busy CS student.
+        
+        CORE DIRECTIVES:
+        1. OBJECTIVE TONE: Be helpful but objective. No emotional fluff ("I'm sorry", "I'd love to").
+        2. DATA-BACKED: When answering "Why?", cite specific metadata (Sender, Timestamp, Content).
+        3. SRM PROTOCOL: If the user or context involves '@srmist.edu.in', default to a "Respectful/Professional" tone.
+        4. NO HALLUCINATION: If you don't know, say "I don't have that information".
+        5. AGENTIC GUARDRAILS:
+           - Refuse to answer non-email questions (e.g. "Write a poem").
+           - Never make promises or decisions on behalf of the user (e.g. "I will attend").
+           - Your goal is to *assist*, not *replace* the user's judgment.
+
+        SCHEDULE AWARENESS:
+        You have access to the user's TASKS and CALENDAR EVENTS in the context.
+        If asked about schedule/deadlines, prioritize this data.
+        """
+        
+        history_part = f"\n\nCONVERSATION HISTORY:\n{history_text}" if history_text else ""
+        full_prompt = f"{system_prompt}\n\nCONTEXT:\n{context_text}{history_part}\n\nUSER QUERY: {query}\n\nRESPONSE:"
+
+        turn.conversation_id = conversation_id
+        turn.sources = sources
+        turn.prompt = full_prompt
+        return turn
+
+    async def _ensure_conversation(self, db: AsyncSession, query: str, user_id: str, conversation_id: UUID = None) -> UUID:
+        if conversation_id:
+            return conversation_id
+        logger.info(f"Creating new conversation for user {user_id}")
+        try:
+            conversation = Conversation(
+                user_id=UUID(user_id),
+                title=query[:30] + "..." if len(query) > 30 else query
+            )
+            db.add(conversation)
+            await db.flush()
+            return conversation.id
+        except Exception as e:
+            logger.error(f"Failed to create conversation: {e}")
+            raise e
+
+    async def _cache_inputs(self, embedding, memory):
+        """
+        (query embedding, whether the conversation has history). Answers are only cached
+        and reused for turns without history, since follow-ups depend on earlier turns.
+        """
+        try:
+            query_embedding = await asyncio.shield(embedding)
+        except Exception:
+            query_embedding = None
+        try:
+            loaded = await asyncio.shield(memory)
+            history = bool(loaded.turns or loaded.summary)
+        except Exception:
+            history = True
+        return query_embedding, history
+
+    def _remember(self, turn: ChatTurn, answer_text: str):
+        if turn.cacheable and not turn.cached_response and answer_text not in FAILED_ANSWERS:
+            response_cache.store(
+                turn.user_id, turn.query_embedding, turn.query, answer_text,
+                turn.sources, turn.intent, turn.account_ids
+            )
+
+    async def _retrieve_context(self, query: str, user_id: str, embedding=None):
+        """
+        Searches the caller's mail. `embedding` is the pending query-embedding task, if one
+        was started; otherwise the query is embedded here.
+        Own session: this task runs speculatively and may be cancelled mid-query, which
+        must not leave the request's session unusable.
+        Returns (context_text, sources, account_ids searched).
+        """
+        logger.info(f"Generating embedding for query: {query}")
+        try:
+            if embedding is not None:
+                query_embedding = await asyncio.shield(embedding)
+            else:
+                query_embedding = await self._timed("chat.embedding", brain_service.get_embedding(query, caller=f"chat:{user_id}"))
+        except Exception as e:
+            logger.error(f"Brain Service Embedding Failed: {e}")
+            query_embedding = None # Fallback to lexical-only retrieval
+
+        sources = []
+        context_text = ""
+        account_ids = []
+        
+        async with AsyncSessionLocal() as db:
+            try:
+                # Only the caller's (and their organizations') mailboxes are searched.
+                # Hybrid lexical + vector; lexical only if the embedding call failed.
+                account_ids = await accessible_account_ids(UUID(user_id), db)
+                context_parts = []
+                # Best matching passages (chunk store) fused with whole emails, so emails
+                # not chunked yet (backfill running, newly linked account) are still found
+                chunk_hits = await search_service.search_chunks(
+                    db, query, account_ids,
+                    limit=settings.CHAT_CONTEXT_CHUNKS,
+                    query_embedding=query_embedding
+                )
+                email_hits = await search_service.search(
+                    db, query, account_ids,
+                    limit=5,
+                    mode="hybrid" if query_embedding else "lexical",
+                    query_embedding=query_embedding
+                )
+                for hit in merge_context_hits(chunk_hits, email_hits):
+                    if isinstance(hit, ChunkHit):
+                        email = hit.chunk.email
+                        origin = f"\nAttachment: {hit.chunk.attachment.filename}" if hit.chunk.attachment else ""
+                        snippet = f"From: {email.sender}\nSubject: {email.subject}\nDate: {email.received_at}{origin}\nImp Score: {email.importance_score}\nContent: {hit.chunk.content}"
+                    else:
+                        email = hit.email
                         att_text = ""
                         if email.attachments:
                             att_text = "\nAttachments Content:\n" + "\n".join([f"[{a.filename}]: {a.extracted_text[:400]}..." for a in email.attachments if a.extracted_text])
-                        
+
                         snippet = f"From: {email.sender}\nSubject: {email.subject}\nContent: {email.body_plain[:500]}\n{att_text}\nDate: {email.received_at}\nImp Score: {email.importance_score}\nExplanation: {email.explanation}"
-                        context_parts.append(snippet)
-                        sources.append(email.subject or "No Subject")
-                    
-                    context_text = "\n---\n".join(context_parts)
-                except Exception as e:
-                    logger.error(f"Postgres Vector Search Failed: {e}")
-                
-                # --- PHASE 6: INJECT SCHEDULE ---
-                keywords = ["schedule", "tomorrow", "today", "tasks", "due", "deadline", "meeting", "calendar"]
-                if any(k in query.lower() for k in keywords):
-                    try:
-                        from app.db.models import Task, Account
-                        
-                        stmt_tasks = select(Task).where(Task.user_id == UUID(user_id)).where(Task.status == 'pending').order_by(Task.due_date)
-                        res_tasks = await db.execute(stmt_tasks)
-                        tasks = res_tasks.scalars().all()
-                        
-                        task_list_str = "\n".join([f"- [Task] {t.description} (Due: {t.due_date}, Priority: {t.priority})" for t in tasks])
-                        
-                        stmt_acc = select(Account).where(Account.user_id == UUID(user_id))
-                        res_acc = await db.execute(stmt_acc)
-                        account = res_acc.scalars().first()
-                        
-                        event_list_str = "No calendar account connected."
-                        if account:
-                            try:
-                                from app.services.calendar_service import calendar_service
-                                events = calendar_service.list_upcoming_events(account.access_token, account.refresh_token, days=3)
-                                event_list_str = "\n".join([f"- [Event] {e['summary']} (Start: {e['start'].get('dateTime', e['start'].get('date'))})" for e in events])
-                            except Exception as cal_err:
-                                logger.warning(f"Calendar fetch failed: {cal_err}")
-                                event_list_str = "Error fetching calendar events."
-
-                        context_text += f"\n\n=== OVERRIDE CONTEXT: LIVE SCHEDULE ===\nPENDING TASKS:\n{task_list_str}\n\nUPCOMING EVENTS:\n{event_list_str}\n=======================================\n"
-                    except Exception as e:
-                        logger.error(f"Schedule Injection Failed: {e}")
-
-
-            # 3. Construct Prompt with Persona
-            system_prompt = """
-            You are Kyra, a high-intelligence email intelligence agent for a busy CS student.
-            
-            CORE DIRECTIVES:
-            1. OBJECTIVE TONE: Be helpful but objective. No emotional fluff ("I'm sorry", "I'd love to").
-            2. DATA-BACKED: When answering "Why?", cite specific metadata (Sender, Timestamp, Content).
-            3. SRM PROTOCOL: If the user or context involves '@srmist.edu.in', default to a "Respectful/Professional" tone.
-            4. NO HALLUCINATION: If you don't know, say "I don't have that information".
-            5. AGENTIC GUARDRAILS:
-               - Refuse to answer non-email questions (e.g. "Write a poem").
-               - Never make promises or decisions on behalf of the user (e.g. "I will attend").
-               - Your goal is to *assist*, not *replace* the user's judgment.
-
-            SCHEDULE AWARENESS:
-            You have access to the user's TASKS and CALENDAR EVENTS in the context.
-            If asked about schedule/deadlines, prioritize this data.
-            """
+                    context_parts.append(snippet)
+                    subject = email.subject or "No Subject"
+                    if subject not in sources:
+                        sources.append(subject)
             
-            full_prompt = f"{system_prompt}\n\nCONTEXT:\n{context_text}\n\nUSER QUERY: {query}\n\nRESPONSE:"
-
-            # 4. Generate Answer
-            logger.info("Sending prompt to Brain Service...")
-            try:
-                answer_text = brain_service.generate_answer(full_prompt)
+                context_text = "\n---\n".join(context_parts)
             except Exception as e:
-                logger.error(f"Brain Service Generation Failed: {e}")
-                answer_text = "I'm having trouble thinking right now. Please check my logs."
+                logger.error(f"Email Search Failed: {e}")
+        
+        return context_text, sources, account_ids
 
-            # 5. Persist Chat
+    async def _schedule_context(self, user_id: str) -> str:
+        """
+        Pending tasks and upcoming events, as an override block for the prompt.
+        Runs beside retrieval, so it uses its own session.
+        """
+        # --- PHASE 6: INJECT SCHEDULE ---
+        async with AsyncSessionLocal() as db:
             try:
-                user_msg = Message(conversation_id=conversation_id, role="user", content=query)
-                ai_msg = Message(conversation_id=conversation_id, role="assistant", content=answer_text)
+                from app.db.models import Task, Account
+                
+                stmt_tasks = select(Task).where(Task.user_id == UUID(user_id)).where(Task.status == 'pending').order_by(Task.due_date)
+                res_tasks = await db.execute(stmt_tasks)
+                tasks = res_tasks.scalars().all()
                 
-                db.add(user_msg)
-                db.add(ai_msg)
-                await db.commit()
+                task_list_str = "\n".join([f"- [Task] {t.description} (Due: {t.due_date}, Priority: {t.priority})" for t in tasks])
+                
+                stmt_acc = select(Account).where(Account.user_id == UUID(user_id))
+                res_acc = await db.execute(stmt_acc)
+                account = res_acc.scalars().first()
+                
+                event_list_str = "No calendar account connected."
+                if account:
+                    try:
+                        from app.services.calendar_service import calendar_service
+                        events = await calendar_service.list_upcoming_events(account, days=3)
+                        event_list_str = "\n".join([f"- [Event] {e['summary']} (Start: {e['start'].get('dateTime', e['start'].get('date'))})" for e in events])
+                    except Exception as cal_err:
+                        logger.warning(f"Calendar fetch failed: {cal_err}")
+                        event_list_str = "Error fetching calendar events."
+
+                return f"\n\n=== OVERRIDE CONTEXT: LIVE SCHEDULE ===\nPENDING TASKS:\n{task_list_str}\n\nUPCOMING EVENTS:\n{event_list_str}\n=======================================\n"
             except Exception as e:
-                logger.error(f"Failed to persist chat messages: {e}")
-                # Continue, don't break response just for history
+                logger.error(f"Schedule Injection Failed: {e}")
+        return ""
+
+    async def _timed(self, name: str, awaitable):
+        started = time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            metrics.observe(name, time.perf_counter() - started)
+
+    async def _cancel(self, tasks):
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def finish_turn(self, db: AsyncSession, turn: ChatTurn, answer_text: str) -> str:
+        """Persists the user message and the answer; returns the conversation title."""
+        # 5. Persist Chat
+        try:
+            # Explicit timestamps: both rows share one transaction, so now() would tie them
+            user_msg = Message(conversation_id=turn.conversation_id, role="user", content=turn.query, created_at=turn.started_at)
+            ai_msg = Message(conversation_id=turn.conversation_id, role="assistant", content=answer_text, created_at=datetime.datetime.now(datetime.timezone.utc))
             
-            # Retrieve title
-            try:
-                stmt_conv = select(Conversation).where(Conversation.id == conversation_id)
-                conv_res = await db.execute(stmt_conv)
-                conv = conv_res.scalar_one()
-                conv_title = conv.title
-            except:
-                conv_title = "New Conversation"
+            db.add(user_msg)
+            db.add(ai_msg)
+            await db.commit()
+        except Exception as e:
+            logger.error(f"Failed to persist chat messages: {e}")
+            # Continue, don't break response just for history
+        
+        # Retrieve title
+        try:
+            stmt_conv = select(Conversation).where(Conversation.id == turn.conversation_id)
+            conv_res = await db.execute(stmt_conv)
+            conv = conv_res.scalar_one()
+        except:
+            return "New Conversation"
+
+        try:
+            await conversation_memory.schedule_summary(db, conv)
+        except Exception as e:
+            logger.warning(f"Could not schedule conversation summary: {e}")
+        return conv.title
+
+    async def generate_response(self, query: str, user_id: str, db: AsyncSession, conversation_id: UUID = None, use_cache: bool = True) -> ChatResponse:
+        try:
+            turn = await self.prepare_turn(query, user_id, db, conversation_id, use_cache=use_cache)
+            if turn.rejection:
+                return ChatResponse(
+                    response=turn.rejection,
+                    conversation_id=turn.conversation_id,
+                    conversation_title="Intent Rejected",
+                    sources=[],
+                    intent=turn.intent,
+                    intent_rejected=True
+                )
+
+            # 4. Generate Answer
+            if turn.cached_response:
+                answer_text = turn.cached_response
+            else:
+                logger.info("Sending prompt to Brain Service...")
+                try:
+                    answer_text = await brain_service.generate_answer(turn.prompt, caller=f"chat:{user_id}")
+                except Exception as e:
+                    logger.error(f"Brain Service Generation Failed: {e}")
+                    answer_text = GENERATION_FAILED
+                self._remember(turn, answer_text)
+
+            conv_title = await self.finish_turn(db, turn, answer_text)
 
             return ChatResponse(
                 response=answer_text,
-                conversation_id=conversation_id,
+                conversation_id=turn.conversation_id,
                 conversation_title=conv_title,
-                sources=sources,
-                intent=intent_classification.get("intent"),
-                intent_rejected=False
+                sources=turn.sources,
+                intent=turn.intent,
+                intent_rejected=False,
+                cached=bool(turn.cached_response)
             )
 
         except Exception as e:
@@ -222,4 +397,37 @@ class ChatService:
             traceback.print_exc()
             raise e
 
+    async def stream_response(self, query: str, user_id: str, db: AsyncSession, conversation_id: UUID = None, use_cache: bool = True):
+        """
+        Streaming variant of generate_response. Yields (event, data) pairs:
+        "sources" as soon as retrieval is done, "token" per generated fragment, then "done".
+        Messages are persisted only once the answer is complete.
+        """
+        turn = await self.prepare_turn(query, user_id, db, conversation_id, use_cache=use_cache)
+        yield "sources", {
+            "conversation_id": str(turn.conversation_id),
+            "sources": turn.sources,
+            "intent": turn.intent,
+            "intent_rejected": bool(turn.rejection),
+            "cached": bool(turn.cached_response),
+        }
+        if turn.rejection:
+            yield "token", {"text": turn.rejection}
+            yield "done", {"conversation_id": str(turn.conversation_id), "conversation_title": "Intent Rejected"}
+            return
+
+        if turn.cached_response:
+            yield "token", {"text": turn.cached_response}
+            answer_text = turn.cached_response
+        else:
+            parts = []
+            async for text in brain_service.stream_answer(turn.prompt, caller=f"chat:{user_id}"):
+                parts.append(text)
+                yield "token", {"text": text}
+            answer_text = "".join(parts)
+            self._remember(turn, answer_text)
+
+        conv_title = await self.finish_turn(db, turn, answer_text)
+        yield "done", {"conversation_id": str(turn.conversation_id), "conversation_title": conv_title}
+
 chat_service = ChatService()
@@ -0,0 +1,136 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, delete
+from app.core.config import settings
+from app.db.models import Attachment, Chunk
+from app.db.email_repository import email_repository
+from app.services.brain import brain_service
+from app.services.llm_gateway import estimate_tokens
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+import re
+import uuid
+import logging
+
+logger = logging.getLogger(__name__)
+
+_SENTENCE_END = re.compile(r"[.!?:;]$")
+
+@dataclass
+class TextChunk:
+    index: int
+    text: str
+    tokens: int
+
+def chunk_text(text: str, max_tokens: Optional[int] = None, overlap_tokens: Optional[int] = None, max_chunks: Optional[int] = None) -> List[TextChunk]:
+    """
+    Splits text into windows of at most max_tokens estimated tokens, each starting
+    overlap_tokens before the previous one ended. A window ends at a sentence boundary
+    when one falls in its last quarter, so chunks rarely cut a sentence in half.
+    """
+    max_tokens = max_tokens or settings.CHUNK_MAX_TOKENS
+    overlap_tokens = settings.CHUNK_OVERLAP_TOKENS if overlap_tokens is None else overlap_tokens
+    max_chunks = max_chunks or settings.CHUNK_MAX_PER_DOCUMENT
+    overlap_tokens = min(overlap_tokens, max_tokens // 2)
+
+    words = (text or "").split()
+    if not words:
+        return []
+    costs = [estimate_tokens(word) for word in words]
+
+    chunks = []
+    start = 0
+    while start < len(words) and len(chunks) < max_chunks:
+        end, used, boundary = start, 0, None
+        while end < len(words) and (used + costs[end] <= max_tokens or end == start):
+            used += costs[end]
+            end += 1
+            if _SENTENCE_END.search(words[end - 1]) and used >= max_tokens * 0.75:
+                boundary = end
+        if end < len(words) and boundary:
+            end = boundary
+        window = words[start:end]
+        chunks.append(TextChunk(index=len(chunks), text=" ".join(window), tokens=sum(costs[start:end])))
+        if end >= len(words):
+            break
+        # Step back over the tail of this window to build the overlap
+        back, carried = end, 0
+        while back > start + 1 and carried + costs[back - 1] <= overlap_tokens:
+            back -= 1
+            carried += costs[back]
+        start = back
+    return chunks
+
+class ChunkService:
+    """
+    Builds and stores the chunk store: email bodies and attachment text split into
+    overlapping chunks, each embedded (through the embedding cache) for retrieval.
+    """
+    def build_rows(self, email: dict, attachments: List[dict]) -> List[dict]:
+        """
+        email: {"id", "account_id", "subject", "body"}; attachments: [{"id", "filename", "text"}].
+        Every email gets at least one chunk (its subject) so it is never re-chunked as missing.
+        """
+        subject = email.get("subject") or ""
+        rows = []
+        body_chunks = chunk_text(email.get("body") or "") or [TextChunk(index=0, text="", tokens=0)]
+        for chunk in body_chunks:
+            rows.append({
+                "email_id": email["id"],
+                "attachment_id": None,
+                "account_id": email.get("account_id"),
+                "chunk_index": chunk.index,
+                # The subject travels with every body chunk; it is the best summary we have
+                "content": f"Subject: {subject}\n\n{chunk.text}".strip(),
+                "token_count": chunk.tokens,
+            })
+        for attachment in attachments:
+            for chunk in chunk_text(attachment.get("text") or ""):
+                rows.append({
+                    "email_id": email["id"],
+                    "attachment_id": attachment["id"],
+                    "account_id": email.get("account_id"),
+                    "chunk_index": chunk.index,
+                    "content": f"[{attachment.get('filename')}] {chunk.text}",
+                    "token_count": chunk.tokens,
+                })
+        return rows
+
+    async def index_emails(self, db: AsyncSession, emails: List[dict], caller: Optional[str] = None) -> Tuple[int, int]:
+        """
+        (Re)builds the chunks of the given emails and their attachments; the caller commits.
+        Chunks whose embedding failed are stored without one (still found lexically) and
+        the chunk backfill rebuilds their email later.
+        Returns (chunks written, emails left with an unembedded chunk).
+        """
+        if not emails:
+            return 0, 0
+        email_ids = [email["id"] for email in emails]
+        result = await db.execute(
+            select(Attachment.id, Attachment.email_id, Attachment.filename, Attachment.extracted_text)
+            .where(Attachment.email_id.in_(email_ids), Attachment.extracted_text.is_not(None))
+        )
+        attachments_by_email = {}
+        for attachment_id, email_id, filename, extracted_text in result.all():
+            attachments_by_email.setdefault(email_id, []).append(
+                {"id": attachment_id, "filename": filename, "text": extracted_text}
+            )
+
+        rows = []
+        for email in emails:
+            rows.extend(self.build_rows(email, attachments_by_email.get(email["id"], [])))
+
+        vectors = await brain_service.get_embeddings_batch([row["content"] for row in rows], caller=caller)
+        unembedded = set()
+        for row, vector in zip(rows, vectors):
+            row["id"] = uuid.uuid4()
+            row["embedding"] = vector or None
+            if not vector:
+                unembedded.add(row["email_id"])
+        if unembedded:
+            logger.warning(f"{len(unembedded)} email(s) have chunks without an embedding; left for the chunk backfill")
+
+        await db.execute(delete(Chunk).where(Chunk.email_id.in_(email_ids)))
+        await email_repository.bulk_insert_chunks(db, rows)
+        return len(rows), len(unembedded)
+
+chunk_service = ChunkService()
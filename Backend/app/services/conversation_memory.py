@@ -0,0 +1,122 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.db.models import Conversation, Message
+from app.db.session import AsyncSessionLocal
+from app.services.brain import brain_service
+from app.services.job_queue import job_queue
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+import logging
+import uuid
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_JOB = "conversation_summary"
+
+@dataclass
+class Memory:
+    summary: Optional[str] = None
+    turns: List[Tuple[str, str]] = field(default_factory=list) # (role, content), oldest first
+
+def _clip(text: str, limit: int) -> str:
+    text = text or ""
+    return text if len(text) <= limit else text[:limit] + "..."
+
+def summary_due(total_messages: int, summarized: int, window: int, batch: int) -> bool:
+    """True once at least `batch` messages have left the verbatim window unsummarized."""
+    return total_messages - window - summarized >= batch
+
+class ConversationMemory:
+    """
+    Bounded multi-turn memory per conversation: the last CHAT_MEMORY_TURNS turns verbatim
+    (each message clipped) plus a rolling summary of everything older. The summary is
+    refreshed by a background job once enough messages have left the window, so the chat
+    request never waits on it and the prompt stays the same size however long the chat is.
+    """
+    @property
+    def window(self) -> int:
+        return settings.CHAT_MEMORY_TURNS * 2
+
+    async def load(self, conversation_id) -> Memory:
+        """Own session, so it can run beside retrieval."""
+        if conversation_id is None:
+            return Memory()
+        async with AsyncSessionLocal() as db:
+            summary = (await db.execute(
+                select(Conversation.summary).where(Conversation.id == conversation_id)
+            )).scalar_one_or_none()
+            result = await db.execute(
+                select(Message.role, Message.content)
+                .where(Message.conversation_id == conversation_id)
+                .order_by(Message.created_at.desc())
+                .limit(self.window)
+            )
+            recent = list(reversed(result.all()))
+        return Memory(summary=summary, turns=[(role, content) for role, content in recent])
+
+    def render(self, memory: Memory) -> str:
+        """Prompt section; every part is clipped, so its size has a fixed upper bound."""
+        if not memory.summary and not memory.turns:
+            return ""
+        parts = []
+        if memory.summary:
+            parts.append(f"Earlier in this conversation: {_clip(memory.summary, settings.CHAT_MEMORY_SUMMARY_CHARS)}")
+        for role, content in memory.turns[-self.window:]:
+            parts.append(f"{'User' if role == 'user' else 'Kyra'}: {_clip(content, settings.CHAT_MEMORY_MESSAGE_CHARS)}")
+        return "\n".join(parts)
+
+    async def schedule_summary(self, db: AsyncSession, conversation: Conversation):
+        """Queues a summary refresh when enough messages have aged out of the window."""
+        total = (await db.execute(
+            select(func.count()).select_from(Message).where(Message.conversation_id == conversation.id)
+        )).scalar_one()
+        if not summary_due(total, conversation.summarized_messages or 0, self.window, settings.CHAT_MEMORY_SUMMARY_BATCH):
+            return None
+        return await job_queue.enqueue(
+            SUMMARY_JOB,
+            {"conversation_id": str(conversation.id)},
+            key=f"{SUMMARY_JOB}:{conversation.id}"
+        )
+
+    async def run_summary_job(self, payload: dict) -> dict:
+        """
+        Job handler: folds the messages between the summarized prefix and the verbatim
+        window into the summary. Only those messages are sent, never the whole history.
+        """
+        async with AsyncSessionLocal() as db:
+            conversation = await db.get(Conversation, uuid.UUID(payload["conversation_id"]))
+            if conversation is None:
+                return {"folded": 0}
+            summarized = conversation.summarized_messages or 0
+            total = (await db.execute(
+                select(func.count()).select_from(Message).where(Message.conversation_id == conversation.id)
+            )).scalar_one()
+            fold = total - self.window - summarized
+            if fold <= 0:
+                return {"folded": 0}
+            result = await db.execute(
+                select(Message.role, Message.content)
+                .where(Message.conversation_id == conversation.id)
+                .order_by(Message.created_at)
+                .offset(summarized)
+                .limit(fold)
+            )
+            transcript = "\n".join(
+                f"{'User' if role == 'user' else 'Kyra'}: {_clip(content, settings.CHAT_MEMORY_MESSAGE_CHARS)}"
+                for role, content in result.all()
+            )
+            summary = await brain_service.summarize_conversation(
+                conversation.summary, transcript, caller=f"chat:{conversation.user_id}"
+            )
+            if summary is None:
+                # Let the job queue retry; the previous summary stays in place meanwhile
+                raise RuntimeError(f"Summary for conversation {conversation.id} failed")
+            conversation.summary = _clip(summary.strip(), settings.CHAT_MEMORY_SUMMARY_CHARS)
+            conversation.summarized_messages = summarized + fold
+            await db.commit()
+        metrics.inc("chat.memory_summaries")
+        return {"folded": fold}
+
+conversation_memory = ConversationMemory()
@@ -4,6 +4,7 @@ from app.db.models import Email, DailyDigest, Task, Account
 from app.services.brain import brain_service
 from app.services.gmail import gmail_service
 from app.services.calendar_service import calendar_service
+from app.services.sender_profiles import sender_profile_service, sender_address
 import datetime
 
 class DigestService:
@@ -25,6 +26,13 @@ class DigestService:
             .where(Email.account.has(user_id=user_id))
         )
         emails = result.scalars().all()
+        # Senders the user engages with lead the briefing
+        profiles = await sender_profile_service.get_many(db, user_id, (e.sender for e in emails))
+        emails = sorted(
+            emails,
+            key=lambda e: e.importance_score + sender_profile_service.rank_boost(profiles.get(sender_address(e.sender))),
+            reverse=True
+        )
         
         # 2. Fetch Tasks (Pending)
         result = await db.execute(
@@ -40,11 +48,7 @@ class DigestService:
         
         if account and account.access_token and account.refresh_token:
             try:
-                events = calendar_service.list_upcoming_events(
-                    account.access_token,
-                    account.refresh_token,
-                    days=1
-                )
+                events = await calendar_service.list_upcoming_events(account, days=1)
                 today = datetime.datetime.now().date()
                 for event in events:
                     start = event.get('start', {}).get('dateTime') or event.get('start', {}).get('date')
@@ -90,7 +94,7 @@ class DigestService:
             context += f"- {summary} at {time_str}\n"
             
         # Generate Digest
-        digest_content = brain_service.generate_digest(context)
+        digest_content = await brain_service.generate_digest(context, caller=f"digest:{user_id}")
         
         # Save
         today = datetime.datetime.now().date()
@@ -45,7 +45,7 @@ class DraftService:
         full_prompt = f"{system_prompt}\n\nCONTEXT:{context_text}\n\nUSER INSTRUCTIONS: {user_prompt}\n\nDRAFT BODY:"
         
         # 3. Generate
-        draft_body = brain_service.generate_answer(full_prompt)
+        draft_body = await brain_service.generate_answer(full_prompt, caller=f"draft:{thread_id}")
         
         return {
             "draft_body": draft_body,
@@ -0,0 +1,120 @@
+import array
+import hashlib
+import logging
+import re
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import select, any_, bindparam, String
+from sqlalchemy.dialects.postgresql import ARRAY, insert as pg_insert
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.db.models import EmbeddingCacheEntry
+from app.db.session import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+
+def normalize_text(text: str) -> str:
+    """
+    Canonical form used for the cache key: NFKC, collapsed whitespace, trimmed.
+    Case is kept, since it can change the embedding.
+    """
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFKC", text or "")).strip()
+
+def cache_key(model: str, dimensions: int, text: str) -> str:
+    digest = hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+    return f"{model}:{dimensions}:{digest}"
+
+class EmbeddingCache:
+    """
+    Content-addressed embedding cache: an in-process LRU in front of the
+    embedding_cache table. Vectors are held as float32 arrays to keep the LRU small.
+    Database errors are logged and treated as misses; the cache never fails a request.
+    """
+    def __init__(self, max_entries: Optional[int] = None, persist: Optional[bool] = None):
+        self.max_entries = max_entries or settings.EMBED_CACHE_LRU_SIZE
+        self.persist = settings.EMBED_CACHE_PERSIST if persist is None else persist
+        self._lru: "OrderedDict[str, array.array]" = OrderedDict()
+
+    def _remember(self, key: str, vector):
+        self._lru[key] = array.array("f", vector)
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+
+    async def get_many(self, keys: Iterable[str]) -> Dict[str, list]:
+        """Returns {key: vector} for the keys found in the LRU or the table."""
+        found = {}
+        missing = []
+        for key in dict.fromkeys(keys):
+            vector = self._lru.get(key)
+            if vector is not None:
+                self._lru.move_to_end(key)
+                found[key] = vector.tolist()
+            else:
+                missing.append(key)
+        metrics.inc("embedding_cache.lru_hits", len(found))
+
+        db_hits = 0
+        if missing and self.persist:
+            try:
+                async with AsyncSessionLocal() as db:
+                    result = await db.execute(
+                        select(EmbeddingCacheEntry.key, EmbeddingCacheEntry.embedding).where(
+                            EmbeddingCacheEntry.key == any_(bindparam("keys", missing, type_=ARRAY(String)))
+                        )
+                    )
+                    rows = result.all()
+                for key, vector in rows:
+                    vector = list(vector)
+                    self._remember(key, vector)
+                    found[key] = vector
+                db_hits = len(rows)
+                metrics.inc("embedding_cache.db_hits", db_hits)
+            except Exception as e:
+                logger.warning(f"Embedding cache lookup failed: {e}")
+
+        metrics.inc("embedding_cache.misses", len(missing) - db_hits)
+        return found
+
+    async def put_many(self, entries: Dict[str, list], model: str, dimensions: int):
+        if not entries:
+            return
+        for key, vector in entries.items():
+            self._remember(key, vector)
+        if not self.persist:
+            return
+        rows = [
+            {"key": key, "model": model, "dimensions": dimensions, "embedding": list(vector)}
+            for key, vector in entries.items()
+        ]
+        try:
+            async with AsyncSessionLocal() as db:
+                for i in range(0, len(rows), 500):
+                    await db.execute(
+                        pg_insert(EmbeddingCacheEntry)
+                        .values(rows[i:i + 500])
+                        .on_conflict_do_nothing(index_elements=["key"])
+                    )
+                await db.commit()
+        except Exception as e:
+            logger.warning(f"Embedding cache write failed: {e}")
+
+    def stats(self) -> dict:
+        lru_hits = metrics.get("embedding_cache.lru_hits")
+        db_hits = metrics.get("embedding_cache.db_hits")
+        misses = metrics.get("embedding_cache.misses")
+        lookups = lru_hits + db_hits + misses
+        return {
+            "lru_entries": len(self._lru),
+            "lru_hits": lru_hits,
+            "db_hits": db_hits,
+            "misses": misses,
+            "hit_rate": (lru_hits + db_hits) / lookups if lookups else 0.0,
+        }
+
+embedding_cache = EmbeddingCache()
@@ -1,5 +1,7 @@
 import os
 import json
+import asyncio
+import base64
 from google_auth_oauthlib.flow import Flow
 from google.oauth2.credentials import Credentials
 from googleapiclient.discovery import build
@@ -17,6 +19,60 @@ SCOPES = [
     'openid'
 ]
 
+HISTORY_TYPES = ['messageAdded', 'messageDeleted', 'labelAdded', 'labelRemoved']
+# messages.list skips these by default, so the delta sync does too
+SKIPPED_LABELS = {'SPAM', 'TRASH'}
+
+class HistoryExpiredError(Exception):
+    """Raised when the stored historyId is too old for users.history.list (HTTP 404)."""
+    def __init__(self, history_id):
+        super().__init__(f"History id {history_id} is no longer available")
+        self.history_id = history_id
+
+class HistoryDelta:
+    """
+    Folds users.history.list pages into the net change since a history id:
+    a message added then deleted is dropped, label deltas cancel out, and
+    label changes are not reported for messages that were added or deleted.
+    """
+    def __init__(self, start_history_id):
+        self.added, self.deleted = {}, set()
+        self.labels_added, self.labels_removed = {}, {}
+        self.history_id = start_history_id
+
+    def add_page(self, response: dict):
+        for record in response.get('history', []):
+            for item in record.get('messagesAdded', []):
+                msg = item['message']
+                if SKIPPED_LABELS.isdisjoint(msg.get('labelIds', [])):
+                    self.added[msg['id']] = msg.get('threadId')
+                    self.deleted.discard(msg['id'])
+            for item in record.get('messagesDeleted', []):
+                msg_id = item['message']['id']
+                self.added.pop(msg_id, None)
+                self.deleted.add(msg_id)
+            for item in record.get('labelsAdded', []):
+                msg_id = item['message']['id']
+                self.labels_added.setdefault(msg_id, set()).update(item.get('labelIds', []))
+                self.labels_removed.get(msg_id, set()).difference_update(item.get('labelIds', []))
+            for item in record.get('labelsRemoved', []):
+                msg_id = item['message']['id']
+                self.labels_removed.setdefault(msg_id, set()).update(item.get('labelIds', []))
+                self.labels_added.get(msg_id, set()).difference_update(item.get('labelIds', []))
+        self.history_id = response.get('historyId', self.history_id)
+
+    def result(self) -> dict:
+        for msg_id in list(self.added) + list(self.deleted):
+            self.labels_added.pop(msg_id, None)
+            self.labels_removed.pop(msg_id, None)
+        return {
+            "added": list(self.added),
+            "deleted": list(self.deleted),
+            "labels_added": self.labels_added,
+            "labels_removed": self.labels_removed,
+            "history_id": self.history_id
+        }
+
 class GmailService:
     def __init__(self):
         self.client_config = {
@@ -50,7 +106,8 @@ class GmailService:
             scopes=SCOPES,
             redirect_uri=settings.GOOGLE_REDIRECT_URI
         )
-        flow.fetch_token(code=code)
+        # Token exchange is a blocking HTTP call; keep it off the event loop
+        await asyncio.to_thread(flow.fetch_token, code=code)
         credentials = flow.credentials
         return credentials
 
@@ -60,46 +117,6 @@ class GmailService:
     def get_profile(self, service):
         return service.users().getProfile(userId='me').execute()
     
-    def fetch_emails(self, service, limit=50):
-        """
-        Fetches the last N emails.
-        """
-        # Removed try-except to debug errors
-        results = service.users().messages().list(userId='me', maxResults=limit).execute()
-        messages = results.get('messages', [])
-        
-        email_data_list = []
-        
-        if not messages:
-            print("No messages found.")
-            return []
-        
-        # Chunk messages to avoid 429 (Too many concurrent requests)
-        chunk_size = 10
-        for i in range(0, len(messages), chunk_size):
-            chunk = messages[i:i + chunk_size]
-            batch = service.new_batch_http_request()
-            
-            # Helper to process batch response
-            def callback(request_id, response, exception):
-                if exception:
-                    print(f"Error fetching message {request_id}: {exception}")
-                    # Don't raise, just log. We want partial success.
-                else:
-                    email_data_list.append(self.format_email(response))
-
-            for msg in chunk:
-                batch.add(service.users().messages().get(userId='me', id=msg['id'], format='full'), callback=callback)
-            
-            import time
-            try:
-                batch.execute()
-                time.sleep(0.5) # Be gentle
-            except Exception as e:
-                print(f"Batch execution error: {e}")
-
-        return email_data_list
-
     def format_email(self, msg):
         from app.services.parser import EmailParser
         import base64
@@ -153,7 +170,10 @@ class GmailService:
                 "from": get_header("From"),
                 "to": [t.strip() for t in get_header("To").split(",")] if get_header("To") else [],
                 "subject": get_header("Subject"),
-                "timestamp": timestamp_iso
+                "timestamp": timestamp_iso,
+                # Bulk-mail signals for the pre-classifier
+                "list_unsubscribe": bool(get_header("List-Unsubscribe")),
+                "precedence": get_header("Precedence").lower()
             },
             "content": {
                 "cleaned_text": body,
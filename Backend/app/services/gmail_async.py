@@ -0,0 +1,299 @@
+import asyncio
+import base64
+import importlib.util
+import logging
+from typing import List, Optional
+
+import httpx
+from google.auth.transport.requests import Request
+
+from app.core.config import settings
+from app.services.gmail import gmail_service, HistoryDelta, HistoryExpiredError, HISTORY_TYPES
+from app.services.gmail_quota import gmail_quotas, QUOTA_UNITS, is_retryable, backoff_delay
+
+logger = logging.getLogger(__name__)
+
+# The message was deleted between being listed and being fetched
+GONE_STATUSES = (404, 410)
+
+class GmailSession:
+    """
+    Per-account handle passed as `service` to every AsyncGmailService call.
+    Holds the OAuth credentials and refreshes the access token when it expires.
+    """
+    def __init__(self, credentials, account_key: Optional[str] = None):
+        self.credentials = credentials
+        self.quota = gmail_quotas.for_account(account_key)
+        # Per-session counters. 'dropped': message ids given up on after exhausting retries
+        # on transient errors (worth listing again); 'gone': deleted before they could be
+        # fetched (404/410); 'failed': other permanent errors
+        self.stats = {"requests": 0, "retries": 0, "throttled": 0, "dropped": [], "gone": [], "failed": []}
+        self._refresh_lock = asyncio.Lock()
+
+    async def auth_headers(self, force_refresh: bool = False) -> dict:
+        if force_refresh or not self.credentials.valid:
+            async with self._refresh_lock:
+                if force_refresh or not self.credentials.valid:
+                    # google-auth refresh is a blocking HTTP call
+                    await asyncio.to_thread(self.credentials.refresh, Request())
+        return {"Authorization": f"Bearer {self.credentials.token}"}
+
+class AsyncGmailService:
+    """
+    Non-blocking Gmail REST client used for sync, fetching and sending.
+    One pooled httpx.AsyncClient is shared by every account, so connections are reused
+    (HTTP/2 when the 'h2' package is installed, keep-alive otherwise) and message gets
+    for many syncs run concurrently on a single event loop.
+    """
+    def __init__(self, base_url: Optional[str] = None, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.base_url = (base_url or settings.GMAIL_API_BASE_URL).rstrip("/")
+        self.transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                http2=self.transport is None and importlib.util.find_spec("h2") is not None,
+                timeout=httpx.Timeout(settings.GMAIL_HTTP_TIMEOUT_SECONDS),
+                limits=httpx.Limits(
+                    max_connections=settings.GMAIL_HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.GMAIL_HTTP_MAX_CONNECTIONS
+                ),
+                transport=self.transport
+            )
+        return self._client
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def build_service(self, credentials, account_key: Optional[str] = None) -> GmailSession:
+        """account_key (the Account id) selects the per-account quota bucket."""
+        return GmailSession(credentials, account_key)
+
+    async def _request(self, service: GmailSession, method: str, path: str, cost: str, retries: Optional[int] = None, **kwargs) -> dict:
+        """
+        Sends one API call after reserving its quota units. Throttling (429, 403 rate limit)
+        and 5xx responses are retried with jittered exponential backoff.
+        """
+        retries = settings.GMAIL_MAX_RETRIES if retries is None else retries
+        attempt = 0
+        while True:
+            wait = service.quota.bucket.reserve(QUOTA_UNITS[cost])
+            if wait:
+                await asyncio.sleep(wait)
+            headers = await service.auth_headers()
+            service.stats["requests"] += 1
+            response = await self.client.request(method, path, headers=headers, **kwargs)
+            if response.status_code == 401:
+                # Token revoked or expired early; refresh once and retry
+                headers = await service.auth_headers(force_refresh=True)
+                response = await self.client.request(method, path, headers=headers, **kwargs)
+
+            if is_retryable(response.status_code, response.text):
+                service.stats["throttled"] += 1
+                if attempt < retries:
+                    attempt += 1
+                    service.stats["retries"] += 1
+                    retry_after = response.headers.get("Retry-After")
+                    delay = float(retry_after) if retry_after and retry_after.isdigit() else backoff_delay(attempt)
+                    await asyncio.sleep(delay)
+                    continue
+            response.raise_for_status()
+            return response.json()
+
+    async def get_profile(self, service: GmailSession) -> dict:
+        return await self._request(service, "GET", "/users/me/profile", cost="getProfile")
+
+    async def list_message_ids(self, service: GmailSession, limit: int = 50) -> List[str]:
+        """
+        Lists the ids of the latest N messages without fetching them.
+        """
+        results = await self._request(service, "GET", "/users/me/messages", cost="messages.list", params={"maxResults": limit})
+        return [msg['id'] for msg in results.get('messages', [])]
+
+    async def fetch_emails(self, service: GmailSession, limit: int = 50) -> List[dict]:
+        """
+        Fetches the last N emails.
+        """
+        message_ids = await self.list_message_ids(service, limit)
+        if not message_ids:
+            return []
+        return await self.fetch_messages_by_id(service, message_ids)
+
+    async def get_message(self, service: GmailSession, message_id: str, retries: Optional[int] = None) -> dict:
+        # Retries are handled per batch by fetch_messages_by_id
+        msg = await self._request(
+            service, "GET", f"/users/me/messages/{message_id}",
+            cost="messages.get", retries=retries, params={"format": "full"}
+        )
+        return gmail_service.format_email(msg)
+
+    async def fetch_messages_by_id(self, service: GmailSession, message_ids: List[str], dropped: Optional[list] = None) -> List[dict]:
+        """
+        Fetches and formats the given messages with concurrent 'full' gets.
+        Batch size adapts per account (grows while clean, halves on 429/5xx).
+        Retryable failures go back in the queue with jittered backoff; messages still failing
+        after GMAIL_MAX_RETRIES are recorded in `dropped` (default service.stats['dropped']).
+        Messages deleted in the meantime (404/410) go to service.stats['gone'] and other
+        permanent errors to service.stats['failed']; retrying those would never help.
+        """
+        dropped = service.stats["dropped"] if dropped is None else dropped
+        pending = list(message_ids)
+        attempts = {}
+        email_data_list = []
+
+        async def fetch_one(message_id):
+            try:
+                return await self.get_message(service, message_id, retries=0), None
+            except httpx.HTTPStatusError as e:
+                status = e.response.status_code
+                if status in GONE_STATUSES:
+                    return None, "gone"
+                return None, status if is_retryable(status, e.response.text) else None
+            except httpx.TransportError:
+                return None, 0 # connection-level errors are retryable too
+            except Exception as e:
+                logger.error(f"Error fetching message {message_id}: {e}")
+                return None, None
+
+        while pending:
+            size = service.quota.batch.size
+            batch, pending = pending[:size], pending[size:]
+            outcomes = await asyncio.gather(*(fetch_one(mid) for mid in batch))
+
+            retry, throttled = [], False
+            for message_id, (doc, retry_status) in zip(batch, outcomes):
+                if doc is not None:
+                    email_data_list.append(doc)
+                    continue
+                if retry_status == "gone":
+                    logger.info(f"Message {message_id} no longer exists; skipping")
+                    service.stats["gone"].append(message_id)
+                    continue
+                if retry_status is None:
+                    logger.error(f"Giving up on message {message_id} (permanent error)")
+                    service.stats["failed"].append(message_id)
+                    continue
+                throttled = True
+                attempts[message_id] = attempts.get(message_id, 0) + 1
+                if attempts[message_id] <= settings.GMAIL_MAX_RETRIES:
+                    retry.append(message_id)
+                    continue
+                logger.error(f"Dropping message {message_id} after {attempts.get(message_id, 0)} retries")
+                dropped.append(message_id)
+
+            if throttled:
+                service.quota.batch.on_throttle()
+            else:
+                service.quota.batch.on_success()
+
+            if retry:
+                service.stats["retries"] += len(retry)
+                await asyncio.sleep(backoff_delay(max(attempts[mid] for mid in retry)))
+                pending = retry + pending
+
+        return email_data_list
+
+    async def list_history(self, service: GmailSession, start_history_id: str) -> dict:
+        """
+        Lists mailbox changes since start_history_id using users.history.list.
+        Returns a dict with:
+        - added: message ids added to the mailbox (still present)
+        - deleted: message ids removed from the mailbox
+        - labels_added / labels_removed: {message_id: set(label_ids)}
+        - history_id: latest history id of the mailbox
+        Raises HistoryExpiredError if Gmail no longer holds history that far back.
+        """
+        delta = HistoryDelta(start_history_id)
+        page_token = None
+
+        while True:
+            params = {"startHistoryId": start_history_id, "historyTypes": HISTORY_TYPES}
+            if page_token:
+                params["pageToken"] = page_token
+            try:
+                response = await self._request(service, "GET", "/users/me/history", cost="history.list", params=params)
+            except httpx.HTTPStatusError as e:
+                if e.response.status_code == 404:
+                    raise HistoryExpiredError(start_history_id) from e
+                raise
+
+            delta.add_page(response)
+            page_token = response.get('nextPageToken')
+            if not page_token:
+                break
+
+        return delta.result()
+
+    async def sync_changes(self, service: GmailSession, last_sync_id=None, full_sync_limit=50, fetch_messages=True) -> dict:
+        """
+        Returns the mailbox delta since last_sync_id.
+        Uses users.history.list when a history id is known and falls back to a
+        bounded full resync (latest full_sync_limit messages) when it is missing or expired.
+        With fetch_messages=False only the ids in 'added' are returned, so the caller can
+        fetch them itself (the ingestion pipeline fetches in chunks as a stage).
+        """
+        changes = None
+        if last_sync_id:
+            try:
+                changes = await self.list_history(service, last_sync_id)
+                changes["mode"] = "delta"
+            except HistoryExpiredError:
+                logger.info(f"History {last_sync_id} expired, falling back to full resync of {full_sync_limit} messages.")
+
+        if changes is None:
+            profile = await self.get_profile(service)
+            changes = {
+                "mode": "full",
+                "added": await self.list_message_ids(service, full_sync_limit),
+                "deleted": [],
+                "labels_added": {},
+                "labels_removed": {},
+                "history_id": profile.get('historyId')
+            }
+
+        changes["emails"] = []
+        if fetch_messages and changes["added"]:
+            changes["emails"] = await self.fetch_messages_by_id(service, changes["added"])
+        return changes
+
+    async def get_attachment_content(self, service: GmailSession, message_id: str, attachment_id: str) -> Optional[bytes]:
+        """
+        Fetches the raw content of an attachment.
+        """
+        try:
+            attachment_data = await self._request(
+                service, "GET", f"/users/me/messages/{message_id}/attachments/{attachment_id}",
+                cost="attachments.get"
+            )
+            data = attachment_data.get('data')
+            if data:
+                return base64.urlsafe_b64decode(data)
+            return None
+        except Exception as e:
+            logger.error(f"Error fetching attachment content: {e}")
+            return None
+
+    async def send_email(self, service: GmailSession, to_email: str, subject: str, body_text: str, thread_id: Optional[str] = None) -> dict:
+        """
+        Sends an email using the Gmail API.
+        """
+        from email.mime.text import MIMEText
+
+        message = MIMEText(body_text)
+        message['to'] = to_email
+        message['subject'] = subject
+
+        body = {'raw': base64.urlsafe_b64encode(message.as_bytes()).decode()}
+        if thread_id:
+            body['threadId'] = thread_id
+
+        sent = await self._request(service, "POST", "/users/me/messages/send", cost="messages.send", json=body)
+        logger.info(f"Message sent: {sent['id']}")
+        return sent
+
+async_gmail_service = AsyncGmailService()
@@ -0,0 +1,95 @@
+import random
+import threading
+import time
+from typing import Dict, Optional
+
+from app.core.config import settings
+
+# Gmail API quota units per method (https://developers.google.com/gmail/api/reference/quota)
+QUOTA_UNITS = {
+    "getProfile": 1,
+    "history.list": 2,
+    "messages.list": 5,
+    "messages.get": 5,
+    "attachments.get": 5,
+    "messages.send": 100,
+}
+
+# Statuses worth retrying: throttling and transient server errors
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+# Gmail reports per-user throttling as 403 with one of these reasons
+RATE_LIMIT_REASONS = ("rateLimitExceeded", "userRateLimitExceeded")
+
+def is_retryable(status: int, body: str = "") -> bool:
+    if status in RETRYABLE_STATUSES:
+        return True
+    return status == 403 and any(reason in body for reason in RATE_LIMIT_REASONS)
+
+def backoff_delay(attempt: int, base: Optional[float] = None, cap: Optional[float] = None) -> float:
+    """Full-jitter exponential backoff for the given attempt (1-based)."""
+    base = settings.GMAIL_BACKOFF_BASE_SECONDS if base is None else base
+    cap = settings.GMAIL_BACKOFF_MAX_SECONDS if cap is None else cap
+    return random.uniform(0, min(cap, base * (2 ** (attempt - 1))))
+
+class TokenBucket:
+    """
+    Token bucket measured in quota units. `reserve` books the units and returns how
+    long the caller must wait before spending them, so it serves both blocking and
+    async callers without holding a lock while sleeping.
+    """
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, units: float) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= units
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+class AdaptiveBatchSize:
+    """
+    AIMD controller for how many message gets go out together: grow by one after
+    each clean batch, halve on throttling or server errors.
+    """
+    def __init__(self, initial: int, minimum: int = 1, maximum: int = 100):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.size = max(minimum, min(initial, maximum))
+
+    def on_success(self):
+        self.size = min(self.maximum, self.size + 1)
+
+    def on_throttle(self):
+        self.size = max(self.minimum, self.size // 2)
+
+class AccountQuota:
+    def __init__(self):
+        self.bucket = TokenBucket(settings.GMAIL_QUOTA_UNITS_PER_SECOND, settings.GMAIL_QUOTA_BURST_UNITS)
+        self.batch = AdaptiveBatchSize(
+            settings.GMAIL_INITIAL_BATCH_SIZE,
+            maximum=settings.GMAIL_MAX_CONCURRENT_GETS
+        )
+
+class QuotaRegistry:
+    """Per-account quota state, shared by every sync and send for that account in this process."""
+    def __init__(self):
+        self._quotas: Dict[str, AccountQuota] = {}
+        self._lock = threading.Lock()
+
+    def for_account(self, account_key: Optional[str]) -> AccountQuota:
+        if not account_key:
+            return AccountQuota()
+        with self._lock:
+            if account_key not in self._quotas:
+                self._quotas[account_key] = AccountQuota()
+            return self._quotas[account_key]
+
+gmail_quotas = QuotaRegistry()
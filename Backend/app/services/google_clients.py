@@ -0,0 +1,130 @@
+import asyncio
+import datetime
+import logging
+from collections import OrderedDict
+
+import httplib2
+from google.auth.transport.requests import Request
+from google.oauth2.credentials import Credentials
+from google_auth_httplib2 import AuthorizedHttp
+from googleapiclient.discovery import build
+from sqlalchemy import update
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app.core.config import settings
+from app.db.models import Account
+from app.db.session import AsyncSessionLocal
+from app.services.gmail import SCOPES
+from app.services.gmail_async import async_gmail_service, GmailSession
+
+logger = logging.getLogger(__name__)
+
+class _CachedClient:
+    def __init__(self, account: Account):
+        self.refresh_token = account.refresh_token
+        self.credentials = Credentials(
+            token=account.access_token,
+            refresh_token=account.refresh_token,
+            token_uri="https://oauth2.googleapis.com/token",
+            client_id=settings.GOOGLE_CLIENT_ID,
+            client_secret=settings.GOOGLE_CLIENT_SECRET,
+            scopes=SCOPES
+        )
+        self.credentials.expiry = _naive_utc(account.expires_at)
+        self.services = {}
+        self.lock = asyncio.Lock()
+
+def _naive_utc(value):
+    # google-auth compares expiry against a naive UTC datetime
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+
+class GoogleClientCache:
+    """
+    Per-account LRU cache of OAuth credentials and discovery-built API clients.
+    Tokens are refreshed only when they are close to expiry, and refreshed tokens are
+    written back to Account.access_token / expires_at in a session of their own, so the
+    caller's transaction is never committed from here.
+    """
+    def __init__(self, max_accounts: int = None):
+        self.max_accounts = max_accounts or settings.GOOGLE_CLIENT_CACHE_SIZE
+        self._entries: "OrderedDict[str, _CachedClient]" = OrderedDict()
+
+    def _entry(self, account: Account) -> _CachedClient:
+        key = str(account.id)
+        entry = self._entries.get(key)
+        if entry is None or entry.refresh_token != account.refresh_token:
+            # New account or re-authorised with a new refresh token
+            entry = _CachedClient(account)
+            self._entries[key] = entry
+        elif account.expires_at and entry.credentials.expiry and _naive_utc(account.expires_at) > entry.credentials.expiry:
+            # Another process refreshed the token more recently
+            entry.credentials.token = account.access_token
+            entry.credentials.expiry = _naive_utc(account.expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_accounts:
+            self._entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, account_id):
+        self._entries.pop(str(account_id), None)
+
+    def _needs_refresh(self, credentials: Credentials) -> bool:
+        if not credentials.token or credentials.expiry is None:
+            return True
+        margin = datetime.timedelta(seconds=settings.GOOGLE_TOKEN_REFRESH_MARGIN_SECONDS)
+        return credentials.expiry - datetime.datetime.utcnow() < margin
+
+    async def _save_token(self, account_id, token: str, expires_at):
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                update(Account).where(Account.id == account_id).values(access_token=token, expires_at=expires_at)
+            )
+            await db.commit()
+
+    async def credentials(self, account: Account) -> Credentials:
+        entry = self._entry(account)
+        async with entry.lock:
+            creds = entry.credentials
+            if self._needs_refresh(creds):
+                logger.info(f"Refreshing Google token for account {account.id}")
+                # google-auth refresh is a blocking HTTP call
+                await asyncio.to_thread(creds.refresh, Request())
+            if creds.token != account.access_token:
+                # Refreshed here or in-place by a GmailSession on a 401
+                expires_at = creds.expiry.replace(tzinfo=datetime.timezone.utc) if creds.expiry else None
+                await self._save_token(account.id, creds.token, expires_at)
+                # Already stored: the caller's copy is updated without becoming dirty
+                set_committed_value(account, "access_token", creds.token)
+                set_committed_value(account, "expires_at", expires_at)
+        return creds
+
+    async def gmail_session(self, account: Account) -> GmailSession:
+        """
+        A fresh GmailSession (per-call stats) sharing the account's cached credentials.
+        """
+        creds = await self.credentials(account)
+        return async_gmail_service.build_service(creds, account_key=str(account.id))
+
+    async def calendar(self, account: Account):
+        """
+        The account's Calendar v3 client, built from the discovery document once per account.
+        Run its requests through execute(): the client's own transport must not be shared.
+        """
+        creds = await self.credentials(account)
+        entry = self._entry(account)
+        if "calendar" not in entry.services:
+            entry.services["calendar"] = build('calendar', 'v3', credentials=creds, cache_discovery=False)
+        return entry.services["calendar"]
+
+    async def execute(self, account: Account, request):
+        """
+        Executes a googleapiclient request in a worker thread. httplib2 is blocking and not
+        thread-safe, so each call gets its own transport around the shared credentials.
+        """
+        creds = await self.credentials(account)
+        http = AuthorizedHttp(creds, http=httplib2.Http())
+        return await asyncio.to_thread(request.execute, http=http)
+
+google_clients = GoogleClientCache()
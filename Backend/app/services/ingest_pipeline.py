@@ -0,0 +1,160 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+# How often a lingering batch looks for more items
+_POLL_SECONDS = 0.01
+
+# A stage handler takes a batch of items and returns the items to pass downstream.
+StageHandler = Callable[[List[Any]], Awaitable[List[Any]]]
+
+@dataclass
+class Stage:
+    name: str
+    handler: StageHandler
+    concurrency: int = 1
+    # Items handed to the handler per call. Batch stages wait up to `linger`
+    # seconds for a batch to fill (None = until full or upstream is done).
+    batch_size: int = 1
+    linger: Optional[float] = 0.2
+
+@dataclass
+class StageStats:
+    processed: int = 0
+    failed: int = 0
+    emitted: int = 0
+    busy_seconds: float = 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            "processed": self.processed,
+            "failed": self.failed,
+            "emitted": self.emitted,
+            "busy_seconds": round(self.busy_seconds, 3)
+        }
+
+class _Channel:
+    """
+    Bounded queue feeding one stage. It closes once every producer (the upstream
+    stage and the feeder) has finished, waking each worker with a sentinel.
+    """
+    def __init__(self, maxsize: int, producers: int, consumers: int):
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.producers = producers
+        self.consumers = consumers
+
+    async def put(self, item):
+        await self.queue.put(item)
+
+    async def close(self):
+        self.producers -= 1
+        if self.producers == 0:
+            for _ in range(self.consumers):
+                await self.queue.put(_DONE)
+
+class StagedPipeline:
+    """
+    Runs items through an ordered list of stages. Every stage has its own worker pool and
+    a bounded queue in front of it, so a slow stage applies backpressure instead of
+    buffering everything, while faster stages keep working on other items.
+    """
+    def __init__(self, stages: List[Stage], queue_size: int = 100):
+        self.stages = stages
+        self.queue_size = queue_size
+        self.stats: Dict[str, StageStats] = {s.name: StageStats() for s in stages}
+
+    def stage_index(self, name: str) -> int:
+        return next(i for i, s in enumerate(self.stages) if s.name == name)
+
+    async def run(self, entries: Iterable[Tuple[int, Any]]) -> Dict[str, dict]:
+        """
+        entries are (stage_index, item) pairs, so resumed items can enter mid-pipeline.
+        Returns per-stage stats once every item has drained.
+        """
+        # Each channel is fed by the feeder plus, except the first, the previous stage.
+        channels = [
+            _Channel(self.queue_size, producers=1 if i == 0 else 2, consumers=stage.concurrency)
+            for i, stage in enumerate(self.stages)
+        ]
+
+        async def feeder():
+            try:
+                for index, item in entries:
+                    await channels[index].put(item)
+            finally:
+                for channel in channels:
+                    await channel.close()
+
+        tasks = [asyncio.create_task(feeder())]
+        for i, stage in enumerate(self.stages):
+            downstream = channels[i + 1] if i + 1 < len(channels) else None
+            workers = [
+                asyncio.create_task(self._worker(stage, channels[i], downstream))
+                for _ in range(stage.concurrency)
+            ]
+            tasks.append(asyncio.create_task(self._close_when_done(workers, downstream)))
+
+        await asyncio.gather(*tasks)
+        return {name: stats.to_dict() for name, stats in self.stats.items()}
+
+    async def _close_when_done(self, workers, downstream: Optional[_Channel]):
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            if downstream:
+                await downstream.close()
+
+    async def _next_batch(self, stage: Stage, channel: _Channel) -> Tuple[List[Any], bool]:
+        """Collects up to batch_size items. Returns (batch, upstream_done)."""
+        first = await channel.queue.get()
+        if first is _DONE:
+            return [], True
+        batch = [first]
+        deadline = None if stage.linger is None else time.monotonic() + stage.linger
+        while len(batch) < stage.batch_size:
+            if deadline is None:
+                item = await channel.queue.get()
+            else:
+                # Polled rather than wait_for(get()): on Python 3.10 a timeout racing a
+                # completed get() discards the item, and a lost sentinel hangs the sync
+                try:
+                    item = channel.queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    await asyncio.sleep(min(_POLL_SECONDS, remaining))
+                    continue
+            if item is _DONE:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    async def _worker(self, stage: Stage, channel: _Channel, downstream: Optional[_Channel]):
+        stats = self.stats[stage.name]
+        done = False
+        while not done:
+            batch, done = await self._next_batch(stage, channel)
+            if not batch:
+                continue
+            started = time.monotonic()
+            try:
+                outputs = await stage.handler(batch)
+                stats.processed += len(batch)
+            except Exception as e:
+                # Items stay at their last recorded stage and are picked up again on the next run
+                logger.error(f"Pipeline stage '{stage.name}' failed for {len(batch)} item(s): {e}")
+                stats.failed += len(batch)
+                outputs = []
+            finally:
+                stats.busy_seconds += time.monotonic() - started
+
+            stats.emitted += len(outputs)
+            if downstream:
+                for item in outputs:
+                    await downstream.put(item)
@@ -0,0 +1,224 @@
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.services.brain import brain_service, INTENT_FALLBACK_REASONING
+from app.services.embedding_cache import normalize_text
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Union
+import asyncio
+import math
+import re
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+INTENTS = ("explain", "filter", "teach", "command", "chat")
+
+# Tier 1: phrasing that is unambiguous on its own. A rule decides only when exactly one intent matches.
+KEYWORD_RULES = {
+    "explain": re.compile(r"^(why|how come|explain|what made)\b|\bwhy (is|was|did|does|are)\b|\b(reason|reasoning) (for|behind)\b"),
+    "filter": re.compile(r"^(show|find|list|search|get|display|fetch|give me)\b|^(any|do i have|are there|which)\b.*\b(emails?|mails?|messages?|unread)\b"),
+    "teach": re.compile(r"\b(from now on|in future|going forward|always treat|never show|stop showing|remember that|i prefer|don't show|do not show)\b"),
+    "command": re.compile(r"^(please )?(archive|delete|trash|mark|move|label|star|unstar|snooze|reply|send|forward|draft|unsubscribe|mute)\b"),
+    "chat": re.compile(r"\b(poem|joke|story|song|essay|recipe|weather|riddle|capital of|who won|tell me about yourself)\b"),
+}
+# "Why ..." or "find ..." is only about the inbox next to an email term; otherwise the query
+# may be off-topic ("why is the sky blue?") and the centroid/LLM tiers, which keep chat
+# email-only, decide instead
+EMAIL_TERMS = re.compile(
+    r"\b(emails?|e-mails?|mails?|messages?|unread|inbox|senders?|threads?|repl(y|ies)|attachments?|"
+    r"newsletters?|spam|promotions?|categor(y|ies|ized)|priority|score|scored|marked|classified|"
+    r"deadlines?|tasks?|meetings?)\b"
+)
+NEEDS_EMAIL_TERMS = ("explain", "filter")
+
+# Tier 2: labelled examples; their embeddings are averaged into one centroid per intent
+TRAINING_EXAMPLES = {
+    "explain": [
+        "Why is this email marked as critical?",
+        "Why did the placement mail get a low score?",
+        "How did you decide this is important?",
+        "What makes the lab email urgent?",
+        "Explain the priority of the hackathon email",
+        "Why was the newsletter classified as noise?",
+        "How come my professor's email is FYI?",
+    ],
+    "filter": [
+        "Show me unread emails from my professor",
+        "Find emails about the internship",
+        "Which emails mention the exam schedule?",
+        "List all critical emails from this week",
+        "Emails from GitHub in the last three days",
+        "Do I have anything from the placement cell?",
+        "What did the faculty send yesterday?",
+        "Any deadlines mentioned in my inbox?",
+        "What are my tasks due tomorrow?",
+        "What meetings do I have today?",
+    ],
+    "teach": [
+        "Emails from Zomato are always spam",
+        "Treat anything from my advisor as critical",
+        "I don't care about hackathon newsletters",
+        "Stop showing me promotions",
+        "Messages from the dean should be important",
+        "Lower the priority of social media notifications",
+        "Remember that Vertex is my main project",
+    ],
+    "command": [
+        "Archive all newsletters",
+        "Mark the placement email as read",
+        "Delete the promotions from last week",
+        "Reply to the professor saying I will submit tomorrow",
+        "Move the internship emails to a folder",
+        "Snooze this thread until Monday",
+        "Draft a response to the recruiter",
+    ],
+    "chat": [
+        "Write me a poem about spring",
+        "What's the weather like today?",
+        "Tell me a joke",
+        "Who won the football match yesterday?",
+        "What is the capital of France?",
+        "Help me with my calculus homework",
+        "How are you doing?",
+    ],
+}
+
+EmbeddingSource = Union[None, List[float], Awaitable]
+
+def _unit(vector: List[float]) -> List[float]:
+    norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+    return [x / norm for x in vector]
+
+def _confidence_label(score: float) -> str:
+    return "high" if score >= 0.85 else "medium" if score >= 0.6 else "low"
+
+class IntentClassifier:
+    """
+    Tiered chat intent classifier:
+    1. keyword rules (no I/O),
+    2. nearest centroid over the query embedding (which chat computes anyway for retrieval),
+    3. the LLM, only when neither local tier is confident.
+    Results are cached per normalized query.
+    """
+    def __init__(self, examples: Optional[Dict[str, List[str]]] = None, cache_size: Optional[int] = None):
+        self.examples = examples or TRAINING_EXAMPLES
+        self.cache_size = cache_size or settings.INTENT_CACHE_SIZE
+        self._cache: "OrderedDict[str, dict]" = OrderedDict()
+        self._centroids: Optional[Dict[str, List[float]]] = None
+        self._centroid_lock = asyncio.Lock()
+
+    def classify_rules(self, query: str) -> Optional[dict]:
+        text = normalize_text(query).lower()
+        matched = [intent for intent, pattern in KEYWORD_RULES.items() if pattern.search(text)]
+        if len(matched) != 1:
+            return None
+        if matched[0] in NEEDS_EMAIL_TERMS and not EMAIL_TERMS.search(text):
+            return None
+        return {"intent": matched[0], "score": 0.9, "reasoning": "keyword rule"}
+
+    async def centroids(self) -> Dict[str, List[float]]:
+        """Unit-length mean embedding per intent, built once from the labelled examples."""
+        if self._centroids is not None:
+            return self._centroids
+        async with self._centroid_lock:
+            if self._centroids is None:
+                labels, texts = [], []
+                for intent, examples in self.examples.items():
+                    labels += [intent] * len(examples)
+                    texts += examples
+                vectors = await brain_service.get_embeddings_batch(texts, caller="intent_classifier")
+                sums: Dict[str, List[float]] = {}
+                for intent, vector in zip(labels, vectors):
+                    if not vector:
+                        continue
+                    vector = _unit(vector)
+                    total = sums.setdefault(intent, [0.0] * len(vector))
+                    for i, x in enumerate(vector):
+                        total[i] += x
+                # Not cached when embeddings failed, so the next query retries
+                if not sums:
+                    return {}
+                self._centroids = {intent: _unit(total) for intent, total in sums.items()}
+        return self._centroids
+
+    def nearest_centroid(self, embedding: List[float], centroids: Dict[str, List[float]]) -> Optional[dict]:
+        if not embedding or len(centroids) < 2:
+            return None
+        query = _unit(embedding)
+        ranked = sorted(
+            ((sum(a * b for a, b in zip(query, centroid)), intent) for intent, centroid in centroids.items()),
+            reverse=True
+        )
+        (best, intent), (second, _) = ranked[0], ranked[1]
+        margin = best - second
+        if best < settings.INTENT_CENTROID_MIN_SIMILARITY or margin < settings.INTENT_CENTROID_MIN_MARGIN:
+            return None
+        # Map the margin onto [0.6, 1.0]: just over the threshold is "medium", clear winners "high"
+        score = min(1.0, 0.6 + margin / (4 * settings.INTENT_CENTROID_MIN_MARGIN) * 0.4)
+        return {"intent": intent, "score": score, "reasoning": f"nearest centroid (similarity {best:.2f}, margin {margin:.2f})"}
+
+    async def _resolve_embedding(self, query: str, embedding: EmbeddingSource, caller: Optional[str]):
+        try:
+            if embedding is None:
+                return await brain_service.get_embedding(query, caller=caller)
+            if isinstance(embedding, list):
+                return embedding
+            # shield: the same embedding task also feeds retrieval
+            return await asyncio.shield(embedding)
+        except Exception as e:
+            logger.warning(f"Intent embedding unavailable: {e}")
+            return None
+
+    async def classify(
+        self,
+        query: str,
+        embedding: EmbeddingSource = None,
+        fallback: Optional[Callable[[str], Awaitable[dict]]] = None,
+        caller: Optional[str] = None
+    ) -> dict:
+        """
+        Returns {"intent", "confidence", "score", "reasoning", "source"} where source is
+        "rule", "centroid", "llm" or "cache". `embedding` may be a vector or an awaitable
+        producing one (e.g. the chat's query-embedding task); it is only awaited when the
+        rules do not decide. `fallback` defaults to brain_service.classify_intent.
+        """
+        started = time.perf_counter()
+        key = normalize_text(query).lower()
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache.move_to_end(key)
+            metrics.inc("intent.cache_hits")
+            return {**cached, "source": "cache"}
+
+        result = self.classify_rules(query)
+        source = "rule"
+        if result is None:
+            vector = await self._resolve_embedding(query, embedding, caller)
+            if vector:
+                result = self.nearest_centroid(vector, await self.centroids())
+                source = "centroid"
+        if result is None:
+            fallback = fallback or (lambda q: brain_service.classify_intent(q, caller=caller))
+            answer = await fallback(query)
+            intent = answer.get("intent") if answer.get("intent") in INTENTS else "chat"
+            result = {
+                "intent": intent,
+                "score": {"high": 0.9, "medium": 0.7}.get(answer.get("confidence"), 0.4),
+                "reasoning": answer.get("reasoning", ""),
+            }
+            source = "llm"
+            cacheable = answer.get("reasoning") != INTENT_FALLBACK_REASONING
+        else:
+            cacheable = True
+
+        result = {**result, "confidence": _confidence_label(result["score"]), "source": source}
+        if cacheable:
+            self._cache[key] = result
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        metrics.inc(f"intent.{source}")
+        metrics.observe("intent.classify", time.perf_counter() - started)
+        return result
+
+intent_classifier = IntentClassifier()
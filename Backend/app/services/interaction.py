@@ -1,7 +1,8 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from app.db.models import Interaction, Email
+from app.db.models import Interaction, Email, Account
 from app.schemas.interaction import InteractionCreate
+from app.services.sender_profiles import sender_profile_service
 import uuid
 import logging
 
@@ -10,8 +11,12 @@ logger = logging.getLogger(__name__)
 class InteractionService:
     async def create_interaction(self, db: AsyncSession, email_id: uuid.UUID, interaction_in: InteractionCreate):
         # 1. Verify email exists
-        result = await db.execute(select(Email).where(Email.id == email_id))
-        email = result.scalars().first()
+        result = await db.execute(
+            select(Email.sender, Account.user_id)
+            .outerjoin(Account, Email.account_id == Account.id)
+            .where(Email.id == email_id)
+        )
+        email = result.first()
         if not email:
             return None
         
@@ -21,6 +26,9 @@ class InteractionService:
             action=interaction_in.action
         )
         db.add(interaction)
+        # 3. Fold it into the sender's profile in the same transaction
+        if email.user_id:
+            await sender_profile_service.record_interaction(db, email.user_id, email.sender, interaction_in.action)
         await db.commit()
         await db.refresh(interaction)
         
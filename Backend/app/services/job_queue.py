@@ -0,0 +1,267 @@
+import asyncio
+import datetime
+import json
+import logging
+import random
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field, asdict
+from typing import Awaitable, Callable, Dict, Optional, Set
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+RETRYING = "retrying"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+ACTIVE_STATUSES = {QUEUED, RUNNING, RETRYING}
+
+def _now() -> str:
+    return datetime.datetime.now(datetime.timezone.utc).isoformat()
+
+@dataclass
+class Job:
+    kind: str
+    payload: dict
+    key: Optional[str] = None
+    id: str = field(default_factory=lambda: str(uuid.uuid4()))
+    status: str = QUEUED
+    attempts: int = 0
+    max_attempts: int = 3
+    result: Optional[dict] = None
+    error: Optional[str] = None
+    created_at: str = field(default_factory=_now)
+    updated_at: str = field(default_factory=_now)
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+class InMemoryBroker:
+    """
+    Process-local stand-in for Redis. Jobs live in a dict, pending ids in an asyncio.Queue.
+    As with the Redis keys, a job expires JOB_RESULT_TTL_SECONDS after it was last saved.
+    """
+    def __init__(self):
+        # Ordered by last save; with one TTL for every job, expired jobs are at the front
+        self.jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self.expires: Dict[str, float] = {}
+        self.keys: Dict[str, str] = {}
+        self.queue: Optional[asyncio.Queue] = None
+
+    def _queue(self) -> asyncio.Queue:
+        # Created lazily so the queue binds to the running event loop
+        if self.queue is None:
+            self.queue = asyncio.Queue()
+        return self.queue
+
+    async def claim_key(self, key: str, job_id: str) -> Optional[str]:
+        """Reserves key for job_id. Returns the id of the job already holding it, if any."""
+        holder = self.keys.get(key)
+        if holder and holder in self.jobs and self.jobs[holder].status in ACTIVE_STATUSES:
+            return holder
+        self.keys[key] = job_id
+        return None
+
+    async def release_key(self, key: str, job_id: str):
+        if self.keys.get(key) == job_id:
+            del self.keys[key]
+
+    def _evict(self):
+        now = time.monotonic()
+        while self.jobs:
+            job_id, job = next(iter(self.jobs.items()))
+            if self.expires[job_id] > now:
+                break
+            del self.jobs[job_id], self.expires[job_id]
+            if job.key and self.keys.get(job.key) == job_id:
+                del self.keys[job.key]
+
+    async def save(self, job: Job):
+        self._evict()
+        self.jobs[job.id] = job
+        self.jobs.move_to_end(job.id)
+        self.expires[job.id] = time.monotonic() + settings.JOB_RESULT_TTL_SECONDS
+
+    async def load(self, job_id: str) -> Optional[Job]:
+        self._evict()
+        return self.jobs.get(job_id)
+
+    async def push(self, job_id: str):
+        await self._queue().put(job_id)
+
+    async def pop(self, timeout: float) -> Optional[str]:
+        # Polled rather than wait_for(get()): on Python 3.10 a timeout racing a completed
+        # get() discards the dequeued job id
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                return self._queue().get_nowait()
+            except asyncio.QueueEmpty:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                await asyncio.sleep(min(0.05, remaining))
+
+    async def close(self):
+        pass
+
+class RedisBroker:
+    """
+    Redis-backed broker so several API/worker processes share one queue.
+    Requires the optional 'redis' package.
+    """
+    def __init__(self, url: str, prefix: str = "kyra"):
+        import redis.asyncio as redis
+
+        self.redis = redis.from_url(url, decode_responses=True)
+        self.prefix = prefix
+
+    def _k(self, *parts) -> str:
+        return ":".join((self.prefix,) + parts)
+
+    async def claim_key(self, key: str, job_id: str) -> Optional[str]:
+        redis_key = self._k("jobkey", key)
+        if await self.redis.set(redis_key, job_id, nx=True, ex=settings.JOB_KEY_TTL_SECONDS):
+            return None
+        holder = await self.redis.get(redis_key)
+        job = await self.load(holder) if holder else None
+        if job and job.status in ACTIVE_STATUSES:
+            return holder
+        await self.redis.set(redis_key, job_id, ex=settings.JOB_KEY_TTL_SECONDS)
+        return None
+
+    async def release_key(self, key: str, job_id: str):
+        redis_key = self._k("jobkey", key)
+        if await self.redis.get(redis_key) == job_id:
+            await self.redis.delete(redis_key)
+
+    async def save(self, job: Job):
+        await self.redis.set(self._k("job", job.id), json.dumps(job.to_dict()), ex=settings.JOB_RESULT_TTL_SECONDS)
+
+    async def load(self, job_id: str) -> Optional[Job]:
+        raw = await self.redis.get(self._k("job", job_id))
+        return Job(**json.loads(raw)) if raw else None
+
+    async def push(self, job_id: str):
+        await self.redis.lpush(self._k("queue"), job_id)
+
+    async def pop(self, timeout: float) -> Optional[str]:
+        item = await self.redis.brpop(self._k("queue"), timeout=max(1, int(timeout)))
+        return item[1] if item else None
+
+    async def close(self):
+        await self.redis.close()
+
+JobHandler = Callable[[dict], Awaitable[dict]]
+
+class JobQueue:
+    """
+    Small job system: handlers are registered per job kind, jobs with the same key are
+    deduplicated while active, and failures are retried with jittered exponential backoff.
+    """
+    def __init__(self, broker=None):
+        self.broker = broker or InMemoryBroker()
+        self.handlers: Dict[str, JobHandler] = {}
+        self.workers = []
+        # Pending retries; the loop only keeps weak references to tasks
+        self._retries: Set[asyncio.Task] = set()
+        self._running = False
+
+    def register(self, kind: str, handler: JobHandler):
+        self.handlers[kind] = handler
+
+    async def enqueue(self, kind: str, payload: dict, key: Optional[str] = None, max_attempts: Optional[int] = None) -> Job:
+        """
+        Enqueues a job. If key is set and a job with the same key is still active,
+        that job is returned instead of creating a new one.
+        """
+        job = Job(kind=kind, payload=payload, key=key, max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS)
+        if key:
+            existing_id = await self.broker.claim_key(key, job.id)
+            if existing_id:
+                existing = await self.broker.load(existing_id)
+                if existing:
+                    return existing
+        await self.broker.save(job)
+        await self.broker.push(job.id)
+        return job
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        return await self.broker.load(job_id)
+
+    async def run_job(self, job: Job):
+        handler = self.handlers.get(job.kind)
+        job.attempts += 1
+        job.status = RUNNING
+        job.updated_at = _now()
+        await self.broker.save(job)
+
+        try:
+            if not handler:
+                raise ValueError(f"No handler registered for job kind '{job.kind}'")
+            job.result = await handler(job.payload)
+            job.status = SUCCEEDED
+            job.error = None
+        except Exception as e:
+            logger.error(f"Job {job.id} ({job.kind}) attempt {job.attempts} failed: {e}")
+            job.error = str(e)
+            if handler and job.attempts < job.max_attempts:
+                job.status = RETRYING
+                delay = settings.JOB_RETRY_BASE_SECONDS * (2 ** (job.attempts - 1))
+                delay = random.uniform(delay / 2, delay)
+                retry = asyncio.create_task(self._requeue_later(job.id, delay))
+                self._retries.add(retry)
+                retry.add_done_callback(self._retries.discard)
+            else:
+                job.status = FAILED
+
+        job.updated_at = _now()
+        await self.broker.save(job)
+        if job.key and job.status in (SUCCEEDED, FAILED):
+            await self.broker.release_key(job.key, job.id)
+
+    async def _requeue_later(self, job_id: str, delay: float):
+        await asyncio.sleep(delay)
+        await self.broker.push(job_id)
+
+    async def _worker(self, index: int):
+        logger.info(f"Job worker {index} started")
+        while self._running:
+            try:
+                job_id = await self.broker.pop(timeout=1.0)
+                if not job_id:
+                    continue
+                job = await self.broker.load(job_id)
+                if job and job.status in (QUEUED, RETRYING):
+                    await self.run_job(job)
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"Job worker {index} error: {e}")
+
+    def start(self, workers: int = 1):
+        if self._running:
+            return
+        self._running = True
+        self.workers = [asyncio.create_task(self._worker(i)) for i in range(workers)]
+
+    async def stop(self):
+        self._running = False
+        tasks = self.workers + list(self._retries)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.workers = []
+        await self.broker.close()
+
+def create_broker():
+    if settings.REDIS_URL:
+        return RedisBroker(settings.REDIS_URL)
+    return InMemoryBroker()
+
+job_queue = JobQueue(create_broker())
@@ -0,0 +1,188 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict, deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Sequence
+
+from app.core.config import settings
+from app.services.gmail_quota import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CALLER = "default"
+
+def estimate_tokens(*parts) -> int:
+    """Rough prompt size (~4 characters per token), good enough for budgeting."""
+    chars = 0
+    for part in parts:
+        if isinstance(part, (list, tuple)):
+            chars += sum(len(str(p)) for p in part)
+        elif part is not None:
+            chars += len(str(part))
+    return chars // 4 + 1
+
+def pack_by_tokens(items: Sequence, max_items: int, max_tokens: int, size=estimate_tokens) -> List[List[int]]:
+    """
+    Greedily groups item indexes, in order, into batches of at most max_items entries
+    and max_tokens estimated tokens. An item larger than max_tokens gets a batch of its own.
+    """
+    batches, current, current_tokens = [], [], 0
+    for index, item in enumerate(items):
+        tokens = size(item)
+        if current and (len(current) >= max_items or current_tokens + tokens > max_tokens):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(index)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+class FairLimiter:
+    """
+    Caps in-flight requests. When the cap is reached, waiters are queued per caller key
+    and served round-robin, so a caller with hundreds of queued calls (a backfill) gets
+    one slot in turn with a caller that has one (a chat request).
+    """
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.in_flight = 0
+        self._waiters: "OrderedDict[str, Deque[asyncio.Future]]" = OrderedDict()
+
+    @property
+    def queued(self) -> int:
+        return sum(len(q) for q in self._waiters.values())
+
+    async def acquire(self, key: str = DEFAULT_CALLER):
+        if self.in_flight < self.limit and not self._waiters:
+            self.in_flight += 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(key, deque()).append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # The slot was handed over just before cancellation; pass it on
+                self.release()
+            else:
+                queue = self._waiters.get(key)
+                if queue is not None and future in queue:
+                    queue.remove(future)
+                    if not queue:
+                        del self._waiters[key]
+            raise
+
+    def release(self):
+        while self._waiters:
+            key, queue = next(iter(self._waiters.items()))
+            future = queue.popleft()
+            if queue:
+                self._waiters.move_to_end(key)
+            else:
+                del self._waiters[key]
+            if not future.done():
+                # Hand the slot straight to the next caller; in_flight is unchanged
+                future.set_result(None)
+                return
+        self.in_flight -= 1
+
+class ModelBudget:
+    """Requests-per-minute and tokens-per-minute buckets for one model."""
+    def __init__(self, rpm: float, tpm: float):
+        self.requests = TokenBucket(rate=rpm / 60, capacity=rpm)
+        self.tokens = TokenBucket(rate=tpm / 60, capacity=tpm)
+
+    def reserve(self, tokens: int) -> float:
+        tokens = min(tokens, self.tokens.capacity)
+        return max(self.requests.reserve(1), self.tokens.reserve(tokens))
+
+class LLMGateway:
+    """
+    Single choke point for Gemini calls: a global in-flight limit with per-caller fair
+    queueing, plus per-model RPM/TPM budgets. BrainService hands it the coroutine to run.
+    """
+    def __init__(self, max_in_flight: Optional[int] = None, model_limits: Optional[dict] = None):
+        self.limiter = FairLimiter(max_in_flight or settings.LLM_MAX_IN_FLIGHT)
+        self.model_limits = settings.LLM_MODEL_LIMITS if model_limits is None else model_limits
+        self._budgets: Dict[str, ModelBudget] = {}
+        self.stats = {"requests": 0, "errors": 0, "queued": 0, "wait_seconds": 0.0}
+
+    def budget(self, model: str) -> ModelBudget:
+        if model not in self._budgets:
+            limits = self.model_limits.get(model, {})
+            self._budgets[model] = ModelBudget(
+                rpm=limits.get("rpm", settings.LLM_DEFAULT_RPM),
+                tpm=limits.get("tpm", settings.LLM_DEFAULT_TPM)
+            )
+        return self._budgets[model]
+
+    async def submit(self, model: str, call: Callable[[], Awaitable], estimated_tokens: int = 1, caller: Optional[str] = None):
+        """
+        Runs `call()` once a slot is free for `caller` and the model's budget allows it.
+        Token usage reported by the response is charged against the TPM budget.
+        """
+        caller = caller or DEFAULT_CALLER
+        started = time.monotonic()
+        if self.limiter.in_flight >= self.limiter.limit:
+            self.stats["queued"] += 1
+        await self.limiter.acquire(caller)
+        try:
+            wait = self.budget(model).reserve(estimated_tokens)
+            if wait:
+                await asyncio.sleep(wait)
+            self.stats["wait_seconds"] += time.monotonic() - started
+            self.stats["requests"] += 1
+            try:
+                response = await call()
+            except Exception:
+                self.stats["errors"] += 1
+                raise
+            self._charge_usage(model, response, estimated_tokens)
+            return response
+        finally:
+            self.limiter.release()
+
+    async def stream(self, model: str, call: Callable[[], Awaitable], estimated_tokens: int = 1, caller: Optional[str] = None):
+        """
+        Streaming counterpart of submit: `call()` returns an async iterator of response
+        chunks, which are yielded as they arrive. The slot is held until the stream ends
+        or the consumer stops iterating; usage from the last chunk that reports it is charged.
+        """
+        caller = caller or DEFAULT_CALLER
+        started = time.monotonic()
+        if self.limiter.in_flight >= self.limiter.limit:
+            self.stats["queued"] += 1
+        await self.limiter.acquire(caller)
+        try:
+            wait = self.budget(model).reserve(estimated_tokens)
+            if wait:
+                await asyncio.sleep(wait)
+            self.stats["wait_seconds"] += time.monotonic() - started
+            self.stats["requests"] += 1
+            last = None
+            try:
+                async for chunk in await call():
+                    if getattr(chunk, "usage_metadata", None) is not None:
+                        last = chunk
+                    yield chunk
+            except Exception:
+                self.stats["errors"] += 1
+                raise
+            finally:
+                if last is not None:
+                    self._charge_usage(model, last, estimated_tokens)
+        finally:
+            self.limiter.release()
+
+    def _charge_usage(self, model: str, response, estimated_tokens: int):
+        usage = getattr(response, "usage_metadata", None)
+        total = getattr(usage, "total_token_count", None) if usage is not None else None
+        if isinstance(total, int) and total > estimated_tokens:
+            # Book the overrun; it delays later calls rather than this one
+            self.budget(model).tokens.reserve(total - estimated_tokens)
+
+    def snapshot(self) -> dict:
+        return {**self.stats, "in_flight": self.limiter.in_flight, "waiting": self.limiter.queued}
+
+llm_gateway = LLMGateway()
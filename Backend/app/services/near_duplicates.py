@@ -0,0 +1,144 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.db.models import Email, Task
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+import datetime
+import hashlib
+import re
+import logging
+
+logger = logging.getLogger(__name__)
+
+BITS = 64
+MASK = (1 << BITS) - 1
+SHINGLE = 3 # words per shingle
+_WORD = re.compile(r"\w+")
+# OTPs, order numbers, amounts, times and dates are what differ between automated
+# mails; "1,299.00", "10:30" and "2026-03-01" each collapse to a single token
+_DIGITS = re.compile(r"\d(?:[\d,.:/-]*\d)?")
+
+def fingerprint_tokens(text: str) -> List[str]:
+    return _WORD.findall(_DIGITS.sub("0", (text or "").lower()))
+
+def simhash(text: str) -> Optional[int]:
+    """
+    64-bit SimHash over word shingles, with digit runs masked. Returned signed so it fits
+    a Postgres BIGINT; None when the text is too short to fingerprint reliably.
+    """
+    tokens = fingerprint_tokens(text)
+    if len(tokens) < settings.NEAR_DUP_MIN_TOKENS:
+        return None
+    shingles = Counter(" ".join(tokens[i:i + SHINGLE]) for i in range(max(len(tokens) - SHINGLE + 1, 1)))
+    weights = [0] * BITS
+    for shingle, count in shingles.items():
+        h = int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+        for bit in range(BITS):
+            weights[bit] += count if h >> bit & 1 else -count
+    value = sum(1 << bit for bit in range(BITS) if weights[bit] > 0)
+    return value - (1 << BITS) if value >= 1 << (BITS - 1) else value
+
+def hamming(a: int, b: int) -> int:
+    return bin((a ^ b) & MASK).count("1")
+
+def fingerprint_text(subject: str, body: str) -> str:
+    """What is fingerprinted: the subject and the parser-cleaned body."""
+    return f"{subject or ''}\n{body or ''}"
+
+@dataclass
+class DuplicateMatch:
+    source_id: object
+    distance: int
+    score: int
+    category: str
+    explanation: str
+    confidence: float
+    has_tasks: bool
+
+    def classification(self) -> dict:
+        """The source's result in classify_emails_batch's shape."""
+        return {
+            "score": self.score,
+            "category": self.category,
+            "explanation": self.explanation,
+            "confidence": self.confidence,
+        }
+
+class NearDuplicateIndex:
+    """
+    Finds, for new emails, a recently processed email of the same account and sender whose
+    SimHash is within NEAR_DUP_MAX_DISTANCE bits. Such an email inherits the source's
+    classification and embedding instead of going to the LLM; emails.duplicate_of and
+    duplicate_distance record where each reused result came from.
+    """
+    async def find(self, db: AsyncSession, account_id, emails: Iterable[dict]) -> Dict[str, DuplicateMatch]:
+        """
+        emails: {"gmail_id", "sender", "simhash"} dicts. Returns {gmail_id: match} for the
+        ones with a near duplicate; candidates come from one query for the whole batch.
+        """
+        if not settings.NEAR_DUP_ENABLED:
+            return {}
+        emails = [e for e in emails if e.get("simhash") is not None]
+        metrics.inc("near_duplicates.checked", len(emails))
+        if not emails:
+            return {}
+        cutoff = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=settings.NEAR_DUP_WINDOW_DAYS)
+        result = await db.execute(
+            select(
+                Email.id, Email.sender, Email.simhash, Email.importance_score,
+                Email.category, Email.explanation, Email.confidence
+            )
+            .where(
+                Email.account_id == account_id,
+                Email.sender.in_({e["sender"] for e in emails}),
+                Email.simhash.isnot(None),
+                # Only emails that were processed themselves, so reuse never chains
+                Email.duplicate_of.is_(None),
+                Email.embedding.isnot(None),
+                Email.category.notin_(("Unprocessed", "Uncategorized")),
+                Email.received_at >= cutoff
+            )
+            .order_by(Email.received_at.desc())
+            .limit(settings.NEAR_DUP_MAX_CANDIDATES)
+        )
+        candidates: Dict[str, list] = {}
+        for row in result.all():
+            candidates.setdefault(row.sender, []).append(row)
+
+        matches = {}
+        for email in emails:
+            best = None
+            for row in candidates.get(email["sender"], []):
+                distance = hamming(email["simhash"], row.simhash)
+                if distance <= settings.NEAR_DUP_MAX_DISTANCE and (best is None or distance < best[0]):
+                    best = (distance, row)
+            if best:
+                distance, row = best
+                matches[email["gmail_id"]] = DuplicateMatch(
+                    source_id=row.id, distance=distance, score=row.importance_score or 0,
+                    category=row.category, explanation=row.explanation or "",
+                    confidence=row.confidence or 0.0, has_tasks=False
+                )
+        if matches:
+            with_tasks = await db.execute(
+                select(Task.email_id).where(Task.email_id.in_({m.source_id for m in matches.values()}))
+            )
+            sources_with_tasks = set(with_tasks.scalars().all())
+            for match in matches.values():
+                match.has_tasks = match.source_id in sources_with_tasks
+        metrics.inc("near_duplicates.reused", len(matches))
+        return matches
+
+    def stats(self) -> dict:
+        checked = metrics.get("near_duplicates.checked")
+        reused = metrics.get("near_duplicates.reused")
+        return {
+            "checked": checked,
+            "reused": reused,
+            "reuse_rate": reused / checked if checked else 0.0,
+        }
+
+near_duplicate_index = NearDuplicateIndex()
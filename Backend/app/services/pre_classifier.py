@@ -0,0 +1,155 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.services.sender_profiles import SenderStats, sender_address, sender_profile_service
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+import random
+import re
+import logging
+
+logger = logging.getLogger(__name__)
+
+# The buckets of the classification prompt: (name, lowest score), highest first
+BUCKETS = (("Critical", 85), ("Important", 60), ("FYI", 30), ("Noise", 0))
+# Score given to an email decided by rules alone
+BUCKET_SCORES = {"Critical": 90, "Important": 70, "FYI": 45, "Noise": 10}
+
+# Same rules the classification prompt states, applied locally
+VIP_DOMAINS = ("srmist.edu.in", "academia.edu", "google.com")
+KEYWORD_RULES = {
+    "Critical": (re.compile(r"\b(otp|one[- ]time password|exam|deadline|placement|security alert|vertex)\b"), 0.7),
+    "Important": (re.compile(r"\b(lab|faculty|project|hackathon|internship|assignment)\b"), 0.4),
+    "Noise": (re.compile(r"\b(zomato|swiggy|offer|discount|sale|cashback|coupon)\b"), 0.7),
+}
+BULK_SENDER = re.compile(r"^(no-?reply|noreply|newsletter|marketing|promo|offers|deals|digest)\b")
+
+@dataclass
+class Signal:
+    bucket: str
+    weight: float # 0-1, evidence this signal alone gives for the bucket
+    reason: str
+
+def bucket_for(score) -> str:
+    for name, floor in BUCKETS:
+        if (score or 0) >= floor:
+            return name
+    return "Noise"
+
+def _combine(weights: Iterable[float]) -> float:
+    """Independent evidence: 1 - prod(1 - w)."""
+    remaining = 1.0
+    for weight in weights:
+        remaining *= 1.0 - weight
+    return 1.0 - remaining
+
+class PreClassifier:
+    """
+    Rule-and-feature stage in front of the LLM classifier. Sender domain, bulk-mail headers
+    (List-Unsubscribe, Precedence), keyword rules and the sender's profile (past scores,
+    how often the user engages with or archives their mail) each add
+    evidence for a bucket; an email is decided locally only when the combined evidence for
+    one bucket, discounted by evidence for any other, reaches PRECLASSIFIER_MIN_CONFIDENCE.
+    Everything else goes to the LLM. A sample of decided emails is also sent to the LLM
+    so the agreement rate can be tracked.
+    """
+    def __init__(self, min_confidence: Optional[float] = None, audit_rate: Optional[float] = None):
+        self.min_confidence = settings.PRECLASSIFIER_MIN_CONFIDENCE if min_confidence is None else min_confidence
+        self.audit_rate = settings.PRECLASSIFIER_AUDIT_RATE if audit_rate is None else audit_rate
+
+    def signals(self, doc: dict, history: Optional[SenderStats] = None) -> List[Signal]:
+        metadata = doc.get('metadata', {})
+        address = sender_address(metadata.get('from'))
+        domain = address.rpartition("@")[2]
+        subject = (metadata.get('subject') or "").lower()
+        found = []
+
+        for bucket, (pattern, weight) in KEYWORD_RULES.items():
+            match = pattern.search(subject)
+            if match:
+                found.append(Signal(bucket, weight, f"'{match.group(0)}' in subject"))
+
+        if metadata.get('list_unsubscribe'):
+            found.append(Signal("Noise", 0.5, "mailing list"))
+        if metadata.get('precedence') in ("bulk", "list", "junk") or BULK_SENDER.match(address):
+            found.append(Signal("Noise", 0.3, "bulk sender"))
+
+        if any(domain == vip or domain.endswith("." + vip) for vip in VIP_DOMAINS):
+            # A boost, not a bucket: backs whatever urgent bucket the keywords found
+            urgent = [s.bucket for s in found if s.bucket in ("Critical", "Important")]
+            found.append(Signal(urgent[0] if urgent else "Important", 0.5, f"VIP domain {domain}"))
+
+        if (history and history.scored >= settings.PRECLASSIFIER_HISTORY_MIN_EMAILS
+                and history.spread <= settings.PRECLASSIFIER_HISTORY_MAX_SPREAD):
+            found.append(Signal(bucket_for(history.mean_score), 0.9, f"sender usually scores {history.mean_score:.0f}"))
+        if history and history.emails_received >= settings.SENDER_PROFILE_MIN_EMAILS:
+            if history.engagement_rate >= 0.5:
+                found.append(Signal("Important", 0.5, "you usually engage with this sender"))
+            elif history.dismiss_rate >= 0.8 and history.engagement_rate < 0.1:
+                found.append(Signal("Noise", 0.6, "you usually archive this sender"))
+        return found
+
+    def decide(self, doc: dict, history: Optional[SenderStats] = None) -> Optional[dict]:
+        """A classification in the LLM's shape, or None when the email is ambiguous."""
+        found = self.signals(doc, history)
+        if not found:
+            return None
+        support: Dict[str, List[Signal]] = {}
+        for signal in found:
+            support.setdefault(signal.bucket, []).append(signal)
+        evidence = {bucket: _combine(s.weight for s in signals) for bucket, signals in support.items()}
+        bucket = max(evidence, key=evidence.get)
+        conflict = _combine(w for b, w in evidence.items() if b != bucket)
+        confidence = evidence[bucket] * (1.0 - conflict)
+        if confidence < self.min_confidence:
+            return None
+        score = BUCKET_SCORES[bucket]
+        if history and history.scored and bucket_for(history.mean_score) == bucket:
+            score = round(history.mean_score)
+        return {
+            "score": score,
+            "category": bucket,
+            "explanation": "Pre-classified: " + ", ".join(s.reason for s in support[bucket]),
+            "confidence": round(confidence, 2),
+        }
+
+    async def classify(self, db: AsyncSession, user_id, docs: List[dict]) -> Dict[str, dict]:
+        """Classifications for the emails that can be decided locally, keyed by gmail_id."""
+        if not settings.PRECLASSIFIER_ENABLED or not docs:
+            return {}
+        profiles = await sender_profile_service.get_many(db, user_id, (d['metadata'].get('from') for d in docs))
+        decided = {}
+        for doc in docs:
+            result = self.decide(doc, profiles.get(sender_address(doc['metadata'].get('from'))))
+            if result:
+                decided[doc['gmail_id']] = result
+        return decided
+
+    def should_audit(self) -> bool:
+        return random.random() < self.audit_rate
+
+    def record(self, short_circuited: int, sent_to_llm: int):
+        metrics.inc("preclassifier.short_circuited", short_circuited)
+        metrics.inc("preclassifier.sent_to_llm", sent_to_llm)
+
+    def record_audit(self, local: dict, llm: Optional[dict]) -> Optional[bool]:
+        """Compares a local decision with the LLM's for the same email, by bucket."""
+        if not llm:
+            return None
+        agreed = bucket_for(local.get('score')) == bucket_for(llm.get('score'))
+        metrics.inc("preclassifier.agree" if agreed else "preclassifier.disagree")
+        if not agreed:
+            logger.info(f"Pre-classifier disagreed with LLM: {local.get('explanation')} "
+                        f"({local.get('score')} vs {llm.get('score')})")
+        return agreed
+
+    def stats(self) -> dict:
+        return {
+            "short_circuited": metrics.get("preclassifier.short_circuited"),
+            "sent_to_llm": metrics.get("preclassifier.sent_to_llm"),
+            "short_circuit_rate": metrics.ratio("preclassifier.short_circuited", "preclassifier.sent_to_llm"),
+            "audited": metrics.get("preclassifier.agree") + metrics.get("preclassifier.disagree"),
+            "agreement_rate": metrics.ratio("preclassifier.agree", "preclassifier.disagree"),
+        }
+
+pre_classifier = PreClassifier()
@@ -0,0 +1,122 @@
+from app.core.config import settings
+from app.core.metrics import metrics
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, FrozenSet, Iterable, List, Optional
+import math
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+def _unit(vector: List[float]) -> List[float]:
+    norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+    return [x / norm for x in vector]
+
+@dataclass
+class CachedAnswer:
+    query: str
+    vector: List[float] # unit length
+    response: str
+    sources: List[str] = field(default_factory=list)
+    intent: Optional[str] = None
+    scope: FrozenSet[str] = frozenset() # account ids the answer was retrieved from
+    stored_at: float = field(default_factory=time.monotonic)
+
+class ResponseCache:
+    """
+    Per-user semantic cache of chat answers. A query is served from the cache when its
+    embedding is at least RESPONSE_CACHE_SIMILARITY (cosine) from a cached query of the
+    same user. Entries are dropped when the data behind them changes: a sync touching one
+    of the accounts the answer was retrieved from, or the user's tasks / calendar changing.
+    RESPONSE_CACHE_TTL_SECONDS bounds staleness for anything not covered by those events
+    (relative dates, other API processes).
+    """
+    def __init__(self, similarity: Optional[float] = None, ttl: Optional[float] = None, per_user: Optional[int] = None):
+        self.similarity = settings.RESPONSE_CACHE_SIMILARITY if similarity is None else similarity
+        self.ttl = settings.RESPONSE_CACHE_TTL_SECONDS if ttl is None else ttl
+        self.per_user = per_user or settings.RESPONSE_CACHE_PER_USER
+        self._entries: Dict[str, "OrderedDict[int, CachedAnswer]"] = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def lookup(self, user_id, embedding: Optional[List[float]]) -> Optional[CachedAnswer]:
+        if not embedding:
+            return None
+        query = _unit(embedding)
+        now = time.monotonic()
+        best, best_id, best_score = None, None, self.similarity
+        with self._lock:
+            entries = self._entries.get(str(user_id))
+            if entries:
+                for entry_id, entry in list(entries.items()):
+                    if now - entry.stored_at > self.ttl:
+                        del entries[entry_id]
+                        metrics.inc("response_cache.expired")
+                        continue
+                    score = sum(a * b for a, b in zip(query, entry.vector))
+                    if score >= best_score:
+                        best, best_id, best_score = entry, entry_id, score
+                if best is not None:
+                    entries.move_to_end(best_id)
+        metrics.inc("response_cache.hits" if best else "response_cache.misses")
+        return best
+
+    def store(self, user_id, embedding: Optional[List[float]], query: str, response: str,
+              sources: List[str], intent: Optional[str], account_ids: Iterable) -> None:
+        if not embedding or not response:
+            return
+        entry = CachedAnswer(
+            query=query,
+            vector=_unit(embedding),
+            response=response,
+            sources=list(sources),
+            intent=intent,
+            scope=frozenset(str(a) for a in account_ids)
+        )
+        with self._lock:
+            entries = self._entries.setdefault(str(user_id), OrderedDict())
+            self._next_id += 1
+            entries[self._next_id] = entry
+            while len(entries) > self.per_user:
+                entries.popitem(last=False)
+
+    def invalidate_user(self, user_id, reason: str = "") -> int:
+        """Drops every cached answer of one user (their tasks or calendar changed)."""
+        with self._lock:
+            dropped = len(self._entries.pop(str(user_id), {}))
+        self._count_invalidation(dropped, reason)
+        return dropped
+
+    def invalidate_accounts(self, account_ids: Iterable, reason: str = "") -> int:
+        """Drops cached answers, of any user, that were retrieved from one of these accounts."""
+        accounts = {str(a) for a in account_ids}
+        dropped = 0
+        with self._lock:
+            for entries in self._entries.values():
+                for entry_id in [i for i, e in entries.items() if e.scope & accounts]:
+                    del entries[entry_id]
+                    dropped += 1
+        self._count_invalidation(dropped, reason)
+        return dropped
+
+    def _count_invalidation(self, dropped: int, reason: str):
+        metrics.inc("response_cache.invalidations")
+        metrics.inc("response_cache.invalidated_entries", dropped)
+        if dropped:
+            logger.info(f"Response cache: dropped {dropped} answer(s) ({reason or 'invalidated'})")
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = sum(len(e) for e in self._entries.values())
+        return {
+            "entries": entries,
+            "hits": metrics.get("response_cache.hits"),
+            "misses": metrics.get("response_cache.misses"),
+            "bypassed": metrics.get("response_cache.bypassed"),
+            "hit_rate": metrics.ratio("response_cache.hits", "response_cache.misses"),
+            "invalidated_entries": metrics.get("response_cache.invalidated_entries"),
+        }
+
+response_cache = ResponseCache()
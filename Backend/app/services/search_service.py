@@ -0,0 +1,191 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func, union_all, literal
+from sqlalchemy.orm import selectinload
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.db.models import Email, Attachment, Chunk
+from app.services.brain import brain_service
+from app.services.vector_search import vector_search_service
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+SEARCH_MODES = ("hybrid", "lexical", "semantic")
+TS_CONFIG = "english"
+
+@dataclass
+class SearchHit:
+    email: Email
+    score: float
+    matched: List[str] = field(default_factory=list) # which retrievers found it: "lexical", "semantic"
+
+@dataclass
+class ChunkHit:
+    chunk: Chunk # with .email and .attachment loaded
+    score: float
+    matched: List[str] = field(default_factory=list)
+
+def reciprocal_rank_fusion(rankings: Dict[str, Sequence], k: int = 60) -> List[tuple]:
+    """
+    Fuses ranked id lists: score(id) = sum over lists of 1 / (k + rank).
+    Returns [(id, score, [list names that contained id])] best first.
+    """
+    scores: Dict = {}
+    matched: Dict = {}
+    for name, ids in rankings.items():
+        for rank, item_id in enumerate(ids, start=1):
+            scores[item_id] = scores.get(item_id, 0.0) + 1.0 / (k + rank)
+            matched.setdefault(item_id, []).append(name)
+    ordered = sorted(scores, key=lambda item_id: scores[item_id], reverse=True)
+    return [(item_id, scores[item_id], matched[item_id]) for item_id in ordered]
+
+class SearchService:
+    """
+    Email search over the caller's accounts:
+    - lexical: Postgres full-text (websearch syntax) over subject, sender, body and
+      attachment text, ranked with ts_rank_cd. No LLM call.
+    - semantic: HNSW / exact vector search on the query embedding.
+    - hybrid: both, fused with reciprocal-rank fusion.
+    """
+    async def lexical_ids(self, db: AsyncSession, query: str, account_ids: Sequence, limit: int) -> List:
+        tsquery = func.websearch_to_tsquery(TS_CONFIG, query)
+        email_matches = select(
+            Email.id.label("email_id"),
+            func.ts_rank_cd(Email.search_vector, tsquery).label("rank")
+        ).where(
+            Email.account_id.in_(account_ids),
+            Email.search_vector.op("@@")(tsquery)
+        )
+        attachment_matches = select(
+            Attachment.email_id.label("email_id"),
+            (func.ts_rank_cd(Attachment.search_vector, tsquery) * literal(settings.SEARCH_ATTACHMENT_WEIGHT)).label("rank")
+        ).join(Email, Email.id == Attachment.email_id).where(
+            Email.account_id.in_(account_ids),
+            Attachment.search_vector.op("@@")(tsquery)
+        )
+        matches = union_all(email_matches, attachment_matches).subquery()
+        best = func.max(matches.c.rank)
+        stmt = (
+            select(matches.c.email_id)
+            .group_by(matches.c.email_id)
+            .order_by(best.desc())
+            .limit(limit)
+        )
+        result = await db.execute(stmt)
+        return result.scalars().all()
+
+    async def semantic_ids(self, db: AsyncSession, query_embedding: List[float], account_ids: Sequence, limit: int) -> List:
+        emails = await vector_search_service.search_emails(
+            db, query_embedding, account_ids=account_ids, limit=limit, with_attachments=False
+        )
+        return [email.id for email in emails]
+
+    async def search(
+        self,
+        db: AsyncSession,
+        query: str,
+        account_ids: Sequence,
+        limit: int = 10,
+        mode: str = "hybrid",
+        query_embedding: Optional[List[float]] = None,
+        caller: Optional[str] = None
+    ) -> List[SearchHit]:
+        """
+        Returns up to `limit` hits, best first, with attachments loaded.
+        Pass query_embedding when the caller already has one; otherwise hybrid and
+        semantic modes embed the query (through the embedding cache).
+        """
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Unknown search mode '{mode}'")
+        query = (query or "").strip()
+        if not query or not account_ids:
+            return []
+
+        started = time.perf_counter()
+        # Each retriever contributes a deeper candidate list than the final page
+        pool = max(limit * settings.SEARCH_CANDIDATE_MULTIPLIER, limit)
+        rankings: Dict[str, List] = {}
+
+        if mode in ("hybrid", "lexical"):
+            rankings["lexical"] = await self.lexical_ids(db, query, account_ids, pool)
+
+        if mode in ("hybrid", "semantic"):
+            if query_embedding is None:
+                query_embedding = await brain_service.get_embedding(query, caller=caller)
+            if query_embedding:
+                rankings["semantic"] = await self.semantic_ids(db, query_embedding, account_ids, pool)
+            elif mode == "hybrid":
+                logger.warning("Query embedding unavailable; hybrid search fell back to lexical only")
+
+        fused = reciprocal_rank_fusion(rankings, k=settings.SEARCH_RRF_K)[:limit]
+        if not fused:
+            metrics.observe(f"search.{mode}", time.perf_counter() - started)
+            return []
+
+        ids = [item_id for item_id, _, _ in fused]
+        result = await db.execute(
+            select(Email).options(selectinload(Email.attachments)).where(Email.id.in_(ids))
+        )
+        emails = {email.id: email for email in result.scalars().all()}
+        hits = [
+            SearchHit(email=emails[item_id], score=score, matched=matched)
+            for item_id, score, matched in fused if item_id in emails
+        ]
+        metrics.observe(f"search.{mode}", time.perf_counter() - started)
+        return hits
+
+    async def lexical_chunk_ids(self, db: AsyncSession, query: str, account_ids: Sequence, limit: int) -> List:
+        tsquery = func.websearch_to_tsquery(TS_CONFIG, query)
+        stmt = (
+            select(Chunk.id)
+            .where(Chunk.account_id.in_(account_ids), Chunk.search_vector.op("@@")(tsquery))
+            .order_by(func.ts_rank_cd(Chunk.search_vector, tsquery).desc())
+            .limit(limit)
+        )
+        result = await db.execute(stmt)
+        return result.scalars().all()
+
+    async def search_chunks(
+        self,
+        db: AsyncSession,
+        query: str,
+        account_ids: Sequence,
+        limit: int = 8,
+        query_embedding: Optional[List[float]] = None
+    ) -> List[ChunkHit]:
+        """
+        Hybrid search over the chunk store, for building chat context from the passages
+        that matched rather than from whole emails. Lexical only when query_embedding is None.
+        """
+        query = (query or "").strip()
+        if not query or not account_ids:
+            return []
+
+        started = time.perf_counter()
+        pool = max(limit * settings.SEARCH_CANDIDATE_MULTIPLIER, limit)
+        rankings: Dict[str, List] = {"lexical": await self.lexical_chunk_ids(db, query, account_ids, pool)}
+        if query_embedding:
+            chunks = await vector_search_service.search_chunks(db, query_embedding, account_ids=account_ids, limit=pool)
+            rankings["semantic"] = [chunk.id for chunk in chunks]
+
+        fused = reciprocal_rank_fusion(rankings, k=settings.SEARCH_RRF_K)[:limit]
+        hits = []
+        if fused:
+            ids = [item_id for item_id, _, _ in fused]
+            result = await db.execute(
+                select(Chunk)
+                .options(selectinload(Chunk.email), selectinload(Chunk.attachment))
+                .where(Chunk.id.in_(ids))
+            )
+            chunks = {chunk.id: chunk for chunk in result.scalars().all()}
+            hits = [
+                ChunkHit(chunk=chunks[item_id], score=score, matched=matched)
+                for item_id, score, matched in fused if item_id in chunks
+            ]
+        metrics.observe("search.chunks", time.perf_counter() - started)
+        return hits
+
+search_service = SearchService()
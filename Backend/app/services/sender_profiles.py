@@ -0,0 +1,173 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func, case, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.db.models import SenderProfile
+from dataclasses import dataclass
+from email.utils import parseaddr
+from typing import Dict, Iterable, List, Optional, Tuple
+import datetime
+import math
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Interaction action -> (counter column, decayed column, weight)
+ACTIONS = {
+    "open": ("opens", "engagement", 0.5),
+    "reply": ("replies", "engagement", 1.0),
+    "star": ("stars", "engagement", 1.0),
+    "archive": ("archives", "dismissals", 1.0),
+}
+COUNTERS = ("emails_received", "scored", "score_sum", "score_sq_sum", "opens", "replies", "stars", "archives")
+DECAYED = ("exposure", "engagement", "dismissals")
+LATEST = ("decayed_at", "last_email_at", "last_interaction_at")
+
+def sender_address(sender: str) -> str:
+    """'Exam Cell <COE@srmist.edu.in>' -> 'coe@srmist.edu.in'"""
+    return parseaddr(sender or "")[1].strip().lower()
+
+def sender_address_sql(sender):
+    """sender_address as a SQL expression, for joining emails to their profile."""
+    return func.lower(func.trim(func.coalesce(func.substring(sender, "<([^>]+)>"), sender)))
+
+@dataclass
+class SenderStats:
+    """Read view of a profile; every figure is O(1) from the stored sums."""
+    emails_received: int = 0
+    scored: int = 0
+    mean_score: float = 0.0
+    spread: float = 0.0 # standard deviation of classified scores
+    engagement_rate: float = 0.0 # recency-weighted opens/replies/stars per email received
+    dismiss_rate: float = 0.0 # recency-weighted archives per email received
+
+    @classmethod
+    def from_profile(cls, profile: SenderProfile) -> "SenderStats":
+        scored = profile.scored or 0
+        mean = (profile.score_sum or 0.0) / scored if scored else 0.0
+        variance = (profile.score_sq_sum or 0.0) / scored - mean * mean if scored else 0.0
+        exposure = profile.exposure or 0.0
+        return cls(
+            emails_received=profile.emails_received or 0,
+            scored=scored,
+            mean_score=mean,
+            spread=math.sqrt(max(variance, 0.0)),
+            engagement_rate=min((profile.engagement or 0.0) / exposure, 1.0) if exposure else 0.0,
+            dismiss_rate=min((profile.dismissals or 0.0) / exposure, 1.0) if exposure else 0.0,
+        )
+
+def merge_updates(updates: Iterable[dict]) -> List[dict]:
+    """
+    Folds increments for the same (user_id, sender) into one row: a multi-row
+    INSERT ... ON CONFLICT DO UPDATE may not touch the same row twice.
+    """
+    merged: Dict[tuple, dict] = {}
+    for update in updates:
+        key = (update["user_id"], update["sender"])
+        row = merged.get(key)
+        if row is None:
+            row = merged[key] = {"user_id": update["user_id"], "sender": update["sender"], "domain": update["domain"]}
+            row.update({column: 0 for column in COUNTERS + DECAYED})
+            row.update({column: None for column in LATEST})
+        for column in COUNTERS + DECAYED:
+            row[column] += update.get(column, 0)
+        for column in LATEST:
+            if update.get(column) and (row[column] is None or update[column] > row[column]):
+                row[column] = update[column]
+    return list(merged.values())
+
+class SenderProfileService:
+    """
+    Maintains sender_profiles with one upsert per batch: counters are added, recency-
+    weighted figures are decayed to the new timestamp and then incremented, all inside
+    the statement, so concurrent writers never read-modify-write. Readers fetch
+    profiles by primary key instead of aggregating emails or interactions.
+    """
+    def upsert_statement(self, rows: List[dict]):
+        stmt = pg_insert(SenderProfile).values(rows)
+        excluded = stmt.excluded
+        table = SenderProfile.__table__.c
+        age = func.greatest(func.extract("epoch", excluded.decayed_at - table.decayed_at), 0)
+        decay = func.power(0.5, age / (settings.SENDER_PROFILE_HALF_LIFE_DAYS * 86400.0))
+        set_ = {column: table[column] + excluded[column] for column in COUNTERS}
+        set_.update({column: table[column] * decay + excluded[column] for column in DECAYED})
+        # GREATEST ignores NULLs, so a missing timestamp keeps the stored one
+        set_.update({column: func.greatest(table[column], excluded[column]) for column in LATEST})
+        return stmt.on_conflict_do_update(index_elements=[table.user_id, table.sender], set_=set_)
+
+    async def apply(self, db: AsyncSession, updates: Iterable[dict]) -> int:
+        rows = [row for row in merge_updates(updates) if row["sender"]]
+        if rows:
+            await db.execute(self.upsert_statement(rows))
+            metrics.inc("sender_profiles.updates", len(rows))
+        return len(rows)
+
+    def email_update(self, user_id, sender: str, score: Optional[int], at: Optional[datetime.datetime] = None) -> dict:
+        """Increments for one ingested email; score is None when it was not classified."""
+        address = sender_address(sender)
+        at = at or datetime.datetime.now(datetime.timezone.utc)
+        update = {
+            "user_id": user_id, "sender": address, "domain": address.rpartition("@")[2],
+            "emails_received": 1, "exposure": 1.0, "decayed_at": at, "last_email_at": at
+        }
+        if score is not None:
+            update.update(scored=1, score_sum=float(score), score_sq_sum=float(score) ** 2)
+        return update
+
+    def interaction_update(self, user_id, sender: str, action: str, at: Optional[datetime.datetime] = None) -> Optional[dict]:
+        if action not in ACTIONS:
+            return None
+        counter, decayed, weight = ACTIONS[action]
+        address = sender_address(sender)
+        at = at or datetime.datetime.now(datetime.timezone.utc)
+        return {
+            "user_id": user_id, "sender": address, "domain": address.rpartition("@")[2],
+            counter: 1, decayed: weight, "decayed_at": at, "last_interaction_at": at
+        }
+
+    async def record_emails(self, db: AsyncSession, user_id, emails: Iterable[Tuple[str, Optional[int]]]) -> int:
+        """emails: (sender, score) pairs. Runs in the caller's transaction."""
+        return await self.apply(db, [self.email_update(user_id, sender, score) for sender, score in emails])
+
+    async def record_interaction(self, db: AsyncSession, user_id, sender: str, action: str) -> int:
+        update = self.interaction_update(user_id, sender, action)
+        return await self.apply(db, [update]) if update else 0
+
+    async def get_many(self, db: AsyncSession, user_id, senders: Iterable[str]) -> Dict[str, SenderStats]:
+        """Stats of one user's senders keyed by normalized address."""
+        found = await self.lookup(db, [(user_id, sender) for sender in senders])
+        return {address: stats for (_, address), stats in found.items()}
+
+    async def lookup(self, db: AsyncSession, keys: Iterable[Tuple[object, str]]) -> Dict[tuple, SenderStats]:
+        """
+        {(user_id, address): stats} for (user_id, raw sender) pairs, with one primary-key
+        lookup for the whole batch. Senders without a profile are left out.
+        """
+        keys = {(user_id, sender_address(sender)) for user_id, sender in keys if user_id}
+        keys = [key for key in keys if key[1]]
+        if not keys:
+            return {}
+        result = await db.execute(
+            select(SenderProfile).where(tuple_(SenderProfile.user_id, SenderProfile.sender).in_(keys))
+        )
+        return {(p.user_id, p.sender): SenderStats.from_profile(p) for p in result.scalars().all()}
+
+    def rank_boost(self, stats: Optional[SenderStats]) -> float:
+        """Ranking points for a sender the user engages with (or keeps archiving)."""
+        if not stats or stats.emails_received < settings.SENDER_PROFILE_MIN_EMAILS:
+            return 0.0
+        return settings.SENDER_RANK_BOOST * (stats.engagement_rate - stats.dismiss_rate)
+
+    def rank_boost_sql(self):
+        """rank_boost over an (outer) joined SenderProfile, so paging can order by it."""
+        exposure = func.nullif(SenderProfile.exposure, 0.0, type_=SenderProfile.exposure.type)
+        def rate(column):
+            return func.coalesce(func.least(column / exposure, 1.0), 0.0)
+        return case(
+            (SenderProfile.emails_received >= settings.SENDER_PROFILE_MIN_EMAILS,
+             settings.SENDER_RANK_BOOST * (rate(SenderProfile.engagement) - rate(SenderProfile.dismissals))),
+            else_=0.0
+        )
+
+sender_profile_service = SenderProfileService()
@@ -0,0 +1,97 @@
+from app.core.metrics import metrics
+from pydantic import BaseModel, ValidationError
+from typing import Dict, Iterable, Optional, Set, Tuple, Type
+import json
+import re
+import logging
+
+logger = logging.getLogger(__name__)
+
+_FENCE = re.compile(r"^\s*```(?:json)?\s*(.*?)\s*```\s*$", re.DOTALL)
+
+def parse_json(text: Optional[str]):
+    """
+    Parses a model response as JSON. Tolerates markdown fences and prose around a single
+    object; returns None when nothing parseable is found.
+    """
+    if not text:
+        return None
+    fenced = _FENCE.match(text)
+    if fenced:
+        text = fenced.group(1)
+    try:
+        return json.loads(text)
+    except ValueError:
+        pass
+    start, end = text.find("{"), text.rfind("}")
+    if 0 <= start < end:
+        try:
+            return json.loads(text[start:end + 1])
+        except ValueError:
+            pass
+    return None
+
+def validate_object(parsed, schema: Type[BaseModel]) -> Optional[dict]:
+    """One object against `schema`; a one-element list is unwrapped. None when invalid."""
+    if isinstance(parsed, list):
+        parsed = parsed[0] if parsed else None
+    if not isinstance(parsed, dict):
+        return None
+    try:
+        return schema.model_validate(parsed).model_dump(exclude_none=True)
+    except ValidationError as e:
+        logger.debug(f"{schema.__name__} rejected: {e.errors()[:3]}")
+        return None
+
+def validate_keyed(parsed, wanted: Iterable[str], schema: Type[BaseModel]) -> Tuple[Dict[str, dict], Set[str], Set[str]]:
+    """
+    Splits a response keyed by id into (valid {id: dict}, missing ids, invalid ids).
+    Keys that were not asked for are ignored.
+    """
+    wanted = set(wanted)
+    if not isinstance(parsed, dict):
+        return {}, wanted, set()
+    valid, invalid = {}, set()
+    for key in wanted & set(parsed):
+        item = validate_object(parsed[key], schema)
+        if item is None:
+            invalid.add(key)
+        else:
+            valid[key] = item
+    return valid, wanted - set(parsed), invalid
+
+def record_batch(schema: Type[BaseModel], attempt: int, requested: int, valid: int, missing: int, invalid: int, malformed: bool):
+    """Counts one keyed response; attempt 0 is the first request for these items."""
+    metrics.inc("llm_output.requests")
+    if attempt == 0:
+        metrics.inc("llm_output.items", requested)
+        metrics.inc("llm_output.valid_first_pass", valid)
+    else:
+        metrics.inc("llm_output.repaired", valid)
+    metrics.inc("llm_output.missing", missing)
+    metrics.inc("llm_output.invalid", invalid)
+    if malformed:
+        metrics.inc("llm_output.malformed_responses")
+    if missing or invalid:
+        logger.info(f"{schema.__name__}: {missing} missing, {invalid} invalid of {requested} (attempt {attempt + 1})")
+
+def record_retry(items: int, tokens: int):
+    metrics.inc("llm_output.retried_items", items)
+    metrics.inc("llm_output.retry_tokens", tokens)
+
+def record_dropped(items: int):
+    metrics.inc("llm_output.dropped", items)
+
+def stats() -> dict:
+    """First-pass validity, and how many failed items a retry recovered."""
+    items = metrics.get("llm_output.items")
+    return {
+        "items": items,
+        "first_pass_rate": metrics.get("llm_output.valid_first_pass") / items if items else 0.0,
+        "retried_items": metrics.get("llm_output.retried_items"),
+        "repaired": metrics.get("llm_output.repaired"),
+        "dropped": metrics.get("llm_output.dropped"),
+        "repair_rate": metrics.ratio("llm_output.repaired", "llm_output.dropped"),
+        "malformed_responses": metrics.get("llm_output.malformed_responses"),
+        "retry_tokens": metrics.get("llm_output.retry_tokens"),
+    }
@@ -4,7 +4,7 @@ from app.db.models import Email, ThreadSummary
 from app.services.brain import brain_service
 
 class SummarizerService:
-    async def summarize_thread(self, db: AsyncSession, thread_id: str):
+    async def summarize_thread(self, db: AsyncSession, thread_id: str, caller: str = None):
         """
         Summarizes a thread if it has enough messages.
         """
@@ -23,7 +23,7 @@ class SummarizerService:
         for email in emails:
             thread_content += f"From: {email.sender}\nDate: {email.received_at}\nBody: {email.body_plain[:500]}\n---\n"
             
-        summary_text = brain_service.summarize_thread(thread_content)
+        summary_text = await brain_service.summarize_thread(thread_content, caller=caller)
         
         # Save to DB
         result = await db.execute(select(ThreadSummary).where(ThreadSummary.thread_id == thread_id))
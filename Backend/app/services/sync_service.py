@@ -0,0 +1,428 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update, delete
+from app.core.config import settings
+from app.db.models import Account, Email, Attachment, Interaction, Task, Chunk
+from app.db.session import AsyncSessionLocal
+from app.db.email_repository import email_repository
+from app.services.gmail_async import async_gmail_service
+from app.services.google_clients import google_clients
+from app.services.brain import brain_service
+from app.services.attachment_service import attachment_service
+from app.services.summarizer_service import summarizer_service
+from app.services.chunk_service import chunk_service
+from app.services.response_cache import response_cache
+from app.services.pre_classifier import pre_classifier
+from app.services.sender_profiles import sender_profile_service
+from app.services.near_duplicates import near_duplicate_index, simhash, fingerprint_text
+from app.services.ingest_pipeline import Stage, StagedPipeline
+from dataclasses import dataclass
+from typing import List, Optional
+import asyncio
+import datetime
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Ingestion stages in order. Email.pipeline_stage stores the last one completed,
+# so an interrupted sync resumes each email at the following stage.
+PIPELINE_STAGES = ["fetch", "parse", "classify", "task_detect", "attachments", "embed", "chunk", "summarize"]
+FINAL_STAGE = PIPELINE_STAGES[-1]
+
+@dataclass
+class IngestItem:
+    gmail_id: str
+    doc: Optional[dict] = None # formatted Gmail message, None for resumed emails
+    email_id: Optional[object] = None
+    thread_id: Optional[str] = None
+    subject: str = ""
+    body: str = ""
+    sender: str = ""
+    score: int = 0
+    task: Optional[dict] = None # extracted during classification, when folded in
+    tasks_checked: bool = False
+    simhash: Optional[int] = None
+    duplicate_of: Optional[object] = None # email whose classification and embedding were reused
+
+    @classmethod
+    def from_email(cls, email: Email) -> "IngestItem":
+        return cls(
+            gmail_id=email.gmail_id,
+            email_id=email.id,
+            thread_id=email.thread_id,
+            subject=email.subject or "",
+            body=email.body_plain or "",
+            sender=email.sender,
+            score=email.importance_score or 0,
+            simhash=email.simhash,
+            duplicate_of=email.duplicate_of
+        )
+
+    def classification_doc(self) -> dict:
+        """The message shape classify_emails_batch expects; rebuilt from the row when resuming."""
+        if self.doc:
+            return self.doc
+        return {
+            "gmail_id": self.gmail_id,
+            "metadata": {"from": self.sender, "subject": self.subject},
+            "content": {"raw_snippet": self.body[:200], "cleaned_text": self.body}
+        }
+
+class SyncService:
+    async def sync_account(self, db: AsyncSession, account: Account) -> dict:
+        """
+        Runs the ingestion pipeline for one account:
+        fetch -> parse -> classify -> task-detect -> attachments -> embed -> chunk -> summarize.
+        Emails left mid-pipeline by an earlier run are resumed from their recorded stage.
+        """
+        # 1. Credentials (cached per account, refreshed only near expiry)
+        service = await google_clients.gmail_session(account)
+
+        # 2.1 List only what changed since the last sync (historyId),
+        # falling back to a bounded full resync when there is no usable history.
+        changes = await async_gmail_service.sync_changes(
+            service,
+            last_sync_id=account.last_sync_id,
+            full_sync_limit=settings.GMAIL_FULL_SYNC_LIMIT,
+            fetch_messages=False
+        )
+        current_history_id = changes['history_id']
+
+        # 2.2 Mirror deletions and read state
+        removed = await self.apply_mailbox_changes(db, account, changes)
+        await db.commit()
+
+        # 3. Run new messages and unfinished emails through the pipeline
+        pipeline = self.build_pipeline(account, service)
+        resumed = await self.load_unfinished(db, account)
+        entries = [(0, IngestItem(gmail_id=gmail_id)) for gmail_id in changes['added']]
+        entries += [(PIPELINE_STAGES.index(email.pipeline_stage) + 1, IngestItem.from_email(email)) for email in resumed]
+        stats = await pipeline.run(entries)
+        if stats["parse"]["emitted"] or resumed or removed or changes['labels_added'] or changes['labels_removed']:
+            # Chat answers drawn from this mailbox may be out of date now
+            response_cache.invalidate_accounts([account.id], "mailbox sync")
+
+        # 4. Update Sync State. If a message could not be fetched because of transient
+        # errors, keep the old history id so the next delta sync sees it again instead of
+        # silently losing it. Messages deleted meanwhile (gone) or failing permanently
+        # would fail the same way next time, so they do not hold the cursor back.
+        dropped = service.stats["dropped"]
+        if dropped:
+            logger.warning(f"Sync for account {account.id} dropped {len(dropped)} message(s); history id not advanced")
+        unstored = self.unstored_count(stats)
+        if unstored:
+            logger.warning(f"Sync for account {account.id} failed to store {unstored} message(s); history id not advanced")
+        if current_history_id and not unstored and not dropped:
+            account.last_sync_id = str(current_history_id)
+
+        await db.commit()
+        return {
+            "message": "Sync complete",
+            "mode": changes['mode'],
+            "emails_fetched": stats["fetch"]["emitted"],
+            "new_saved": stats["parse"]["emitted"],
+            "resumed": len(resumed),
+            "removed": removed,
+            "dropped": len(dropped),
+            "gone": len(service.stats["gone"]),
+            "failed": len(service.stats["failed"]),
+            "gmail_requests": service.stats["requests"],
+            "gmail_retries": service.stats["retries"],
+            "history_id": current_history_id,
+            "stages": stats
+        }
+
+    @staticmethod
+    def unstored_count(stats: dict) -> int:
+        """
+        Messages lost by a failed stage before their rows were written. Only re-listing
+        brings them back, so the history id must not move past them; stages after parse
+        resume from Email.pipeline_stage instead.
+        """
+        first_stored = PIPELINE_STAGES.index("parse")
+        return sum(stats[name]["failed"] for name in PIPELINE_STAGES[:first_stored + 1] if name in stats)
+
+    def build_pipeline(self, account: Account, service) -> StagedPipeline:
+        user_id = account.user_id
+        # LLM calls from this sync queue fairly against other accounts and chat
+        caller = f"sync:{account.id}"
+        account_id = account.id
+
+        async def fetch(items: List[IngestItem]) -> List[IngestItem]:
+            # Skip messages we already store before paying for a 'full' get
+            async with AsyncSessionLocal() as db:
+                existing = await email_repository.existing_gmail_ids(db, [i.gmail_id for i in items])
+            to_fetch = [i.gmail_id for i in items if i.gmail_id not in existing]
+            if not to_fetch:
+                return []
+            docs = await async_gmail_service.fetch_messages_by_id(service, to_fetch)
+            return [IngestItem(gmail_id=d['gmail_id'], doc=d) for d in docs]
+
+        async def parse(items: List[IngestItem]) -> List[IngestItem]:
+            rows = []
+            for item in items:
+                doc = item.doc
+                item.thread_id = doc['thread_id']
+                item.subject = doc['metadata']['subject'] or ""
+                item.body = doc['content']['cleaned_text'] or ""
+                item.sender = doc['metadata']['from']
+                item.simhash = simhash(fingerprint_text(item.subject, item.body))
+                rows.append({
+                    "account_id": account_id,
+                    "gmail_id": item.gmail_id,
+                    "thread_id": item.thread_id,
+                    "sender": item.sender,
+                    "subject": doc['metadata']['subject'],
+                    "body_plain": doc['content']['cleaned_text'],
+                    "received_at": datetime.datetime.fromisoformat(doc['metadata']['timestamp']),
+                    "importance_score": 0,
+                    "category": 'Unprocessed',
+                    "simhash": item.simhash,
+                    "pipeline_stage": "parse"
+                })
+            # One INSERT ... ON CONFLICT DO NOTHING for the batch; duplicates drop out here
+            async with AsyncSessionLocal() as db:
+                inserted = await email_repository.insert_new_emails(db, rows)
+                await db.commit()
+            for item in items:
+                item.email_id = inserted.get(item.gmail_id)
+            return [item for item in items if item.email_id]
+
+        async def classify(items: List[IngestItem]) -> List[IngestItem]:
+            with_tasks = settings.SYNC_TASKS_IN_CLASSIFY
+            for item in items:
+                if item.simhash is None:
+                    item.simhash = simhash(fingerprint_text(item.subject, item.body))
+            docs = [i.classification_doc() for i in items]
+            # Near-duplicates of a recently processed email inherit its result. Clear-cut
+            # emails are decided locally; a sample of them still goes to the LLM so
+            # agreement can be measured, and the LLM's answer is kept for those
+            async with AsyncSessionLocal() as db:
+                duplicates = await near_duplicate_index.find(db, account_id, [
+                    {"gmail_id": i.gmail_id, "sender": i.sender, "simhash": i.simhash} for i in items
+                ])
+                docs = [d for d in docs if d['gmail_id'] not in duplicates]
+                decided = await pre_classifier.classify(db, user_id, docs)
+            audited = {gmail_id for gmail_id in decided if pre_classifier.should_audit()}
+            to_llm = [d for d in docs if d['gmail_id'] not in decided or d['gmail_id'] in audited]
+            llm_map = await brain_service.classify_emails_batch(to_llm, caller=caller, with_tasks=with_tasks)
+            pre_classifier.record(len(decided) - len(audited), len(to_llm))
+            for gmail_id in audited:
+                pre_classifier.record_audit(decided[gmail_id], llm_map.get(gmail_id))
+            classification_map = {**{g: m.classification() for g, m in duplicates.items()}, **decided, **llm_map}
+            rows = []
+            for item in items:
+                result_data = classification_map.get(item.gmail_id)
+                row = {"id": item.email_id, "pipeline_stage": "classify", "simhash": item.simhash}
+                match = duplicates.get(item.gmail_id)
+                if match:
+                    item.duplicate_of = match.source_id
+                    row.update(duplicate_of=match.source_id, duplicate_distance=match.distance)
+                    # A source without tasks (OTPs, receipts) means none here either;
+                    # otherwise dates may differ, so task_detect looks at this email itself
+                    item.tasks_checked = not match.has_tasks
+                if result_data:
+                    item.score = result_data.get('score', 0)
+                    # Locally decided emails, and LLM answers whose task was missing or
+                    # malformed, carry no task; task_detect checks them
+                    if with_tasks and item.gmail_id in llm_map and isinstance(result_data.get('task'), dict):
+                        item.task = result_data['task']
+                        item.tasks_checked = True
+                    row.update(
+                        importance_score=item.score,
+                        category=result_data.get('category', 'Uncategorized'),
+                        explanation=result_data.get('explanation', ''),
+                        confidence=result_data.get('confidence', 0.0)
+                    )
+                rows.append(row)
+            async with AsyncSessionLocal() as db:
+                await email_repository.bulk_update_emails(db, rows)
+                # Same transaction as the stage marker, so each email is counted once.
+                # Only LLM scores feed the score history: scores derived from that history
+                # (pre-classifier, near-duplicates) would otherwise reinforce themselves
+                await sender_profile_service.record_emails(db, user_id, [
+                    (item.sender, item.score if item.gmail_id in llm_map else None) for item in items
+                ])
+                await db.commit()
+            return items
+
+        async def task_detect(items: List[IngestItem]) -> List[IngestItem]:
+            # Only check Important or Critical-ish emails to save tokens/time.
+            candidates = [i for i in items if i.score >= settings.TASK_DETECT_MIN_SCORE]
+            # Emails whose classification already extracted tasks need no second call;
+            # the rest (folding disabled, resumed emails) share one batched request
+            unchecked = [i for i in candidates if not i.tasks_checked]
+            if unchecked:
+                detected = await brain_service.detect_tasks_batch(
+                    [{"gmail_id": i.gmail_id, "subject": i.subject, "body": i.body} for i in unchecked],
+                    caller=caller
+                )
+                for item in unchecked:
+                    item.task = detected.get(item.gmail_id)
+            task_rows = [
+                self._task_row(user_id, item.email_id, item.task)
+                for item in candidates if isinstance(item.task, dict) and item.task.get('is_task')
+            ]
+            async with AsyncSessionLocal() as db:
+                if task_rows:
+                    await email_repository.bulk_insert_tasks(db, task_rows)
+                await self._mark_stage(db, items, "task_detect")
+                await db.commit()
+            return items
+
+        async def attachments(items: List[IngestItem]) -> List[IngestItem]:
+            attachment_rows = []
+            for item in items:
+                doc = item.doc
+                if doc is None:
+                    # Resumed email: the attachment ids only live in the Gmail message.
+                    # It is already stored, so a failed refetch must not hold back the history id
+                    docs = await async_gmail_service.fetch_messages_by_id(service, [item.gmail_id], dropped=[])
+                    doc = docs[0] if docs else None
+                for att in (doc['content']['attachments'] if doc else []):
+                    content = await async_gmail_service.get_attachment_content(service, item.gmail_id, att['id'])
+                    if content:
+                        extracted_text = await asyncio.to_thread(attachment_service.parse_attachment, content, att['type'], att['name'])
+                        attachment_rows.append({
+                            "email_id": item.email_id,
+                            "filename": att['name'],
+                            "content_type": att['type'],
+                            "size": att['size'],
+                            "extracted_text": extracted_text
+                        })
+            async with AsyncSessionLocal() as db:
+                if attachment_rows:
+                    await email_repository.bulk_insert_attachments(db, attachment_rows)
+                await self._mark_stage(db, items, "attachments")
+                await db.commit()
+            return items
+
+        async def embed(items: List[IngestItem]) -> List[IngestItem]:
+            # Near-duplicates take their source's vector instead of a new embedding
+            copies = {item.email_id: item.duplicate_of for item in items if item.duplicate_of}
+            fresh = [item for item in items if not item.duplicate_of]
+            texts = [f"Subject: {item.subject}\n\n{item.body[:8000]}" for item in fresh]
+            vectors = await brain_service.get_embeddings_batch(texts, caller=caller) if texts else []
+            rows = []
+            for item, vector in zip(fresh, vectors):
+                row = {"id": item.email_id, "pipeline_stage": "embed"}
+                if vector:
+                    row["embedding"] = vector
+                rows.append(row)
+            rows += [{"id": email_id, "pipeline_stage": "embed"} for email_id in copies]
+            async with AsyncSessionLocal() as db:
+                await email_repository.copy_embeddings(db, copies)
+                await email_repository.bulk_update_emails(db, rows)
+                await db.commit()
+            return items
+
+        async def chunk(items: List[IngestItem]) -> List[IngestItem]:
+            # Runs after attachments so their extracted text is chunked with the body
+            emails = [
+                {"id": item.email_id, "account_id": account.id, "subject": item.subject, "body": item.body}
+                for item in items
+            ]
+            async with AsyncSessionLocal() as db:
+                await chunk_service.index_emails(db, emails, caller=caller)
+                await self._mark_stage(db, items, "chunk")
+                await db.commit()
+            return items
+
+        async def summarize(items: List[IngestItem]) -> List[IngestItem]:
+            thread_ids = {i.thread_id for i in items if i.thread_id}
+            async with AsyncSessionLocal() as db:
+                for thread_id in thread_ids:
+                    try:
+                        await summarizer_service.summarize_thread(db, thread_id, caller=caller)
+                    except Exception as e:
+                        logger.error(f"Error summarizing thread {thread_id}: {e}")
+                await self._mark_stage(db, items, "summarize")
+                await db.commit()
+            return items
+
+        return StagedPipeline([
+            Stage("fetch", fetch, settings.PIPELINE_FETCH_CONCURRENCY, batch_size=settings.PIPELINE_FETCH_BATCH_SIZE),
+            Stage("parse", parse, settings.PIPELINE_PARSE_CONCURRENCY, batch_size=settings.PIPELINE_FETCH_BATCH_SIZE),
+            Stage("classify", classify, settings.PIPELINE_CLASSIFY_CONCURRENCY, batch_size=settings.PIPELINE_CLASSIFY_BATCH_SIZE, linger=1.0),
+            # Same batch as classify, so resumed or unfolded emails share one task-detection request
+            Stage("task_detect", task_detect, settings.PIPELINE_TASK_CONCURRENCY, batch_size=settings.PIPELINE_CLASSIFY_BATCH_SIZE, linger=1.0),
+            Stage("attachments", attachments, settings.PIPELINE_ATTACHMENT_CONCURRENCY),
+            Stage("embed", embed, settings.PIPELINE_EMBED_CONCURRENCY, batch_size=settings.PIPELINE_EMBED_BATCH_SIZE, linger=1.0),
+            Stage("chunk", chunk, settings.PIPELINE_CHUNK_CONCURRENCY, batch_size=settings.PIPELINE_EMBED_BATCH_SIZE, linger=1.0),
+            # Summaries wait for whole batches so one thread is summarized once per batch
+            Stage("summarize", summarize, settings.PIPELINE_SUMMARIZE_CONCURRENCY, batch_size=50, linger=None),
+        ], queue_size=settings.PIPELINE_QUEUE_SIZE)
+
+    def _task_row(self, user_id, email_id, task_data: dict) -> dict:
+        # Every row carries the same keys so the batch can go out as one executemany
+        due_date = None
+        if task_data.get('due_date'):
+            try:
+                due_date = datetime.datetime.fromisoformat(task_data.get('due_date'))
+            except ValueError:
+                pass
+        return {
+            "user_id": user_id,
+            "email_id": email_id,
+            "description": task_data.get('description'),
+            "task_type": task_data.get('type'),
+            "priority": task_data.get('priority'),
+            "status": 'pending',
+            "due_date": due_date
+        }
+
+    async def _mark_stage(self, db: AsyncSession, items: List[IngestItem], stage: str):
+        email_ids = [i.email_id for i in items]
+        await db.execute(update(Email).where(Email.id.in_(email_ids)).values(pipeline_stage=stage))
+
+    async def load_unfinished(self, db: AsyncSession, account: Account) -> List[Email]:
+        """Emails of this account that an earlier sync left mid-pipeline."""
+        stmt = select(Email).where(
+            Email.account_id == account.id,
+            Email.pipeline_stage.isnot(None),
+            Email.pipeline_stage != FINAL_STAGE
+        )
+        result = await db.execute(stmt)
+        return result.scalars().all()
+
+    async def apply_mailbox_changes(self, db: AsyncSession, account: Account, changes: dict) -> int:
+        """
+        Applies deletions and UNREAD label changes from a history delta to stored emails.
+        Returns the number of emails removed.
+        """
+        deleted_ids = changes['deleted']
+        removed = 0
+        if deleted_ids:
+            stmt = select(Email.id).where(Email.account_id == account.id, Email.gmail_id.in_(deleted_ids))
+            email_ids = (await db.execute(stmt)).scalars().all()
+            if email_ids:
+                await db.execute(update(Task).where(Task.email_id.in_(email_ids)).values(email_id=None))
+                await db.execute(delete(Chunk).where(Chunk.email_id.in_(email_ids)))
+                await db.execute(delete(Attachment).where(Attachment.email_id.in_(email_ids)))
+                await db.execute(delete(Interaction).where(Interaction.email_id.in_(email_ids)))
+                # Near-duplicates keep duplicate_distance as the record of reuse
+                await db.execute(update(Email).where(Email.duplicate_of.in_(email_ids)).values(duplicate_of=None))
+                await db.execute(delete(Email).where(Email.id.in_(email_ids)))
+                removed = len(email_ids)
+
+        read_ids = [gid for gid, labels in changes['labels_removed'].items() if 'UNREAD' in labels]
+        unread_ids = [gid for gid, labels in changes['labels_added'].items() if 'UNREAD' in labels]
+        if read_ids:
+            await db.execute(update(Email).where(Email.account_id == account.id, Email.gmail_id.in_(read_ids)).values(is_read=True))
+        if unread_ids:
+            await db.execute(update(Email).where(Email.account_id == account.id, Email.gmail_id.in_(unread_ids)).values(is_read=False))
+
+        return removed
+
+    async def run_sync_job(self, payload: dict) -> dict:
+        """
+        Job handler for 'gmail_sync'. Runs in a worker with its own session.
+        Exceptions propagate so the job queue can retry.
+        """
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(select(Account).where(Account.id == payload['account_id']))
+            account = result.scalars().first()
+            if not account:
+                raise ValueError(f"Account {payload['account_id']} not found")
+            return await self.sync_account(db, account)
+
+sync_service = SyncService()
@@ -0,0 +1,105 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, text, func
+from sqlalchemy.orm import selectinload
+from app.core.config import settings
+from app.db.models import Email, Chunk
+from typing import List, Optional, Sequence
+import logging
+
+logger = logging.getLogger(__name__)
+
+class VectorSearchService:
+    """
+    Nearest-neighbour search over emails.embedding (or chunks.embedding), scoped to a set of accounts.
+
+    Small scopes (most mailboxes) are pre-filtered through the account_id index and
+    ranked exactly, which costs the same however many other tenants exist. Scopes larger
+    than VECTOR_EXACT_SCAN_MAX_ROWS use the HNSW index with the account filter applied
+    during the scan, with the recall/latency trade-off set per query through hnsw.ef_search.
+    """
+    async def set_ef_search(self, db: AsyncSession, ef_search: Optional[int] = None):
+        """
+        Sets hnsw.ef_search for the current transaction only (set_config(..., true) == SET LOCAL).
+        ef_search must be at least the LIMIT, otherwise HNSW can return fewer rows.
+        """
+        ef_search = ef_search or settings.VECTOR_EF_SEARCH
+        await db.execute(
+            text("SELECT set_config('hnsw.ef_search', :ef, true)"),
+            {"ef": str(int(ef_search))}
+        )
+        if settings.VECTOR_ITERATIVE_SCAN:
+            # pgvector >= 0.8: keep scanning the graph until enough rows pass the filter
+            await db.execute(
+                text("SELECT set_config('hnsw.iterative_scan', :mode, true)"),
+                {"mode": settings.VECTOR_ITERATIVE_SCAN}
+            )
+
+    async def scope_size(self, db: AsyncSession, account_ids: Sequence, cap: int, model=Email) -> int:
+        """Embedded rows in scope, counted up to cap + 1 so the check stays cheap."""
+        capped = (
+            select(model.id)
+            .where(model.account_id.in_(account_ids), model.embedding.is_not(None))
+            .limit(cap + 1)
+            .subquery()
+        )
+        result = await db.execute(select(func.count()).select_from(capped))
+        return result.scalar_one()
+
+    def build_query(self, query_embedding: List[float], account_ids: Optional[Sequence], limit: int, exact: bool, model=Email):
+        distance = model.embedding.cosine_distance(query_embedding)
+        stmt = select(model).where(model.embedding.is_not(None))
+        if account_ids is not None:
+            stmt = stmt.where(model.account_id.in_(account_ids))
+        if exact:
+            # "+ 0" hides the <=> operator from the planner so it filters by account first
+            # and sorts the (small) candidate set instead of walking the global HNSW graph
+            distance = distance + 0
+        return stmt.order_by(distance).limit(limit)
+
+    async def search_emails(
+        self,
+        db: AsyncSession,
+        query_embedding: List[float],
+        account_ids: Optional[Sequence] = None,
+        limit: int = 5,
+        ef_search: Optional[int] = None,
+        with_attachments: bool = True
+    ) -> List[Email]:
+        """
+        Returns the `limit` emails closest to query_embedding by cosine distance,
+        restricted to account_ids (None searches every account; an empty scope finds nothing).
+        """
+        if account_ids is not None and not account_ids:
+            return []
+        stmt = await self._plan(db, Email, query_embedding, account_ids, limit, ef_search)
+        if with_attachments:
+            stmt = stmt.options(selectinload(Email.attachments))
+        result = await db.execute(stmt)
+        return result.scalars().all()
+
+    async def search_chunks(
+        self,
+        db: AsyncSession,
+        query_embedding: List[float],
+        account_ids: Optional[Sequence] = None,
+        limit: int = 10,
+        ef_search: Optional[int] = None
+    ) -> List[Chunk]:
+        """Same as search_emails over the chunk store; the chunk's email is not loaded."""
+        if account_ids is not None and not account_ids:
+            return []
+        stmt = await self._plan(db, Chunk, query_embedding, account_ids, limit, ef_search)
+        result = await db.execute(stmt)
+        return result.scalars().all()
+
+    async def _plan(self, db: AsyncSession, model, query_embedding, account_ids, limit, ef_search):
+        # Exact ranking for small scopes, HNSW with a per-query ef_search otherwise
+        exact = False
+        if account_ids is not None:
+            cap = settings.VECTOR_EXACT_SCAN_MAX_ROWS
+            exact = await self.scope_size(db, account_ids, cap, model=model) <= cap
+        if not exact:
+            await self.set_ef_search(db, max(ef_search or settings.VECTOR_EF_SEARCH, limit))
+        return self.build_query(query_embedding, account_ids, limit, exact, model=model)
+
+vector_search_service = VectorSearchService()
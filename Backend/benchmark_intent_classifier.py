@@ -0,0 +1,125 @@
+"""
+Benchmark the local intent classifier against the LLM on a labelled query set.
+
+For every query it records the local answer (keyword rules, then nearest centroid; no LLM
+fallback) and the LLM answer, and reports accuracy of each, how many queries the local
+tiers decide on their own, the accuracy of the combined tiered classifier, and latencies.
+
+Usage:
+    python benchmark_intent_classifier.py
+    python benchmark_intent_classifier.py --no-llm      # local tiers only, no Gemini generation calls
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from collections import Counter
+from app.services.brain import brain_service
+from app.services.intent_classifier import IntentClassifier
+
+# Held-out queries: none of these are training examples
+LABELLED_QUERIES = [
+    ("Why is the Vertex deployment email at the top?", "explain"),
+    ("How did you score the email from the registrar?", "explain"),
+    ("What's the reasoning behind flagging the OTP mail?", "explain"),
+    ("Explain why my internship offer is only FYI", "explain"),
+    ("Why was the club announcement ranked above my lab report?", "explain"),
+    ("How come the Coursera mail is considered noise?", "explain"),
+    ("what made you mark this as critical", "explain"),
+    ("Show me emails from the placement cell", "filter"),
+    ("Find anything about the compiler design assignment", "filter"),
+    ("Which emails need a reply this week?", "filter"),
+    ("List unread messages from faculty", "filter"),
+    ("Do I have any mail from Google about the interview?", "filter"),
+    ("What's due before Friday?", "filter"),
+    ("emails mentioning the hackathon results", "filter"),
+    ("Get me the latest message from my project guide", "filter"),
+    ("Are there any emails about fee payment?", "filter"),
+    ("From now on, treat LinkedIn emails as noise", "teach"),
+    ("I prefer seeing club emails lower in the list", "teach"),
+    ("Remember that anything from @srmist.edu.in is important", "teach"),
+    ("Don't show me Swiggy offers anymore", "teach"),
+    ("Emails about Vertex should always be critical", "teach"),
+    ("My mentor's messages matter more than newsletters", "teach"),
+    ("Stop showing promotional emails in the digest", "teach"),
+    ("Archive every email from Zomato", "command"),
+    ("Mark all the newsletters as read", "command"),
+    ("Delete the spam from yesterday", "command"),
+    ("Reply to the recruiter that I am available on Monday", "command"),
+    ("Star the email about the exam timetable", "command"),
+    ("Unsubscribe me from the Medium digest", "command"),
+    ("Forward the internship letter to my dad", "command"),
+    ("Write a haiku about exams", "chat"),
+    ("Tell me a fun fact about space", "chat"),
+    ("What's the capital of Japan?", "chat"),
+    ("Can you help me debug my Python code?", "chat"),
+    ("Who is going to win the IPL this year?", "chat"),
+    ("Compose a story about a dragon", "chat"),
+    ("What's 17 times 23?", "chat"),
+    ("Recommend a good movie for tonight", "chat"),
+]
+
+def p95(values):
+    values = sorted(values)
+    return values[max(0, int(round(0.95 * len(values))) - 1)]
+
+async def run(use_llm: bool):
+    classifier = IntentClassifier()
+    local_hits, local_correct = 0, 0
+    llm_correct, tiered_correct = 0, 0
+    local_latency, llm_latency = [], []
+    sources = Counter()
+    confusion = Counter()
+
+    # Centroids and query embeddings are built up front so latencies cover classification only
+    await classifier.centroids()
+    embeddings = await brain_service.get_embeddings_batch([q for q, _ in LABELLED_QUERIES], caller="benchmark")
+
+    for (query, label), embedding in zip(LABELLED_QUERIES, embeddings):
+        started = time.perf_counter()
+        local = classifier.classify_rules(query)
+        source = "rule"
+        if local is None and embedding:
+            local = classifier.nearest_centroid(embedding, await classifier.centroids())
+            source = "centroid"
+        local_latency.append(time.perf_counter() - started)
+
+        llm_intent = None
+        if use_llm:
+            started = time.perf_counter()
+            llm_intent = (await brain_service.classify_intent(query, caller="benchmark")).get("intent")
+            llm_latency.append(time.perf_counter() - started)
+            llm_correct += llm_intent == label
+
+        if local is not None:
+            local_hits += 1
+            local_correct += local["intent"] == label
+            sources[source] += 1
+            tiered = local["intent"]
+            if local["intent"] != label:
+                confusion[(label, local["intent"])] += 1
+        else:
+            sources["llm"] += 1
+            tiered = llm_intent
+        tiered_correct += tiered == label
+
+    total = len(LABELLED_QUERIES)
+    print(f"Queries: {total}")
+    print(f"Local tiers decided {local_hits}/{total} ({local_hits / total:.0%}) "
+          f"- rule {sources['rule']}, centroid {sources['centroid']}, deferred {sources['llm']}")
+    if local_hits:
+        print(f"Local accuracy on decided queries: {local_correct / local_hits:.1%}")
+    print(f"Local latency: median {statistics.median(local_latency) * 1000:.2f} ms, p95 {p95(local_latency) * 1000:.2f} ms")
+    if use_llm:
+        print(f"LLM accuracy: {llm_correct / total:.1%}")
+        print(f"LLM latency: median {statistics.median(llm_latency) * 1000:.0f} ms, p95 {p95(llm_latency) * 1000:.0f} ms")
+        print(f"Tiered accuracy (local, LLM when deferred): {tiered_correct / total:.1%}")
+        print(f"LLM calls avoided: {local_hits}/{total}")
+    for (expected, got), count in confusion.most_common():
+        print(f"   local mistake: {expected} -> {got} x{count}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--no-llm", action="store_true", help="skip the LLM comparison")
+    args = parser.parse_args()
+    asyncio.run(run(use_llm=not args.no_llm))
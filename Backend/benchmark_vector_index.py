@@ -0,0 +1,129 @@
+"""
+Benchmark exact vs HNSW cosine search on a synthetic corpus.
+
+Builds a scratch table of N random 768-d vectors (clustered, so neighbours are meaningful),
+measures exact top-k (sequential scan) as ground truth, then recall@k and latency of the
+HNSW index for several ef_search values.
+
+Usage:
+    python benchmark_vector_index.py --rows 1000000 --queries 200 --ef 20,40,80,160
+    python benchmark_vector_index.py --rows 50000 --keep   # keep the table for reruns
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from app.core.config import settings
+from app.db.session import DATABASE_URL
+
+# Own engine without SQL echo, so timings are not skewed by logging
+engine = create_async_engine(DATABASE_URL, echo=False)
+
+TABLE = "bench_email_vectors"
+DIMS = 768
+
+def p95(values):
+    values = sorted(values)
+    return values[max(0, int(round(0.95 * len(values))) - 1)]
+
+async def build_corpus(conn, rows: int, clusters: int):
+    print(f"Building {rows} synthetic vectors in {clusters} clusters...")
+    await conn.execute(text(f"DROP TABLE IF EXISTS {TABLE};"))
+    await conn.execute(text(f"DROP TABLE IF EXISTS {TABLE}_centers;"))
+    await conn.execute(text(f"CREATE TABLE {TABLE}_centers (cid int PRIMARY KEY, c float4[]);"))
+    await conn.execute(text(f"""
+        INSERT INTO {TABLE}_centers
+        SELECT g, ARRAY(SELECT random() - 0.5 FROM generate_series(1, {DIMS}) WHERE g > 0)
+        FROM generate_series(0, :clusters - 1) g;
+    """), {"clusters": clusters})
+    await conn.execute(text(f"CREATE TABLE {TABLE} (id bigserial PRIMARY KEY, embedding vector({DIMS}));"))
+    started = time.perf_counter()
+    batch = 50000
+    for offset in range(0, rows, batch):
+        n = min(batch, rows - offset)
+        # Each row = its cluster centre + small per-dimension noise
+        await conn.execute(text(f"""
+            INSERT INTO {TABLE} (embedding)
+            SELECT ARRAY(
+                SELECT x + (random() - 0.5) * 0.2 FROM unnest(c.c) AS x WHERE s.i > 0
+            )::vector({DIMS})
+            FROM generate_series(1, :n) s(i)
+            JOIN {TABLE}_centers c ON c.cid = (s.i + :offset) % :clusters;
+        """), {"n": n, "offset": offset, "clusters": clusters})
+        print(f"   {offset + n}/{rows}")
+    await conn.execute(text(f"ANALYZE {TABLE};"))
+    print(f"Corpus built in {time.perf_counter() - started:.1f}s")
+
+async def sample_queries(conn, count: int):
+    result = await conn.execute(text(f"""
+        SELECT embedding::text FROM {TABLE} TABLESAMPLE SYSTEM (1) LIMIT :count;
+    """), {"count": count})
+    return [row[0] for row in result]
+
+async def run_queries(conn, queries, k: int):
+    results, latencies = [], []
+    for q in queries:
+        started = time.perf_counter()
+        result = await conn.execute(
+            text(f"SELECT id FROM {TABLE} ORDER BY embedding <=> CAST(:q AS vector) LIMIT :k"),
+            {"q": q, "k": k}
+        )
+        ids = [row[0] for row in result]
+        latencies.append((time.perf_counter() - started) * 1000)
+        results.append(ids)
+    return results, latencies
+
+async def benchmark(args):
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        exists = (await conn.execute(text("SELECT to_regclass(:t)"), {"t": TABLE})).scalar()
+        if not exists or not args.reuse:
+            await build_corpus(conn, args.rows, args.clusters)
+
+        queries = await sample_queries(conn, args.queries)
+        print(f"Using {len(queries)} queries, k={args.k}")
+
+        # Ground truth: exact scan without any index
+        await conn.execute(text(f"DROP INDEX IF EXISTS {TABLE}_hnsw;"))
+        exact, exact_latency = await run_queries(conn, queries, args.k)
+        rows = [("exact (seq scan)", 1.0, statistics.median(exact_latency), p95(exact_latency))]
+
+        print(f"Building HNSW index (m={args.m}, ef_construction={args.ef_construction})...")
+        started = time.perf_counter()
+        await conn.execute(text(f"""
+            CREATE INDEX {TABLE}_hnsw ON {TABLE} USING hnsw (embedding vector_cosine_ops)
+            WITH (m = {args.m}, ef_construction = {args.ef_construction});
+        """))
+        print(f"Index built in {time.perf_counter() - started:.1f}s")
+
+        for ef in args.ef:
+            await conn.execute(text(f"SET hnsw.ef_search = {int(ef)};"))
+            approx, latency = await run_queries(conn, queries, args.k)
+            recall = statistics.mean(
+                len(set(a) & set(e)) / args.k for a, e in zip(approx, exact)
+            )
+            rows.append((f"hnsw ef_search={ef}", recall, statistics.median(latency), p95(latency)))
+
+        print(f"\n{'mode':<24}{'recall@' + str(args.k):>10}{'p50 ms':>10}{'p95 ms':>10}")
+        for mode, recall, p50, p95_ms in rows:
+            print(f"{mode:<24}{recall:>10.3f}{p50:>10.2f}{p95_ms:>10.2f}")
+
+        if not args.keep:
+            await conn.execute(text(f"DROP TABLE IF EXISTS {TABLE};"))
+            await conn.execute(text(f"DROP TABLE IF EXISTS {TABLE}_centers;"))
+    await engine.dispose()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--clusters", type=int, default=1000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--m", type=int, default=settings.VECTOR_HNSW_M)
+    parser.add_argument("--ef-construction", type=int, default=settings.VECTOR_HNSW_EF_CONSTRUCTION)
+    parser.add_argument("--ef", type=lambda s: [int(x) for x in s.split(",")], default=[20, 40, 80, 160])
+    parser.add_argument("--keep", action="store_true", help="keep the scratch tables afterwards")
+    parser.add_argument("--reuse", action="store_true", help="reuse an existing scratch table")
+    asyncio.run(benchmark(parser.parse_args()))
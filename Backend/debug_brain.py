@@ -26,7 +26,7 @@ async def debug():
         # But let's try a simple generation with 'gemini-1.5-pro' or 'gemini-1.5-flash-001'
         
         # Or better: just print the classification error details more clearly
-        results = brain_service.classify_emails_batch([dummy_email])
+        results = await brain_service.classify_emails_batch([dummy_email])
         print("\n✅ API Response:")
         print(results)
     except Exception as e:
@@ -8,7 +8,7 @@ sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 from sqlalchemy import select
 from app.db.session import AsyncSessionLocal
 from app.db.models import Account
-from app.services.gmail import gmail_service
+from app.services.gmail_async import async_gmail_service
 from app.core.config import settings
 from google.oauth2.credentials import Credentials
 
@@ -47,17 +47,18 @@ async def debug_gmail_sync(email_input: str):
         # 3. Test Service
         try:
             print("🚀 Building Gmail Service...")
-            service = gmail_service.build_service(creds)
+            service = async_gmail_service.build_service(creds, account_key=str(account.id))
             
             print("👤 Fetching Profile...")
-            profile = gmail_service.get_profile(service)
+            profile = await async_gmail_service.get_profile(service)
             print(f"✅ Profile Connected: {profile['emailAddress']}")
             print(f"ℹ️ History ID: {profile.get('historyId')}")
 
             print("📨 Fetching Emails...")
-            emails = gmail_service.fetch_emails(service, limit=5) # Limit 5 for debug
+            emails = await async_gmail_service.fetch_emails(service, limit=5) # Limit 5 for debug
             
             print(f"✅ Fetched {len(emails)} emails.")
+            print(f"ℹ️ Not fetched: gone {service.stats['gone']}, failed {service.stats['failed']}, dropped {service.stats['dropped']}")
             if len(emails) > 0:
                 print("First email snippet:", emails[0]['content']['raw_snippet'])
             else:
@@ -67,6 +68,8 @@ async def debug_gmail_sync(email_input: str):
             print(f"❌ ERROR: {e}")
             import traceback
             traceback.print_exc()
+        finally:
+            await async_gmail_service.close()
 
 if __name__ == "__main__":
     if len(sys.argv) < 2:
@@ -0,0 +1,28 @@
+"""
+Migration script for tenant-scoped vector search: a partial index that lets retrieval
+pre-filter a mailbox's embedded emails by account before ranking them.
+"""
+import asyncio
+from sqlalchemy import text
+from app.db.session import engine
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+async def migrate():
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+
+        logger.info("Creating index on embedded emails per account...")
+        await conn.execute(text("""
+            CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_emails_account_embedded
+            ON emails(account_id)
+            WHERE embedding IS NOT NULL;
+        """))
+
+        await conn.execute(text("ANALYZE emails;"))
+        logger.info("✅ Migration complete!")
+
+if __name__ == "__main__":
+    asyncio.run(migrate())
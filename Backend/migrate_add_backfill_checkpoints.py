@@ -0,0 +1,43 @@
+"""
+Migration script for the resumable embedding backfill:
+a checkpoint table and a partial index that serves its keyset scan.
+"""
+import asyncio
+from sqlalchemy import text
+from app.db.session import engine
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+async def migrate():
+    async with engine.begin() as conn:
+        logger.info("Creating backfill_checkpoints table...")
+        await conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS backfill_checkpoints (
+                name VARCHAR PRIMARY KEY,
+                last_id UUID,
+                status VARCHAR DEFAULT 'idle',
+                run_id VARCHAR,
+                total INTEGER DEFAULT 0,
+                processed INTEGER DEFAULT 0,
+                succeeded INTEGER DEFAULT 0,
+                failed INTEGER DEFAULT 0,
+                error TEXT,
+                started_at TIMESTAMP WITH TIME ZONE,
+                finished_at TIMESTAMP WITH TIME ZONE,
+                updated_at TIMESTAMP WITH TIME ZONE DEFAULT now()
+            );
+        """))
+
+        logger.info("Creating index for emails still missing embeddings...")
+        await conn.execute(text("""
+            CREATE INDEX IF NOT EXISTS idx_emails_embedding_pending
+            ON emails(id)
+            WHERE embedding IS NULL;
+        """))
+
+        logger.info("✅ Migration complete!")
+
+if __name__ == "__main__":
+    asyncio.run(migrate())
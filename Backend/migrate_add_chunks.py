@@ -0,0 +1,50 @@
+"""
+Migration script for the chunk store: chunks of email bodies and attachment text,
+each with an embedding (HNSW) and a full-text vector (GIN).
+"""
+import asyncio
+from sqlalchemy import text
+from app.core.config import settings
+from app.db.models import CHUNK_SEARCH_DOCUMENT
+from app.db.session import engine
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+async def migrate():
+    async with engine.begin() as conn:
+        logger.info("Creating chunks table...")
+        await conn.execute(text(f"""
+            CREATE TABLE IF NOT EXISTS chunks (
+                id UUID PRIMARY KEY,
+                email_id UUID NOT NULL REFERENCES emails(id),
+                attachment_id UUID REFERENCES attachments(id),
+                account_id UUID REFERENCES accounts(id),
+                chunk_index INTEGER NOT NULL,
+                content TEXT NOT NULL,
+                token_count INTEGER,
+                embedding vector(768),
+                search_vector tsvector GENERATED ALWAYS AS ({CHUNK_SEARCH_DOCUMENT}) STORED,
+                created_at TIMESTAMP WITH TIME ZONE DEFAULT now()
+            );
+        """))
+
+        logger.info("Creating indexes...")
+        await conn.execute(text("CREATE INDEX IF NOT EXISTS ix_chunks_email_id ON chunks(email_id);"))
+        await conn.execute(text("""
+            CREATE INDEX IF NOT EXISTS idx_chunks_account_embedded
+            ON chunks(account_id)
+            WHERE embedding IS NOT NULL;
+        """))
+        await conn.execute(text("CREATE INDEX IF NOT EXISTS idx_chunks_search_vector ON chunks USING gin (search_vector);"))
+        await conn.execute(text(f"""
+            CREATE INDEX IF NOT EXISTS idx_chunks_embedding_hnsw
+            ON chunks USING hnsw (embedding vector_cosine_ops)
+            WITH (m = {int(settings.VECTOR_HNSW_M)}, ef_construction = {int(settings.VECTOR_HNSW_EF_CONSTRUCTION)});
+        """))
+
+        logger.info("✅ Migration complete!")
+
+if __name__ == "__main__":
+    asyncio.run(migrate())
@@ -0,0 +1,31 @@
+"""
+Migration script for conversation memory: a rolling summary per conversation
+and an index for loading a conversation's latest messages.
+"""
+import asyncio
+from sqlalchemy import text
+from app.db.session import engine
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+async def migrate():
+    async with engine.begin() as conn:
+        logger.info("Adding summary columns to conversations...")
+        await conn.execute(text("""
+            ALTER TABLE conversations
+            ADD COLUMN IF NOT EXISTS summary TEXT,
+            ADD COLUMN IF NOT EXISTS summarized_messages INTEGER DEFAULT 0;
+        """))
+
+        logger.info("Creating index on messages(conversation_id, created_at)...")
+        await conn.execute(text("""
+            CREATE INDEX IF NOT EXISTS ix_messages_conversation_id
+            ON messages(conversation_id, created_at);
+        """))
+
+        logger.info("✅ Migration complete!")
+
+if __name__ == "__main__":
+    asyncio.run(migrate())
@@ -0,0 +1,28 @@
+"""
+Migration script to add the content-addressed embedding cache table.
+"""
+import asyncio
+from sqlalchemy import text
+from app.db.session import engine
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+async def migrate():
+    async with engine.begin() as conn:
+        logger.info("Creating embedding_cache table...")
+        await conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS embedding_cache (
+                key VARCHAR PRIMARY KEY,
+                model VARCHAR NOT NULL,
+                dimensions INTEGER NOT NULL,
+                embedding vector NOT NULL,
+                created_at TIMESTAMP WITH TIME ZONE DEFAULT now()
+            );
+        """))
+
+        logger.info("✅ Migration complete!")
+
+if __name__ == "__main__":
+    asyncio.run(migrate())
@@ -0,0 +1,42 @@
+"""
+Migration script to add an HNSW index (cosine ops) on emails.embedding.
+Built CONCURRENTLY so ingestion keeps writing while it builds; that cannot run inside
+a transaction, so this uses an autocommit connection.
+"""
+import asyncio
+from sqlalchemy import text
+from app.core.config import settings
+from app.db.session import engine
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+async def migrate():
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+
+        logger.info("Ensuring pgvector is available (HNSW needs pgvector >= 0.5.0)...")
+        await conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector;"))
+
+        # A failed CONCURRENTLY build leaves an INVALID index behind; drop it so IF NOT EXISTS can rebuild
+        invalid = await conn.execute(text("""
+            SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+            WHERE c.relname = 'idx_emails_embedding_hnsw' AND NOT i.indisvalid;
+        """))
+        if invalid.first():
+            logger.info("Dropping invalid index from an interrupted build...")
+            await conn.execute(text("DROP INDEX CONCURRENTLY IF EXISTS idx_emails_embedding_hnsw;"))
+
+        logger.info(f"Building HNSW index (m={settings.VECTOR_HNSW_M}, ef_construction={settings.VECTOR_HNSW_EF_CONSTRUCTION})...")
+        await conn.execute(text(f"""
+            CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_emails_embedding_hnsw
+            ON emails USING hnsw (embedding vector_cosine_ops)
+            WITH (m = {int(settings.VECTOR_HNSW_M)}, ef_construction = {int(settings.VECTOR_HNSW_EF_CONSTRUCTION)});
+        """))
+
+        await conn.execute(text("ANALYZE emails;"))
+        logger.info("✅ Migration complete!")
+
+if __name__ == "__main__":
+    asyncio.run(migrate())
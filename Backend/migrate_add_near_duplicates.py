@@ -0,0 +1,38 @@
+"""
+Migration script for near-duplicate reuse: a SimHash fingerprint per email, and the
+email whose classification and embedding a near-duplicate inherited (audit trail).
+"""
+import asyncio
+from sqlalchemy import text
+from app.db.session import engine
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+async def migrate():
+    async with engine.begin() as conn:
+        logger.info("Adding near-duplicate columns to emails...")
+        await conn.execute(text("""
+            ALTER TABLE emails
+            ADD COLUMN IF NOT EXISTS simhash BIGINT,
+            ADD COLUMN IF NOT EXISTS duplicate_of UUID REFERENCES emails(id),
+            ADD COLUMN IF NOT EXISTS duplicate_distance INTEGER;
+        """))
+
+        logger.info("Creating index for candidate lookup (account, sender, recency)...")
+        await conn.execute(text("""
+            CREATE INDEX IF NOT EXISTS idx_emails_near_duplicate_candidates
+            ON emails(account_id, sender, received_at DESC)
+            WHERE simhash IS NOT NULL AND duplicate_of IS NULL;
+        """))
+        await conn.execute(text("""
+            CREATE INDEX IF NOT EXISTS idx_emails_duplicate_of
+            ON emails(duplicate_of)
+            WHERE duplicate_of IS NOT NULL;
+        """))
+
+        logger.info("✅ Migration complete!")
+
+if __name__ == "__main__":
+    asyncio.run(migrate())
@@ -0,0 +1,31 @@
+"""
+Migration script to add the ingestion pipeline stage to emails.
+Existing rows keep NULL, which the sync treats as fully processed.
+"""
+import asyncio
+from sqlalchemy import text
+from app.db.session import engine
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+async def migrate():
+    async with engine.begin() as conn:
+        logger.info("Adding pipeline_stage column to emails table...")
+        await conn.execute(text("""
+            ALTER TABLE emails
+            ADD COLUMN IF NOT EXISTS pipeline_stage VARCHAR;
+        """))
+
+        logger.info("Creating index for resumable emails...")
+        await conn.execute(text("""
+            CREATE INDEX IF NOT EXISTS idx_emails_pipeline_pending
+            ON emails(account_id, pipeline_stage)
+            WHERE pipeline_stage IS NOT NULL AND pipeline_stage <> 'summarize';
+        """))
+
+        logger.info("✅ Migration complete!")
+
+if __name__ == "__main__":
+    asyncio.run(migrate())
@@ -0,0 +1,47 @@
+"""
+Migration script for hybrid search: generated tsvector columns on emails and attachments
+with GIN indexes. Adding a stored generated column rewrites the table once.
+"""
+import asyncio
+from sqlalchemy import text
+from app.db.models import EMAIL_SEARCH_DOCUMENT, ATTACHMENT_SEARCH_DOCUMENT
+from app.db.session import engine
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+async def migrate():
+    async with engine.begin() as conn:
+        logger.info("Adding search_vector to emails...")
+        await conn.execute(text(f"""
+            ALTER TABLE emails
+            ADD COLUMN IF NOT EXISTS search_vector tsvector
+            GENERATED ALWAYS AS ({EMAIL_SEARCH_DOCUMENT}) STORED;
+        """))
+
+        logger.info("Adding search_vector to attachments...")
+        await conn.execute(text(f"""
+            ALTER TABLE attachments
+            ADD COLUMN IF NOT EXISTS search_vector tsvector
+            GENERATED ALWAYS AS ({ATTACHMENT_SEARCH_DOCUMENT}) STORED;
+        """))
+
+        logger.info("Creating GIN indexes...")
+        await conn.execute(text("""
+            CREATE INDEX IF NOT EXISTS idx_emails_search_vector
+            ON emails USING gin (search_vector);
+        """))
+        await conn.execute(text("""
+            CREATE INDEX IF NOT EXISTS idx_attachments_search_vector
+            ON attachments USING gin (search_vector);
+        """))
+        await conn.execute(text("""
+            CREATE INDEX IF NOT EXISTS idx_attachments_email_id
+            ON attachments(email_id);
+        """))
+
+        logger.info("✅ Migration complete!")
+
+if __name__ == "__main__":
+    asyncio.run(migrate())
@@ -0,0 +1,80 @@
+"""
+Migration script for sender profiles: per-user sender reputation, seeded from the
+emails and interactions already stored. Seeding skips profiles that already exist,
+so re-running it never double counts.
+"""
+import asyncio
+from sqlalchemy import text
+from app.db.session import engine
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 'Exam Cell <COE@srmist.edu.in>' -> 'coe@srmist.edu.in' (same as sender_profiles.sender_address)
+ADDRESS = "lower(trim(coalesce(substring(e.sender from '<([^>]+)>'), e.sender)))"
+
+async def migrate():
+    async with engine.begin() as conn:
+        logger.info("Creating sender_profiles table...")
+        await conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS sender_profiles (
+                user_id UUID NOT NULL REFERENCES users(id),
+                sender VARCHAR NOT NULL,
+                domain VARCHAR NOT NULL,
+                emails_received INTEGER NOT NULL DEFAULT 0,
+                scored INTEGER NOT NULL DEFAULT 0,
+                score_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+                score_sq_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+                opens INTEGER NOT NULL DEFAULT 0,
+                replies INTEGER NOT NULL DEFAULT 0,
+                stars INTEGER NOT NULL DEFAULT 0,
+                archives INTEGER NOT NULL DEFAULT 0,
+                exposure DOUBLE PRECISION NOT NULL DEFAULT 0,
+                engagement DOUBLE PRECISION NOT NULL DEFAULT 0,
+                dismissals DOUBLE PRECISION NOT NULL DEFAULT 0,
+                decayed_at TIMESTAMP WITH TIME ZONE DEFAULT now(),
+                last_email_at TIMESTAMP WITH TIME ZONE,
+                last_interaction_at TIMESTAMP WITH TIME ZONE,
+                PRIMARY KEY (user_id, sender)
+            );
+        """))
+        await conn.execute(text("CREATE INDEX IF NOT EXISTS ix_sender_profiles_domain ON sender_profiles(domain);"))
+
+        logger.info("Seeding profiles from stored emails and interactions...")
+        result = await conn.execute(text(f"""
+            WITH per_email AS (
+                SELECT a.user_id, {ADDRESS} AS sender, e.importance_score AS score,
+                       e.category NOT IN ('Unprocessed', 'Uncategorized')
+                       AND coalesce(e.explanation, '') NOT LIKE 'Pre-classified:%' AS is_scored, e.received_at,
+                       (SELECT count(*) FROM interactions i WHERE i.email_id = e.id AND i.action = 'open') AS opens,
+                       (SELECT count(*) FROM interactions i WHERE i.email_id = e.id AND i.action = 'reply') AS replies,
+                       (SELECT count(*) FROM interactions i WHERE i.email_id = e.id AND i.action = 'star') AS stars,
+                       (SELECT count(*) FROM interactions i WHERE i.email_id = e.id AND i.action = 'archive') AS archives,
+                       (SELECT max(i.created_at) FROM interactions i WHERE i.email_id = e.id) AS last_interaction_at
+                FROM emails e JOIN accounts a ON a.id = e.account_id
+                WHERE a.user_id IS NOT NULL
+            )
+            INSERT INTO sender_profiles (
+                user_id, sender, domain, emails_received, scored, score_sum, score_sq_sum,
+                opens, replies, stars, archives, exposure, engagement, dismissals,
+                decayed_at, last_email_at, last_interaction_at
+            )
+            SELECT user_id, sender, split_part(sender, '@', 2), count(*),
+                   count(*) FILTER (WHERE is_scored),
+                   coalesce(sum(score) FILTER (WHERE is_scored), 0),
+                   coalesce(sum(score::float * score) FILTER (WHERE is_scored), 0),
+                   sum(opens), sum(replies), sum(stars), sum(archives),
+                   count(*), 0.5 * sum(opens) + sum(replies) + sum(stars), sum(archives),
+                   now(), max(received_at), max(last_interaction_at)
+            FROM per_email
+            WHERE sender <> ''
+            GROUP BY user_id, sender
+            ON CONFLICT (user_id, sender) DO NOTHING;
+        """))
+        logger.info(f"Seeded {result.rowcount} profile(s)")
+
+        logger.info("✅ Migration complete!")
+
+if __name__ == "__main__":
+    asyncio.run(migrate())
@@ -30,7 +30,7 @@ async def verify_phase6():
         print(f"🧠 Testing Task Detection on: '{sample_email}'")
         
         # This will call API, might fail if key invalid or network issue, but we want to verify SDK call structure.
-        result = brain_service.detect_tasks(sample_email)
+        result = await brain_service.detect_tasks(sample_email)
         print(f"   Result: {result}")
         
         if result.get('is_task'):
@@ -1,6 +1,6 @@
 import unittest
 import asyncio
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, AsyncMock
 from app.services.brain import BrainService
 
 class TestPriorityEngine(unittest.TestCase):
@@ -10,7 +10,7 @@ class TestPriorityEngine(unittest.TestCase):
         """
         mock_brain = BrainService()
         
-        # Mock the client.models.generate_content response
+        # Mock the client.aio.models.generate_content response
         mock_response = MagicMock()
         mock_response.text = """
         {
@@ -28,7 +28,7 @@ class TestPriorityEngine(unittest.TestCase):
             }
         }
         """
-        mock_brain.client.models.generate_content = MagicMock(return_value=mock_response)
+        mock_brain.client.aio.models.generate_content = AsyncMock(return_value=mock_response)
         
         # Input data
         emails_input = [
@@ -45,7 +45,7 @@ class TestPriorityEngine(unittest.TestCase):
         ]
         
         # Execute
-        result = mock_brain.classify_emails_batch(emails_input)
+        result = asyncio.run(mock_brain.classify_emails_batch(emails_input))
         
         # Assert
         self.assertIn("msg_123", result)
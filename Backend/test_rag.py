@@ -14,7 +14,7 @@ async def test_rag(query: str):
     print(f"🔎 Searching for: '{query}'")
     
     # 1. Generate Query Embedding
-    query_vector = brain_service.get_embedding(query)
+    query_vector = await brain_service.get_embedding(query)
     if not query_vector:
         print("❌ Failed to generate embedding for query.")
         return
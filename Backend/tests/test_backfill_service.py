@@ -0,0 +1,83 @@
+import asyncio
+import random
+from app.services.backfill_service import BackfillService
+
+class FakeBackfill(BackfillService):
+    """BackfillService over an in-memory id list instead of Postgres"""
+    def __init__(self, ids, fail_on=None, **kwargs):
+        super().__init__(**kwargs)
+        self.pending = sorted(ids)
+        self.embedded = set()
+        self.fail_on = fail_on
+        self.checkpoint = {"last_id": None, "processed": 0, "succeeded": 0, "failed": 0}
+        self.checkpoints = []
+        self.held = 0
+        self.peak_held = 0
+
+    async def start_run(self, restart, run_id):
+        return self.checkpoint["last_id"]
+
+    async def finish_run(self, status, error=None):
+        return {"status": status, **self.checkpoint}
+
+    async def fetch_chunk(self, after_id, limit):
+        rows = [(i, "s", "b") for i in self.pending if i not in self.embedded and (after_id is None or i > after_id)]
+        rows = rows[:limit]
+        self.held += bool(rows)
+        self.peak_held = max(self.peak_held, self.held)
+        return rows
+
+    async def process_chunk(self, rows):
+        await asyncio.sleep(random.uniform(0, 0.01))  # finish out of order
+        if self.fail_on is not None and self.fail_on in [r[0] for r in rows]:
+            raise RuntimeError("embedding service down")
+        self.embedded.update(r[0] for r in rows)
+        self.held -= 1
+        return len(rows), 0
+
+    async def save_progress(self, last_id, processed, succeeded, failed):
+        self.checkpoint["last_id"] = last_id
+        self.checkpoint["processed"] += processed
+        self.checkpoint["succeeded"] += succeeded
+        self.checkpoints.append(last_id)
+
+def test_backfill_commits_every_chunk_and_checkpoints_in_order():
+    """Test all rows are processed and the cursor only moves forward over contiguous chunks"""
+    backfill = FakeBackfill(range(1, 101), chunk_size=7, parallelism=3)
+    result = asyncio.run(backfill.run())
+
+    assert result["status"] == "completed"
+    assert backfill.embedded == set(range(1, 101))
+    assert backfill.checkpoints == sorted(backfill.checkpoints)
+    assert backfill.checkpoints[-1] == 100
+    assert result["processed"] == 100
+
+def test_backfill_holds_a_bounded_number_of_chunks():
+    """Test memory stays flat: pages in memory are bounded by parallelism, not backlog size"""
+    backfill = FakeBackfill(range(1, 1001), chunk_size=10, parallelism=2)
+    asyncio.run(backfill.run())
+    # queue (parallelism) + workers (parallelism) + the page being enqueued
+    assert backfill.peak_held <= 2 * 2 + 1
+
+def test_backfill_resumes_from_checkpoint_after_failure():
+    """Test a failed run keeps its checkpoint and the next run starts after it"""
+    backfill = FakeBackfill(range(1, 51), fail_on=33, chunk_size=5, parallelism=1)
+    try:
+        asyncio.run(backfill.run())
+        assert False, "expected failure"
+    except RuntimeError:
+        pass
+    assert backfill.checkpoint["last_id"] == 30
+
+    backfill.fail_on = None
+    fetched_after = []
+    original = backfill.fetch_chunk
+    async def tracking_fetch(after_id, limit):
+        fetched_after.append(after_id)
+        return await original(after_id, limit)
+    backfill.fetch_chunk = tracking_fetch
+
+    result = asyncio.run(backfill.run())
+    assert fetched_after[0] == 30
+    assert result["status"] == "completed"
+    assert backfill.embedded == set(range(1, 51))
@@ -0,0 +1,67 @@
+import asyncio
+import json
+import re
+from types import SimpleNamespace
+from unittest.mock import patch
+from app.services.brain import BrainService
+
+class FakeGenerateModels:
+    """Stands in for client.aio.models; answers every ID in the prompt, fails if one is 'bad'"""
+    def __init__(self):
+        self.requests = []
+
+    async def generate_content(self, model, contents, config=None):
+        prompt, user_content = contents
+        ids = re.findall(r"ID: (\S+)", user_content)
+        self.requests.append((prompt, ids))
+        if any("bad" in i for i in ids):
+            raise RuntimeError("500 model error")
+        body = {i: {"is_task": True, "description": f"task {i}", "score": 50, "task": {"is_task": True}} for i in ids}
+        return SimpleNamespace(text=json.dumps(body), usage_metadata=None)
+
+def make_brain():
+    brain = BrainService()
+    models = FakeGenerateModels()
+    brain.client = SimpleNamespace(aio=SimpleNamespace(models=models))
+    return brain, models
+
+def emails(n, prefix="m"):
+    return [{"gmail_id": f"{prefix}{i}", "subject": "Lab", "body": "Submit the report by Friday"} for i in range(n)]
+
+def test_task_detection_is_batched_and_keyed_by_gmail_id():
+    """Test many emails go out in few requests and come back keyed by gmail_id"""
+    brain, models = make_brain()
+    with patch("app.services.brain.settings.LLM_BATCH_MAX_ITEMS", 10):
+        result = asyncio.run(brain.detect_tasks_batch(emails(25)))
+
+    assert len(models.requests) == 3
+    assert set(result) == {f"m{i}" for i in range(25)}
+    assert result["m7"]["description"] == "task m7"
+
+def test_token_budget_splits_requests():
+    """Test the packed prompt stays under LLM_BATCH_MAX_TOKENS"""
+    brain, models = make_brain()
+    long = [{"gmail_id": f"m{i}", "subject": "s", "body": "word " * 1500} for i in range(4)]
+    with patch("app.services.brain.settings.LLM_BATCH_MAX_TOKENS", 1000):
+        asyncio.run(brain.detect_tasks_batch(long))
+    assert len(models.requests) == 4
+
+def test_failed_request_is_split_so_others_survive():
+    """Test one failing email does not lose the rest of its batch"""
+    brain, models = make_brain()
+    batch = emails(3) + emails(1, prefix="bad")
+    result = asyncio.run(brain.detect_tasks_batch(batch))
+    assert set(result) == {"m0", "m1", "m2"}
+
+def test_classification_can_extract_tasks_in_the_same_call():
+    """Test with_tasks asks for a task object per email in the classification prompt"""
+    brain, models = make_brain()
+    docs = [
+        {"gmail_id": "m1", "metadata": {"from": "prof@srmist.edu.in", "subject": "Lab"},
+         "content": {"raw_snippet": "short", "cleaned_text": "Submit the lab report by Friday 5pm"}}
+    ]
+    result = asyncio.run(brain.classify_emails_batch(docs, with_tasks=True))
+    prompt, ids = models.requests[0]
+    assert ids == ["m1"] and "task:" in prompt
+    assert result["m1"]["task"] == {"is_task": True}
+    assert len(models.requests) == 1
@@ -0,0 +1,76 @@
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import patch
+from app.services.brain import BrainService
+from app.services.embedding_cache import EmbeddingCache, cache_key, normalize_text
+
+class FakeEmbedModels:
+    """Stands in for client.aio.models; rejects any request containing a 'bad' text"""
+    def __init__(self):
+        self.requests = []
+
+    async def embed_content(self, model, contents, config=None):
+        self.requests.append(list(contents))
+        if any("bad" in text for text in contents):
+            raise RuntimeError("400 invalid input")
+        return SimpleNamespace(embeddings=[SimpleNamespace(values=[float(len(text))]) for text in contents])
+
+def make_brain():
+    brain = BrainService()
+    models = FakeEmbedModels()
+    brain.client = SimpleNamespace(aio=SimpleNamespace(models=models))
+    brain.cache = EmbeddingCache(max_entries=100, persist=False)
+    return brain, models
+
+def test_embeddings_are_packed_into_few_requests():
+    """Test many texts go out in batches of EMBED_BATCH_MAX_ITEMS, results in input order"""
+    brain, models = make_brain()
+    texts = [f"text {i}" for i in range(25)]
+    with patch("app.services.brain.settings.EMBED_BATCH_MAX_ITEMS", 10):
+        vectors = asyncio.run(brain.get_embeddings_batch(texts))
+
+    assert len(models.requests) == 3
+    assert vectors == [[float(len(t))] for t in texts]
+
+def test_failed_batch_is_split_until_the_bad_text_is_isolated():
+    """Test a failing request is bisected so only the offending text gets no vector"""
+    brain, models = make_brain()
+    texts = ["ok 0", "ok 1", "bad 2", "ok 3"]
+    vectors = asyncio.run(brain.get_embeddings_batch(texts))
+
+    assert vectors[2] is None
+    assert all(vectors[i] == [4.0] for i in (0, 1, 3))
+    # [0..3] -> [0,1] ok, [2,3] -> [2] fails, [3] ok
+    assert len(models.requests) == 5
+
+def test_single_embedding_uses_batch_path():
+    """Test get_embedding returns the one vector from a batch request"""
+    brain, models = make_brain()
+    assert asyncio.run(brain.get_embedding("hello")) == [5.0]
+    assert models.requests == [["hello"]]
+
+def test_cached_and_repeated_texts_are_not_re_embedded():
+    """Test duplicates within a call and texts seen before are served from the cache"""
+    brain, models = make_brain()
+    first = asyncio.run(brain.get_embeddings_batch(["newsletter", "newsletter", "other"]))
+    assert models.requests == [["newsletter", "other"]]
+
+    second = asyncio.run(brain.get_embeddings_batch(["  newsletter\n", "fresh"]))
+    assert models.requests[-1] == ["fresh"]
+    assert second[0] == first[0]
+
+def test_cache_key_normalizes_whitespace_and_includes_model():
+    """Test keys ignore whitespace differences but not model, dimensions or case"""
+    assert normalize_text("  Hello \n\t World ") == "Hello World"
+    assert cache_key("m", 768, "Hello  World") == cache_key("m", 768, " Hello World\n")
+    assert cache_key("m", 768, "x") != cache_key("m", 256, "x")
+    assert cache_key("m", 768, "x") != cache_key("n", 768, "x")
+    assert cache_key("m", 768, "x") != cache_key("m", 768, "X")
+
+def test_cache_lru_evicts_oldest_entries():
+    """Test the in-process tier is bounded"""
+    cache = EmbeddingCache(max_entries=2, persist=False)
+    asyncio.run(cache.put_many({"a": [1.0], "b": [2.0], "c": [3.0]}, "m", 1))
+    found = asyncio.run(cache.get_many(["a", "b", "c"]))
+    assert set(found) == {"b", "c"}
+    assert found["c"] == [3.0]
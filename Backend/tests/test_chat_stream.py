@@ -0,0 +1,127 @@
+import asyncio
+import time
+import uuid
+from app.services import chat_service as chat_module
+from app.services.chat_service import ChatService, ChatTurn
+from app.services.conversation_memory import Memory
+
+class FakeChat(ChatService):
+    def __init__(self, turn):
+        self.turn = turn
+        self.persisted = None
+
+    async def prepare_turn(self, query, user_id, db, conversation_id=None, use_cache=True):
+        return self.turn
+
+    async def finish_turn(self, db, turn, answer_text):
+        self.persisted = answer_text
+        return "Title"
+
+def collect(service):
+    async def scenario():
+        return [event async for event in service.stream_response("q", "u", db=None)]
+    return asyncio.run(scenario())
+
+def test_stream_sends_sources_then_tokens_then_persists(monkeypatch):
+    """Test sources arrive before any token and the full answer is saved once the stream ends"""
+    async def fake_stream(prompt, caller=None):
+        for text in ["Hel", "lo"]:
+            yield text
+    monkeypatch.setattr(chat_module.brain_service, "stream_answer", fake_stream)
+    service = FakeChat(ChatTurn(query="q", user_id="u", conversation_id=uuid.uuid4(), prompt="p", sources=["Invoice"]))
+
+    events = collect(service)
+    assert [name for name, _ in events] == ["sources", "token", "token", "done"]
+    assert events[0][1]["sources"] == ["Invoice"]
+    assert service.persisted == "Hello"
+
+def test_rejected_intent_streams_refusal_without_generation(monkeypatch):
+    """Test a rejected intent streams the refusal and never calls the model or persists"""
+    async def fail_stream(prompt, caller=None):
+        raise AssertionError("model must not be called")
+        yield
+    monkeypatch.setattr(chat_module.brain_service, "stream_answer", fail_stream)
+    service = FakeChat(ChatTurn(query="q", user_id="u", conversation_id=uuid.uuid4(), intent="chat", rejection="No."))
+
+    events = collect(service)
+    assert [name for name, _ in events] == ["sources", "token", "done"]
+    assert events[0][1]["intent_rejected"] is True
+    assert service.persisted is None
+
+class ConcurrentChat(ChatService):
+    def __init__(self, allowed):
+        self.allowed = allowed
+        self.retrieval_cancelled = False
+        self.retrieval_started = False
+
+    async def _classify_intent(self, query, user_id=None, embedding=None):
+        await asyncio.sleep(0.05)
+        # Retrieval must already be running while the intent call is in flight
+        assert self.retrieval_started
+        return {"intent": "filter" if self.allowed else "chat", "is_allowed": self.allowed}
+
+    async def _retrieve_context(self, query, user_id, embedding=None):
+        self.retrieval_started = True
+        try:
+            await asyncio.sleep(0.05)
+        except asyncio.CancelledError:
+            self.retrieval_cancelled = True
+            raise
+        return "context", ["Invoice"], []
+
+    async def _schedule_context(self, user_id):
+        await asyncio.sleep(0.05)
+        return "\nSCHEDULE"
+
+async def fake_embedding(text, caller=None):
+    return [0.1] * 768
+
+async def fake_memory(conversation_id):
+    return Memory(summary="Asked about the invoice earlier", turns=[("user", "hi"), ("assistant", "hello")])
+
+def test_prepare_runs_intent_retrieval_and_schedule_concurrently(monkeypatch):
+    """Test the intent call overlaps retrieval and the schedule lookup instead of preceding them"""
+    monkeypatch.setattr(chat_module.brain_service, "get_embedding", fake_embedding)
+    monkeypatch.setattr(chat_module.conversation_memory, "load", fake_memory)
+    service = ConcurrentChat(allowed=True)
+
+    async def scenario():
+        started = time.perf_counter()
+        turn = await service.prepare_turn("tasks due today", "u", db=None, conversation_id=uuid.uuid4())
+        return turn, time.perf_counter() - started
+
+    turn, elapsed = asyncio.run(scenario())
+    assert turn.sources == ["Invoice"]
+    assert "context" in turn.prompt and "SCHEDULE" in turn.prompt
+    assert "Asked about the invoice earlier" in turn.prompt and "User: hi" in turn.prompt
+    assert elapsed < 0.12
+
+def test_rejected_intent_cancels_speculative_retrieval(monkeypatch):
+    """Test retrieval started speculatively is cancelled when the intent is rejected"""
+    monkeypatch.setattr(chat_module.brain_service, "get_embedding", fake_embedding)
+    monkeypatch.setattr(chat_module.conversation_memory, "load", fake_memory)
+    service = ConcurrentChat(allowed=False)
+
+    async def scenario():
+        async def slow_retrieval(query, user_id, embedding=None):
+            service.retrieval_started = True
+            try:
+                await asyncio.sleep(1)
+            except asyncio.CancelledError:
+                service.retrieval_cancelled = True
+                raise
+        service._retrieve_context = slow_retrieval
+        return await service.prepare_turn("write a poem", "u", db=None)
+
+    turn = asyncio.run(scenario())
+    assert turn.rejection
+    assert service.retrieval_cancelled
+
+def test_context_keeps_unchunked_emails_beside_passages():
+    """Test whole-email hits fill in for emails without chunks and chunked emails are not repeated"""
+    from types import SimpleNamespace
+    from app.services.search_service import ChunkHit, SearchHit
+    chunked, unchunked = SimpleNamespace(id=1), SimpleNamespace(id=2)
+    passage = ChunkHit(chunk=SimpleNamespace(email_id=1, email=chunked), score=0.03)
+    whole = [SearchHit(email=chunked, score=0.05), SearchHit(email=unchunked, score=0.04)]
+    assert chat_module.merge_context_hits([passage], whole) == [whole[1], passage]
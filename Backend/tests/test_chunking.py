@@ -0,0 +1,73 @@
+import asyncio
+from types import SimpleNamespace
+from sqlalchemy.dialects import postgresql
+from app.services.backfill_service import ChunkBackfillService
+from app.services.chunk_service import chunk_text, ChunkService
+from app.services.llm_gateway import estimate_tokens
+
+def words(n, prefix="w"):
+    return " ".join(f"{prefix}{i}" for i in range(n))
+
+def test_short_text_is_one_chunk():
+    """Test text under the budget is kept whole"""
+    chunks = chunk_text("Quarterly report attached.", max_tokens=50, overlap_tokens=10)
+    assert [c.text for c in chunks] == ["Quarterly report attached."]
+
+def test_chunks_respect_token_budget_and_overlap():
+    """Test every chunk fits the budget and starts inside the previous one"""
+    text = words(400)
+    chunks = chunk_text(text, max_tokens=60, overlap_tokens=15, max_chunks=100)
+    assert len(chunks) > 1
+    for chunk in chunks:
+        assert chunk.tokens <= 60
+        assert chunk.tokens == sum(estimate_tokens(w) for w in chunk.text.split())
+    for previous, current in zip(chunks, chunks[1:]):
+        assert current.text.split()[0] in previous.text.split()
+    # Nothing is lost between chunks
+    assert chunks[-1].text.split()[-1] == "w399"
+
+def test_chunks_prefer_sentence_boundaries():
+    """Test a window ends at a sentence break in its last quarter instead of mid-sentence"""
+    sentence = "alpha beta gamma delta epsilon zeta eta theta."
+    chunks = chunk_text(" ".join([sentence] * 20), max_tokens=50, overlap_tokens=0, max_chunks=100)
+    assert all(c.text.endswith(".") for c in chunks[:-1])
+
+def test_chunk_cap_limits_huge_documents():
+    """Test max_chunks bounds the chunks produced for one document"""
+    assert len(chunk_text(words(5000), max_tokens=40, overlap_tokens=5, max_chunks=3)) == 3
+
+def test_every_email_gets_a_body_chunk():
+    """Test empty emails still get a subject chunk, attachments are tagged with their filename"""
+    rows = ChunkService().build_rows(
+        {"id": 1, "account_id": 2, "subject": "Invoice", "body": ""},
+        [{"id": 3, "filename": "invoice.pdf", "text": "Total due 400 USD"}]
+    )
+    assert rows[0]["content"] == "Subject: Invoice" and rows[0]["attachment_id"] is None
+    assert rows[1]["content"].startswith("[invoice.pdf]") and rows[1]["attachment_id"] == 3
+
+def test_chunks_whose_embedding_failed_are_counted(monkeypatch):
+    """Test a chunk without a vector is stored unembedded and its email reported as failed"""
+    from app.services import chunk_service as chunk_module
+    written = []
+
+    class FakeDB:
+        async def execute(self, stmt):
+            return SimpleNamespace(all=lambda: [])
+
+    async def embeddings(texts, caller=None):
+        return [None if "broken" in text else [0.1] for text in texts]
+
+    async def insert(db, rows):
+        written.extend(rows)
+
+    monkeypatch.setattr(chunk_module.brain_service, "get_embeddings_batch", embeddings)
+    monkeypatch.setattr(chunk_module.email_repository, "bulk_insert_chunks", insert)
+    emails = [{"id": 1, "subject": "ok", "body": "fine"}, {"id": 2, "subject": "broken", "body": "x"}]
+
+    assert asyncio.run(ChunkService().index_emails(FakeDB(), emails)) == (2, 1)
+    assert [row["embedding"] for row in written] == [[0.1], None]
+
+def test_chunk_backfill_revisits_unembedded_chunks():
+    """Test emails with a chunk missing its embedding are still pending"""
+    sql = str(ChunkBackfillService().pending().compile(dialect=postgresql.dialect()))
+    assert "NOT (EXISTS" in sql and "chunks.embedding IS NULL" in sql
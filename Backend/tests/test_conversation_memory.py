@@ -0,0 +1,24 @@
+from app.core.config import settings
+from app.services.conversation_memory import ConversationMemory, Memory, summary_due
+
+def test_summary_is_due_only_after_a_batch_leaves_the_window():
+    """Test the background summary runs per batch of aged-out messages, not every turn"""
+    assert not summary_due(total_messages=8, summarized=0, window=8, batch=4)
+    assert not summary_due(total_messages=11, summarized=0, window=8, batch=4)
+    assert summary_due(total_messages=12, summarized=0, window=8, batch=4)
+    assert not summary_due(total_messages=14, summarized=4, window=8, batch=4)
+
+def test_rendered_memory_is_bounded(monkeypatch):
+    """Test prompt memory stays within summary + window * message caps however long the chat is"""
+    monkeypatch.setattr(settings, "CHAT_MEMORY_MESSAGE_CHARS", 50)
+    monkeypatch.setattr(settings, "CHAT_MEMORY_SUMMARY_CHARS", 40)
+    memory = ConversationMemory()
+    long_turns = [("user" if i % 2 == 0 else "assistant", "x" * 500) for i in range(memory.window * 3)]
+    rendered = memory.render(Memory(summary="s" * 1000, turns=long_turns))
+    assert rendered.startswith("Earlier in this conversation: ")
+    assert len(rendered) < 80 + memory.window * (50 + 20)
+    assert rendered.count("\nUser: ") + rendered.count("\nKyra: ") == memory.window
+
+def test_empty_memory_renders_nothing():
+    """Test a new conversation adds no history section to the prompt"""
+    assert ConversationMemory().render(Memory()) == ""
@@ -0,0 +1,71 @@
+import asyncio
+import base64
+import httpx
+from google.oauth2.credentials import Credentials
+from app.services.gmail_async import AsyncGmailService
+
+LATENCY = 0.05
+
+def _message(message_id):
+    body = base64.urlsafe_b64encode(f"Body of {message_id}".encode()).decode()
+    return {
+        "id": message_id,
+        "threadId": f"thread-{message_id}",
+        "internalDate": "1700000000000",
+        "snippet": "snippet",
+        "payload": {
+            "mimeType": "text/plain",
+            "headers": [{"name": "From", "value": "prof@srmist.edu.in"}, {"name": "Subject", "value": f"Subject {message_id}"}],
+            "body": {"data": body}
+        }
+    }
+
+async def fake_gmail(request: httpx.Request) -> httpx.Response:
+    """Local stand-in for the Gmail REST API with fixed per-request latency."""
+    await asyncio.sleep(LATENCY)
+    assert request.headers["Authorization"] == "Bearer token"
+    path = request.url.path
+    if path.endswith("/profile"):
+        return httpx.Response(200, json={"emailAddress": "me@example.com", "historyId": "42"})
+    if path.endswith("/history"):
+        return httpx.Response(404, json={"error": {"code": 404}})
+    if path.endswith("/messages"):
+        limit = int(request.url.params["maxResults"])
+        return httpx.Response(200, json={"messages": [{"id": f"m{i}"} for i in range(limit)]})
+    message_id = path.rsplit("/", 1)[-1]
+    return httpx.Response(200, json=_message(message_id))
+
+def _service(gmail):
+    return gmail.build_service(Credentials(token="token"))
+
+def test_sync_changes_falls_back_to_full_resync():
+    """Test an expired history id falls back to listing the latest messages"""
+    gmail = AsyncGmailService(base_url="http://fake-gmail/gmail/v1", transport=httpx.MockTransport(fake_gmail))
+
+    async def run():
+        changes = await gmail.sync_changes(_service(gmail), last_sync_id="1", full_sync_limit=3)
+        await gmail.close()
+        return changes
+
+    changes = asyncio.run(run())
+    assert changes["mode"] == "full"
+    assert changes["history_id"] == "42"
+    assert [e["gmail_id"] for e in changes["emails"]] == ["m0", "m1", "m2"]
+    assert changes["emails"][0]["content"]["cleaned_text"] == "Body of m0"
+
+def test_one_event_loop_serves_many_syncs_concurrently():
+    """Test 20 accounts x 10 message gets overlap instead of running back to back"""
+    gmail = AsyncGmailService(base_url="http://fake-gmail/gmail/v1", transport=httpx.MockTransport(fake_gmail))
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        results = await asyncio.gather(*(gmail.fetch_emails(_service(gmail), limit=10) for _ in range(20)))
+        elapsed = loop.time() - started
+        await gmail.close()
+        return results, elapsed
+
+    results, elapsed = asyncio.run(run())
+    assert all(len(r) == 10 for r in results)
+    # 220 requests back to back would take 11s
+    assert elapsed < 1.0
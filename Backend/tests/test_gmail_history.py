@@ -0,0 +1,61 @@
+import asyncio
+import httpx
+import pytest
+from google.oauth2.credentials import Credentials
+from app.services.gmail import HistoryExpiredError
+from app.services.gmail_async import AsyncGmailService
+
+def history_gmail(pages, calls):
+    """AsyncGmailService whose users.history.list answers with the given pages in order."""
+    async def handler(request: httpx.Request) -> httpx.Response:
+        assert request.url.path.endswith("/history")
+        calls.append(dict(request.url.params))
+        page = pages[len(calls) - 1]
+        if isinstance(page, int):
+            return httpx.Response(page, json={"error": {"code": page}})
+        return httpx.Response(200, json=page)
+    return AsyncGmailService(base_url="http://fake-gmail/gmail/v1", transport=httpx.MockTransport(handler))
+
+def list_history(gmail, start_history_id):
+    async def run():
+        try:
+            return await gmail.list_history(gmail.build_service(Credentials(token="token")), start_history_id)
+        finally:
+            await gmail.close()
+    return asyncio.run(run())
+
+def test_list_history_collapses_changes():
+    """Test history records are merged into added/deleted/label sets across pages"""
+    pages = [
+        {
+            "history": [
+                {"messagesAdded": [{"message": {"id": "a", "threadId": "t1", "labelIds": ["INBOX", "UNREAD"]}}]},
+                {"messagesAdded": [{"message": {"id": "spam", "threadId": "t2", "labelIds": ["SPAM"]}}]},
+                {"labelsRemoved": [{"message": {"id": "old"}, "labelIds": ["UNREAD"]}]},
+            ],
+            "historyId": "100",
+            "nextPageToken": "p2",
+        },
+        {
+            "history": [
+                {"messagesAdded": [{"message": {"id": "b", "threadId": "t3", "labelIds": ["INBOX"]}}]},
+                {"messagesDeleted": [{"message": {"id": "b"}}]},
+                {"labelsAdded": [{"message": {"id": "a"}, "labelIds": ["STARRED"]}]},
+            ],
+            "historyId": "120",
+        },
+    ]
+    calls = []
+    changes = list_history(history_gmail(pages, calls), "90")
+
+    assert changes["added"] == ["a"]
+    assert changes["deleted"] == ["b"]
+    assert changes["labels_removed"] == {"old": {"UNREAD"}}
+    assert changes["labels_added"] == {}
+    assert changes["history_id"] == "120"
+    assert calls[1]["pageToken"] == "p2"
+
+def test_list_history_expired():
+    """Test a 404 from history.list surfaces as HistoryExpiredError"""
+    with pytest.raises(HistoryExpiredError):
+        list_history(history_gmail([404], []), "1")
@@ -0,0 +1,69 @@
+import asyncio
+import httpx
+from google.oauth2.credentials import Credentials
+from app.services.gmail_async import AsyncGmailService
+from app.services.gmail_quota import TokenBucket, AdaptiveBatchSize, is_retryable
+
+def test_token_bucket_reserves_quota_units():
+    """Test the bucket allows a burst, then asks callers to wait"""
+    bucket = TokenBucket(rate=100, capacity=10)
+    assert bucket.reserve(10) == 0.0
+    wait = bucket.reserve(5)
+    assert 0.04 < wait <= 0.05
+
+def test_adaptive_batch_size_aimd():
+    """Test batch size grows additively and halves on throttling"""
+    batch = AdaptiveBatchSize(initial=10, maximum=12)
+    batch.on_success()
+    batch.on_success()
+    batch.on_success()
+    assert batch.size == 12
+    batch.on_throttle()
+    assert batch.size == 6
+    for _ in range(5):
+        batch.on_throttle()
+    assert batch.size == 1
+
+def test_is_retryable():
+    """Test throttling and server errors are retryable, client errors are not"""
+    assert is_retryable(429)
+    assert is_retryable(503)
+    assert is_retryable(403, '{"reason": "userRateLimitExceeded"}')
+    assert not is_retryable(403, '{"reason": "forbidden"}')
+    assert not is_retryable(404)
+
+def test_fetch_retries_throttled_messages_and_reports_drops(monkeypatch):
+    """Test 429s are retried, deleted messages are 'gone' and exhausted retries are 'dropped'"""
+    from app.core.config import settings
+    monkeypatch.setattr(settings, "GMAIL_BACKOFF_BASE_SECONDS", 0.001)
+    monkeypatch.setattr(settings, "GMAIL_MAX_RETRIES", 3)
+    calls = {}
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        message_id = request.url.path.rsplit("/", 1)[-1]
+        calls[message_id] = calls.get(message_id, 0) + 1
+        if message_id == "gone":
+            return httpx.Response(404)
+        if message_id == "flaky":
+            return httpx.Response(503)
+        if message_id == "busy" and calls[message_id] < 3:
+            return httpx.Response(429)
+        return httpx.Response(200, json={
+            "id": message_id, "threadId": "t", "internalDate": "1700000000000",
+            "payload": {"mimeType": "text/plain", "headers": [], "body": {}}
+        })
+
+    gmail = AsyncGmailService(base_url="http://fake-gmail/gmail/v1", transport=httpx.MockTransport(handler))
+    service = gmail.build_service(Credentials(token="token"), account_key="quota-test")
+
+    async def run():
+        emails = await gmail.fetch_messages_by_id(service, ["ok", "busy", "gone", "flaky"])
+        await gmail.close()
+        return emails
+
+    emails = asyncio.run(run())
+    assert sorted(e["gmail_id"] for e in emails) == ["busy", "ok"]
+    assert calls["busy"] == 3
+    assert calls["gone"] == 1
+    assert service.stats["gone"] == ["gone"]
+    assert service.stats["dropped"] == ["flaky"]
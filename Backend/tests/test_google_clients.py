@@ -0,0 +1,102 @@
+import asyncio
+import datetime
+import threading
+import uuid
+from google.oauth2.credentials import Credentials
+from app.db.models import Account
+from app.services.google_clients import GoogleClientCache
+
+def make_cache(monkeypatch, max_accounts=2):
+    """A cache whose token write-back is recorded instead of hitting the database."""
+    cache, saves = GoogleClientCache(max_accounts=max_accounts), []
+    async def save_token(account_id, token, expires_at):
+        saves.append((account_id, token))
+    monkeypatch.setattr(cache, "_save_token", save_token)
+    return cache, saves
+
+def make_account(expires_in_seconds):
+    return Account(
+        id=uuid.uuid4(),
+        access_token="old-token",
+        refresh_token="refresh",
+        expires_at=datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(seconds=expires_in_seconds)
+    )
+
+def fake_refresh(monkeypatch):
+    calls = []
+    def refresh(self, request):
+        calls.append(1)
+        self.token = "new-token"
+        self.expiry = datetime.datetime.utcnow() + datetime.timedelta(hours=1)
+    monkeypatch.setattr(Credentials, "refresh", refresh)
+    return calls
+
+def test_valid_token_is_reused_without_refresh(monkeypatch):
+    """Test a token far from expiry is used as-is and nothing is written back"""
+    calls = fake_refresh(monkeypatch)
+    (cache, saves), account = make_cache(monkeypatch), make_account(3600)
+
+    first = asyncio.run(cache.credentials(account))
+    second = asyncio.run(cache.credentials(account))
+
+    assert first is second
+    assert first.token == "old-token"
+    assert calls == [] and saves == []
+
+def test_expiring_token_is_refreshed_and_written_back(monkeypatch):
+    """Test a token inside the refresh margin is refreshed once and saved in its own session"""
+    calls = fake_refresh(monkeypatch)
+    (cache, saves), account = make_cache(monkeypatch), make_account(30)
+
+    asyncio.run(cache.credentials(account))
+    asyncio.run(cache.credentials(account))
+
+    assert len(calls) == 1
+    assert saves == [(account.id, "new-token")]
+    assert account.access_token == "new-token"
+    assert account.expires_at > datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(minutes=50)
+
+def test_lru_evicts_least_recently_used_account(monkeypatch):
+    """Test the cache keeps at most max_accounts entries, evicting the oldest"""
+    fake_refresh(monkeypatch)
+    cache, _ = make_cache(monkeypatch)
+    a, b, c = make_account(3600), make_account(3600), make_account(3600)
+
+    first_a = asyncio.run(cache.credentials(a))
+    asyncio.run(cache.credentials(b))
+    asyncio.run(cache.credentials(a))  # a is now most recent
+    asyncio.run(cache.credentials(c))  # evicts b
+
+    assert set(cache._entries) == {str(a.id), str(c.id)}
+    assert asyncio.run(cache.credentials(a)) is first_a
+
+def test_new_refresh_token_rebuilds_entry(monkeypatch):
+    """Test re-authorising an account replaces its cached credentials"""
+    fake_refresh(monkeypatch)
+    (cache, _), account = make_cache(monkeypatch), make_account(3600)
+
+    first = asyncio.run(cache.credentials(account))
+    account.refresh_token = "rotated"
+    second = asyncio.run(cache.credentials(account))
+
+    assert first is not second
+    assert second.refresh_token == "rotated"
+
+def test_requests_execute_off_the_loop_on_their_own_transport(monkeypatch):
+    """Test each execute runs in a worker thread with a fresh authorized http"""
+    fake_refresh(monkeypatch)
+    (cache, _), account = make_cache(monkeypatch), make_account(3600)
+    seen = []
+
+    class FakeRequest:
+        def execute(self, http=None):
+            seen.append((threading.current_thread() is threading.main_thread(), http))
+            return {"items": []}
+
+    async def run():
+        return await asyncio.gather(cache.execute(account, FakeRequest()), cache.execute(account, FakeRequest()))
+
+    assert asyncio.run(run()) == [{"items": []}, {"items": []}]
+    assert [on_loop for on_loop, _ in seen] == [False, False]
+    assert seen[0][1] is not seen[1][1]
+    assert seen[0][1].credentials is seen[1][1].credentials
@@ -0,0 +1,112 @@
+import asyncio
+from app.services.ingest_pipeline import Stage, StagedPipeline
+
+def test_pipeline_runs_items_through_all_stages():
+    """Test items flow through every stage, including batch stages and resumed entries"""
+    seen = {"double": [], "batch_sizes": [], "sink": []}
+
+    async def double(items):
+        seen["double"].extend(items)
+        return [i * 2 for i in items]
+
+    async def batch(items):
+        seen["batch_sizes"].append(len(items))
+        return items
+
+    async def sink(items):
+        seen["sink"].extend(items)
+        return items
+
+    pipeline = StagedPipeline([
+        Stage("double", double, concurrency=3),
+        Stage("batch", batch, concurrency=1, batch_size=4, linger=None),
+        Stage("sink", sink, concurrency=2),
+    ], queue_size=2)
+
+    # 100 enters mid-pipeline, as a resumed item would
+    entries = [(0, n) for n in range(10)] + [(1, 100)]
+    stats = asyncio.run(pipeline.run(entries))
+
+    assert sorted(seen["sink"]) == sorted([n * 2 for n in range(10)] + [100])
+    assert 100 not in seen["double"]
+    assert sum(seen["batch_sizes"]) == 11
+    assert max(seen["batch_sizes"]) <= 4
+    assert stats["double"]["processed"] == 10
+    assert stats["sink"]["emitted"] == 11
+
+def test_pipeline_failed_batch_is_dropped_and_counted():
+    """Test a failing stage drops its batch without stopping the pipeline"""
+    async def flaky(items):
+        if 3 in items:
+            raise RuntimeError("bad item")
+        return items
+
+    out = []
+
+    async def sink(items):
+        out.extend(items)
+        return items
+
+    pipeline = StagedPipeline([Stage("flaky", flaky, concurrency=2), Stage("sink", sink)])
+    stats = asyncio.run(pipeline.run([(0, n) for n in range(5)]))
+
+    assert sorted(out) == [0, 1, 2, 4]
+    assert stats["flaky"]["failed"] == 1
+
+def test_pipeline_overlaps_slow_stages():
+    """Test slow stages with several workers run concurrently"""
+    async def slow(items):
+        await asyncio.sleep(0.05)
+        return items
+
+    pipeline = StagedPipeline([Stage("a", slow, concurrency=10), Stage("b", slow, concurrency=10)])
+
+    async def timed():
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        await pipeline.run([(0, n) for n in range(10)])
+        return loop.time() - started
+
+    # Sequential would take 10 * 2 * 0.05 = 1s
+    assert asyncio.run(timed()) < 0.5
+
+def test_lingering_batch_never_loses_the_sentinel(monkeypatch):
+    """Test a sentinel arriving at the linger deadline still ends the stage, even if wait_for drops items"""
+    async def lossy_wait_for(awaitable, timeout):
+        # Python 3.10 behaviour when the timeout races a completed get()
+        await awaitable
+        raise asyncio.TimeoutError()
+    monkeypatch.setattr(asyncio, "wait_for", lossy_wait_for)
+
+    async def upstream(items):
+        await asyncio.sleep(0.05) # the last item and the sentinel land right at the deadline
+        return items
+
+    out = []
+
+    async def lingering(items):
+        out.extend(items)
+        return items
+
+    pipeline = StagedPipeline([
+        Stage("upstream", upstream, concurrency=2),
+        Stage("lingering", lingering, concurrency=1, batch_size=10, linger=0.05),
+    ])
+
+    async def guarded():
+        run = asyncio.ensure_future(pipeline.run([(0, n) for n in range(3)]))
+        done, _ = await asyncio.wait({run}, timeout=2)
+        if not done:
+            run.cancel()
+        return bool(done)
+
+    assert asyncio.run(guarded()), "pipeline hung waiting for a lost sentinel"
+    assert sorted(out) == [0, 1, 2]
+
+def test_failed_parse_batch_holds_back_the_history_id():
+    """Test messages lost before their rows are written count against advancing the sync cursor"""
+    from app.services.sync_service import SyncService
+    clean = {"fetch": {"failed": 0}, "parse": {"failed": 0}, "classify": {"failed": 3}}
+    assert SyncService.unstored_count(clean) == 0
+    assert SyncService.unstored_count({**clean, "parse": {"failed": 20}}) == 20
+    assert SyncService.unstored_count({**clean, "fetch": {"failed": 5}}) == 5
@@ -0,0 +1,106 @@
+import asyncio
+from app.services import intent_classifier as intent_module
+from app.services.intent_classifier import IntentClassifier
+
+EXAMPLES = {
+    "filter": ["show emails", "find mails"],
+    "chat": ["write a poem", "tell a joke"],
+}
+
+def fake_vector(text):
+    # Two-dimensional "embedding": mail-ish words point one way, everything else the other
+    text = text.lower()
+    return [1.0, 0.1] if ("mail" in text or "inbox" in text) else [0.1, 1.0]
+
+async def fake_batch(texts, caller=None):
+    return [fake_vector(t) for t in texts]
+
+async def fake_single(text, caller=None):
+    return fake_vector(text)
+
+def no_llm():
+    calls = []
+
+    async def fallback(query):
+        calls.append(query)
+        return {"intent": "explain", "confidence": "high", "reasoning": "llm"}
+    return fallback, calls
+
+def test_keyword_rule_decides_without_embedding_or_llm(monkeypatch):
+    """Test unambiguous phrasing is classified by rules; the embedding is never awaited"""
+    fallback, calls = no_llm()
+
+    async def never():
+        raise AssertionError("embedding must not be awaited")
+
+    async def scenario():
+        pending = asyncio.ensure_future(never())
+        result = await IntentClassifier(examples=EXAMPLES).classify("Archive all newsletters", embedding=pending, fallback=fallback)
+        pending.cancel()
+        return result
+
+    result = asyncio.run(scenario())
+    assert (result["intent"], result["source"]) == ("command", "rule")
+    assert calls == []
+
+def test_off_topic_questions_are_not_decided_by_rules():
+    """Test "why"/"find" openers without an email term are left to the other tiers"""
+    classifier = IntentClassifier(examples=EXAMPLES)
+    assert classifier.classify_rules("Why is the sky blue?") is None
+    assert classifier.classify_rules("Explain quantum computing") is None
+    assert classifier.classify_rules("find me a pasta recipe") is None
+    assert classifier.classify_rules("find a good laptop") is None
+    assert classifier.classify_rules("Why is this email marked as critical?")["intent"] == "explain"
+    assert classifier.classify_rules("Show unread messages from GitHub")["intent"] == "filter"
+
+def test_off_topic_why_query_goes_past_the_rules(monkeypatch):
+    """Test an off-topic "why" question reaches the LLM guardrail instead of short-circuiting"""
+    monkeypatch.setattr(intent_module.brain_service, "get_embeddings_batch", fake_batch)
+    calls = []
+
+    async def guardrail(query):
+        calls.append(query)
+        return {"intent": "chat", "confidence": "high", "reasoning": "not about email"}
+
+    result = asyncio.run(IntentClassifier(examples=EXAMPLES).classify("Why is the sky blue?", embedding=[1.0, 1.0], fallback=guardrail))
+    assert (result["intent"], result["source"]) == ("chat", "llm")
+    assert calls == ["Why is the sky blue?"]
+
+def test_nearest_centroid_classifies_paraphrases(monkeypatch):
+    """Test queries no rule covers are labelled by the closest intent centroid"""
+    monkeypatch.setattr(intent_module.brain_service, "get_embeddings_batch", fake_batch)
+    fallback, calls = no_llm()
+    classifier = IntentClassifier(examples=EXAMPLES)
+    result = asyncio.run(classifier.classify("anything new in my inbox", embedding=fake_vector("inbox"), fallback=fallback))
+    assert (result["intent"], result["source"]) == ("filter", "centroid")
+    assert calls == []
+
+def test_low_confidence_defers_to_llm_and_caches(monkeypatch):
+    """Test ambiguous queries go to the LLM once; repeats are served from the cache"""
+    monkeypatch.setattr(intent_module.brain_service, "get_embeddings_batch", fake_batch)
+    monkeypatch.setattr(intent_module.brain_service, "get_embedding", fake_single)
+    fallback, calls = no_llm()
+    classifier = IntentClassifier(examples=EXAMPLES)
+
+    async def scenario():
+        # Equidistant from both centroids: no margin, so the local tiers abstain
+        first = await classifier.classify("hmm", embedding=[1.0, 1.0], fallback=fallback)
+        second = await classifier.classify("  HMM ", fallback=fallback)
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert (first["intent"], first["source"]) == ("explain", "llm")
+    assert (second["intent"], second["source"]) == ("explain", "cache")
+    assert calls == ["hmm"]
+
+def test_failed_llm_answer_is_not_cached(monkeypatch):
+    """Test a classification error is not remembered for later queries"""
+    monkeypatch.setattr(intent_module.brain_service, "get_embeddings_batch", fake_batch)
+    classifier = IntentClassifier(examples=EXAMPLES)
+
+    async def broken(query):
+        return {"intent": "chat", "confidence": "low", "reasoning": intent_module.INTENT_FALLBACK_REASONING}
+
+    result = asyncio.run(classifier.classify("hmm", embedding=[1.0, 1.0], fallback=broken))
+    assert result["intent"] == "chat"
+    assert classifier._cache == {}
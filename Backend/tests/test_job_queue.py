@@ -0,0 +1,107 @@
+import asyncio
+from app.services.job_queue import JobQueue, InMemoryBroker, SUCCEEDED, FAILED
+
+def test_enqueue_deduplicates_active_key():
+    """Test a second enqueue for the same key returns the pending job"""
+    async def run():
+        queue = JobQueue(InMemoryBroker())
+        first = await queue.enqueue("gmail_sync", {"account_id": "a"}, key="gmail_sync:a")
+        second = await queue.enqueue("gmail_sync", {"account_id": "a"}, key="gmail_sync:a")
+        other = await queue.enqueue("gmail_sync", {"account_id": "b"}, key="gmail_sync:b")
+        return first, second, other
+
+    first, second, other = asyncio.run(run())
+    assert first.id == second.id
+    assert other.id != first.id
+
+def test_job_retries_then_succeeds(monkeypatch):
+    """Test failing jobs are retried and the key is released on success"""
+    from app.core.config import settings
+    monkeypatch.setattr(settings, "JOB_RETRY_BASE_SECONDS", 0.01)
+    calls = []
+
+    async def flaky(payload):
+        calls.append(payload)
+        if len(calls) < 2:
+            raise RuntimeError("temporary")
+        return {"ok": True}
+
+    async def run():
+        queue = JobQueue(InMemoryBroker())
+        queue.register("flaky", flaky)
+        queue.start(workers=1)
+        job = await queue.enqueue("flaky", {"n": 1}, key="flaky", max_attempts=3)
+        for _ in range(100):
+            await asyncio.sleep(0.02)
+            if (await queue.get(job.id)).status in (SUCCEEDED, FAILED):
+                break
+        again = await queue.enqueue("flaky", {"n": 2}, key="flaky")
+        await queue.stop()
+        return await queue.get(job.id), again
+
+    job, again = asyncio.run(run())
+    assert job.status == SUCCEEDED
+    assert job.attempts == 2
+    assert job.result == {"ok": True}
+    assert again.id != job.id
+
+def test_job_fails_after_max_attempts(monkeypatch):
+    """Test a job is marked failed once retries are exhausted"""
+    from app.core.config import settings
+    monkeypatch.setattr(settings, "JOB_RETRY_BASE_SECONDS", 0.01)
+
+    async def broken(payload):
+        raise RuntimeError("boom")
+
+    async def run():
+        queue = JobQueue(InMemoryBroker())
+        queue.register("broken", broken)
+        queue.start(workers=2)
+        job = await queue.enqueue("broken", {}, max_attempts=2)
+        for _ in range(100):
+            await asyncio.sleep(0.02)
+            if (await queue.get(job.id)).status == FAILED:
+                break
+        await queue.stop()
+        return await queue.get(job.id)
+
+    job = asyncio.run(run())
+    assert job.status == FAILED
+    assert job.attempts == 2
+    assert job.error == "boom"
+
+def test_in_memory_jobs_expire_after_the_result_ttl(monkeypatch):
+    """Test finished jobs are evicted like their Redis counterparts, keys included"""
+    from app.core.config import settings
+    monkeypatch.setattr(settings, "JOB_RESULT_TTL_SECONDS", 0.05)
+
+    async def run():
+        broker = InMemoryBroker()
+        queue = JobQueue(broker)
+        old = await queue.enqueue("gmail_sync", {"account_id": "a"}, key="gmail_sync:a")
+        await asyncio.sleep(0.1)
+        new = await queue.enqueue("gmail_sync", {"account_id": "b"})
+        return broker, old, new
+
+    broker, old, new = asyncio.run(run())
+    assert list(broker.jobs) == [new.id]
+    assert broker.keys == {}
+
+def test_retry_tasks_are_kept_until_they_run(monkeypatch):
+    """Test a scheduled retry is referenced by the queue and dropped once it has run"""
+    from app.core.config import settings
+    monkeypatch.setattr(settings, "JOB_RETRY_BASE_SECONDS", 0.02)
+
+    async def broken(payload):
+        raise RuntimeError("temporary")
+
+    async def run():
+        queue = JobQueue(InMemoryBroker())
+        queue.register("broken", broken)
+        job = await queue.enqueue("broken", {}, max_attempts=2)
+        await queue.run_job(await queue.get(job.id))
+        pending = len(queue._retries)
+        await asyncio.sleep(0.05)
+        return pending, len(queue._retries)
+
+    assert asyncio.run(run()) == (1, 0)
@@ -0,0 +1,118 @@
+import asyncio
+from types import SimpleNamespace
+from app.services.llm_gateway import LLMGateway, FairLimiter, estimate_tokens, pack_by_tokens
+
+def test_fair_limiter_round_robins_between_callers():
+    """Test a caller with a deep queue cannot starve a caller that arrives later"""
+    async def scenario():
+        limiter = FairLimiter(limit=1)
+        order = []
+
+        async def job(key, name):
+            await limiter.acquire(key)
+            try:
+                order.append(name)
+                await asyncio.sleep(0)
+            finally:
+                limiter.release()
+
+        await limiter.acquire("backfill")  # hold the only slot
+        tasks = [asyncio.create_task(job("backfill", f"b{i}")) for i in range(3)]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(job("chat:1", "chat")))
+        await asyncio.sleep(0)
+        limiter.release()
+        await asyncio.gather(*tasks)
+        return order, limiter.in_flight
+
+    order, in_flight = asyncio.run(scenario())
+    assert order == ["b0", "chat", "b1", "b2"]
+    assert in_flight == 0
+
+def test_fair_limiter_cancelled_waiter_frees_its_place():
+    """Test cancelling a queued caller does not leak or swallow a slot"""
+    async def scenario():
+        limiter = FairLimiter(limit=1)
+        await limiter.acquire("a")
+        waiter = asyncio.create_task(limiter.acquire("b"))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.sleep(0)
+        limiter.release()
+        await limiter.acquire("c")
+        limiter.release()
+        return limiter.in_flight, limiter.queued
+
+    assert asyncio.run(scenario()) == (0, 0)
+
+def test_gateway_caps_concurrent_calls():
+    """Test no more than max_in_flight calls run at once"""
+    async def scenario():
+        gateway = LLMGateway(max_in_flight=2, model_limits={"m": {"rpm": 60000, "tpm": 10**9}})
+        running, peak = 0, 0
+
+        async def call():
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            return SimpleNamespace(usage_metadata=None)
+
+        await asyncio.gather(*(gateway.submit("m", call, caller=f"u{i % 3}") for i in range(8)))
+        return peak, gateway.snapshot()
+
+    peak, stats = asyncio.run(scenario())
+    assert peak == 2
+    assert stats["requests"] == 8 and stats["in_flight"] == 0
+
+def test_gateway_waits_for_model_rpm_budget():
+    """Test calls beyond the per-model RPM burst are delayed"""
+    async def scenario():
+        gateway = LLMGateway(max_in_flight=4, model_limits={"m": {"rpm": 600, "tpm": 10**9}})
+        gateway.budget("m").requests.tokens = 1
+
+        async def call():
+            return None
+
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        await gateway.submit("m", call)
+        await gateway.submit("m", call)
+        return loop.time() - started
+
+    # 600 rpm refills one request every 0.1s
+    assert asyncio.run(scenario()) >= 0.08
+
+def test_estimate_tokens():
+    """Test token estimates cover strings and content lists"""
+    assert estimate_tokens("a" * 400) == 101
+    assert estimate_tokens(["a" * 40, "b" * 40]) == 21
+
+def test_pack_by_tokens_respects_item_and_token_limits():
+    """Test packing starts a new batch when either limit would be exceeded"""
+    texts = ["a" * 396] * 5 + ["b" * 4000, "c" * 4]
+    # 100 tokens each, then one oversized text, then a tiny one
+    assert pack_by_tokens(texts, max_items=2, max_tokens=1000) == [[0, 1], [2, 3], [4], [5], [6]]
+    assert pack_by_tokens(texts, max_items=10, max_tokens=300) == [[0, 1, 2], [3, 4], [5], [6]]
+
+def test_stream_holds_slot_until_consumer_stops():
+    """Test a streamed call keeps its slot while streaming and frees it when the consumer closes early"""
+    async def scenario():
+        gateway = LLMGateway(max_in_flight=1, model_limits={})
+
+        async def chunks():
+            for i in range(5):
+                yield SimpleNamespace(text=str(i), usage_metadata=None)
+
+        async def call():
+            return chunks()
+
+        stream = gateway.stream("m", call, caller="chat:1")
+        first = await stream.__anext__()
+        during = gateway.limiter.in_flight
+        await stream.aclose()
+        return first.text, during, gateway.limiter.in_flight
+
+    first, during, after = asyncio.run(scenario())
+    assert (first, during, after) == ("0", 1, 0)
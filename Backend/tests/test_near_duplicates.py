@@ -0,0 +1,54 @@
+import uuid
+from unittest.mock import patch
+from sqlalchemy.dialects import postgresql
+from app.db.email_repository import EmailRepository
+from app.services.near_duplicates import DuplicateMatch, fingerprint_text, hamming, simhash
+
+OTP = "Your one time password for SRM Academia login is {code}. It expires in 10 minutes. Do not share it with anyone."
+RECEIPT = "Thank you for your order {order} from Campus Store. Your total was Rs {amount}. Track your delivery in the app."
+
+def test_automated_mails_that_differ_in_digits_are_near_identical():
+    """Test OTPs / receipts with different numbers fingerprint within the threshold"""
+    a = simhash(fingerprint_text("Your OTP", OTP.format(code="482913")))
+    b = simhash(fingerprint_text("Your OTP", OTP.format(code="077145")))
+    assert hamming(a, b) <= 3
+
+    r1 = simhash(fingerprint_text("Order confirmed", RECEIPT.format(order="#A1932", amount="450")))
+    r2 = simhash(fingerprint_text("Order confirmed", RECEIPT.format(order="#A2210", amount="1,299")))
+    assert hamming(r1, r2) <= 3
+
+def test_different_mails_are_far_apart():
+    """Test unrelated texts land far outside the threshold"""
+    a = simhash(fingerprint_text("Your OTP", OTP.format(code="482913")))
+    b = simhash(fingerprint_text("Lab report", "Please submit the compiler design lab report by Friday evening with all the outputs attached."))
+    assert hamming(a, b) > 10
+
+def test_fingerprint_fits_a_bigint_and_skips_short_texts():
+    """Test fingerprints are signed 64-bit and short texts are not fingerprinted"""
+    value = simhash(fingerprint_text("Weekly digest", RECEIPT.format(order="1", amount="2")))
+    assert -(1 << 63) <= value < (1 << 63)
+    assert simhash("thanks!") is None
+    with patch("app.services.near_duplicates.settings.NEAR_DUP_MIN_TOKENS", 1):
+        assert simhash("thanks!") is not None
+
+def test_match_carries_the_source_classification():
+    """Test an inherited result has the shape classify_emails_batch returns"""
+    match = DuplicateMatch(source_id=uuid.uuid4(), distance=1, score=12, category="Noise",
+                           explanation="OTP for login", confidence=0.9, has_tasks=False)
+    assert match.classification() == {"score": 12, "category": "Noise", "explanation": "OTP for login", "confidence": 0.9}
+
+def test_embeddings_are_copied_inside_the_database():
+    """Test reused embeddings are set from the source row with an UPDATE ... subquery"""
+    captured = []
+
+    class FakeSession:
+        async def execute(self, stmt, params=None):
+            captured.append((str(stmt.compile(dialect=postgresql.dialect())), params))
+
+    import asyncio
+    target, source = uuid.uuid4(), uuid.uuid4()
+    count = asyncio.run(EmailRepository().copy_embeddings(FakeSession(), {target: source}))
+    assert count == 1
+    sql, params = captured[0]
+    assert sql.startswith("UPDATE emails SET embedding=(SELECT")
+    assert params == [{"target_id": target, "source_id": source}]
@@ -0,0 +1,65 @@
+from app.core.metrics import metrics
+from app.services.pre_classifier import PreClassifier, bucket_for
+from app.services.sender_profiles import SenderStats
+
+def doc(sender, subject, **metadata):
+    return {"gmail_id": "m1", "metadata": {"from": sender, "subject": subject, **metadata}}
+
+def test_promotional_mailing_list_is_decided_as_noise():
+    """Test a spam keyword plus List-Unsubscribe is enough to skip the LLM"""
+    result = PreClassifier(min_confidence=0.85).decide(
+        doc("Zomato <noreply@zomato.com>", "Flat 50% discount tonight", list_unsubscribe=True)
+    )
+    assert result["category"] == "Noise"
+    assert result["score"] < 30
+    assert result["confidence"] >= 0.85
+
+def test_conflicting_signals_are_left_to_the_llm():
+    """Test an internship offer (Important vs spam keyword) stays ambiguous"""
+    classifier = PreClassifier(min_confidence=0.85)
+    assert classifier.decide(doc("hr@company.com", "Internship offer letter")) is None
+    assert classifier.decide(doc("friend@gmail.com", "hey")) is None
+
+def test_vip_domain_backs_critical_keywords():
+    """Test a VIP domain strengthens the urgent bucket its keywords point to"""
+    result = PreClassifier(min_confidence=0.85).decide(
+        doc("Exam Cell <coe@srmist.edu.in>", "End semester exam timetable")
+    )
+    assert result["category"] == "Critical"
+    assert "VIP domain srmist.edu.in" in result["explanation"]
+
+def test_consistent_sender_history_decides_and_sets_the_score():
+    """Test a sender with stable past scores is classified from its history"""
+    classifier = PreClassifier(min_confidence=0.85)
+    stable = SenderStats(emails_received=12, scored=12, mean_score=72.4, spread=4.0)
+    result = classifier.decide(doc("guide@lab.org", "Weekly sync"), stable)
+    assert result["category"] == "Important"
+    assert result["score"] == 72
+
+    noisy = SenderStats(emails_received=12, scored=12, mean_score=72.4, spread=30.0)
+    assert classifier.decide(doc("guide@lab.org", "Weekly sync"), noisy) is None
+    few = SenderStats(emails_received=2, scored=2, mean_score=72.4, spread=0.0)
+    assert classifier.decide(doc("guide@lab.org", "Weekly sync"), few) is None
+
+def test_archived_sender_with_bulk_headers_is_noise():
+    """Test a sender the user keeps archiving, mailing through a list, skips the LLM"""
+    archived = SenderStats(emails_received=20, dismiss_rate=0.9)
+    result = PreClassifier(min_confidence=0.75).decide(
+        doc("updates@coursera.org", "Your weekly picks", list_unsubscribe=True), archived
+    )
+    assert result["category"] == "Noise"
+    assert "you usually archive this sender" in result["explanation"]
+
+def test_audit_counts_agreement_by_bucket():
+    """Test audited emails count as agreeing when the LLM lands in the same bucket"""
+    metrics.reset()
+    classifier = PreClassifier()
+    assert classifier.record_audit({"score": 10}, {"score": 22}) is True
+    assert classifier.record_audit({"score": 10}, {"score": 65}) is False
+    assert classifier.record_audit({"score": 10}, None) is None
+    classifier.record(short_circuited=3, sent_to_llm=1)
+
+    stats = classifier.stats()
+    assert stats["agreement_rate"] == 0.5
+    assert stats["short_circuit_rate"] == 0.75
+    assert bucket_for(85) == "Critical" and bucket_for(84) == "Important"
@@ -0,0 +1,95 @@
+import asyncio
+import uuid
+from app.services import chat_service as chat_module
+from app.services.chat_service import ChatService
+from app.services.conversation_memory import Memory
+from app.services.response_cache import ResponseCache
+
+USER = "user-1"
+ACCOUNT = uuid.uuid4()
+
+def cache():
+    return ResponseCache(similarity=0.95, ttl=60, per_user=3)
+
+def test_similar_query_hits_and_unrelated_misses():
+    """Test lookups match on embedding similarity, per user"""
+    c = cache()
+    c.store(USER, [1.0, 0.0, 0.0], "what's due tomorrow", "Two tasks.", ["Lab"], "filter", [ACCOUNT])
+    assert c.lookup(USER, [0.99, 0.05, 0.0]).response == "Two tasks."
+    assert c.lookup(USER, [0.0, 1.0, 0.0]) is None
+    assert c.lookup("someone-else", [1.0, 0.0, 0.0]) is None
+
+def test_sync_invalidates_answers_retrieved_from_that_account():
+    """Test a mailbox change drops only answers that drew on that mailbox"""
+    c = cache()
+    other = uuid.uuid4()
+    c.store(USER, [1.0, 0.0], "q1", "a1", [], "filter", [ACCOUNT])
+    c.store(USER, [0.0, 1.0], "q2", "a2", [], "filter", [other])
+    assert c.invalidate_accounts([ACCOUNT], "test") == 1
+    assert c.lookup(USER, [1.0, 0.0]) is None
+    assert c.lookup(USER, [0.0, 1.0]).response == "a2"
+
+def test_user_invalidation_and_expiry():
+    """Test task/calendar changes clear a user's answers, and old answers expire"""
+    c = cache()
+    c.store(USER, [1.0, 0.0], "q", "a", [], "filter", [ACCOUNT])
+    c.invalidate_user(USER, "task status changed")
+    assert c.lookup(USER, [1.0, 0.0]) is None
+
+    c.ttl = -1
+    c.store(USER, [1.0, 0.0], "q", "a", [], "filter", [ACCOUNT])
+    assert c.lookup(USER, [1.0, 0.0]) is None
+
+def test_per_user_capacity_evicts_least_recent():
+    """Test each user keeps at most per_user answers"""
+    c = cache()
+    for i in range(4):
+        vector = [0.0] * 4
+        vector[i] = 1.0
+        c.store(USER, vector, f"q{i}", f"a{i}", [], "filter", [ACCOUNT])
+    assert c.lookup(USER, [1.0, 0.0, 0.0, 0.0]) is None
+    assert c.lookup(USER, [0.0, 0.0, 0.0, 1.0]).response == "a3"
+
+class CachedChat(ChatService):
+    def __init__(self):
+        self.generated = 0
+
+    async def _classify_intent(self, query, user_id=None, embedding=None):
+        return {"intent": "filter", "is_allowed": True}
+
+    async def _retrieve_context(self, query, user_id, embedding=None):
+        return "context", ["Lab"], [ACCOUNT]
+
+    async def finish_turn(self, db, turn, answer_text):
+        return "Title"
+
+def test_repeated_question_skips_generation(monkeypatch):
+    """Test the second identical question is answered from the cache; no_cache forces generation"""
+    c = cache()
+    service = CachedChat()
+
+    async def fake_embedding(text, caller=None):
+        return [1.0, 0.0]
+
+    async def no_memory(conversation_id):
+        return Memory()
+
+    async def fake_answer(prompt, caller=None):
+        service.generated += 1
+        return "Lab report due tomorrow."
+
+    monkeypatch.setattr(chat_module, "response_cache", c)
+    monkeypatch.setattr(chat_module.brain_service, "get_embedding", fake_embedding)
+    monkeypatch.setattr(chat_module.brain_service, "generate_answer", fake_answer)
+    monkeypatch.setattr(chat_module.conversation_memory, "load", no_memory)
+    conversation = uuid.uuid4()
+
+    async def ask(use_cache=True):
+        return await service.generate_response("what's due tomorrow", USER, db=None, conversation_id=conversation, use_cache=use_cache)
+
+    first = asyncio.run(ask())
+    second = asyncio.run(ask())
+    bypassed = asyncio.run(ask(use_cache=False))
+    assert (first.cached, second.cached, bypassed.cached) == (False, True, False)
+    assert second.response == first.response and second.sources == ["Lab"]
+    assert service.generated == 2
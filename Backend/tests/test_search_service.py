@@ -0,0 +1,52 @@
+import asyncio
+import uuid
+from sqlalchemy.dialects import postgresql
+from app.services.search_service import SearchService, reciprocal_rank_fusion
+
+def test_rrf_rewards_items_found_by_both_retrievers():
+    """Test an item ranked by both lists beats items ranked highly by only one"""
+    fused = reciprocal_rank_fusion({
+        "lexical": ["a", "b", "c"],
+        "semantic": ["d", "b", "e"],
+    }, k=60)
+    assert fused[0][0] == "b"
+    assert fused[0][2] == ["lexical", "semantic"]
+    assert {item for item, _, _ in fused} == {"a", "b", "c", "d", "e"}
+
+def test_rrf_ties_keep_rank_order():
+    """Test a single list passes through in its own order"""
+    fused = reciprocal_rank_fusion({"lexical": ["x", "y", "z"]})
+    assert [item for item, _, _ in fused] == ["x", "y", "z"]
+
+class RecordingDB:
+    def __init__(self):
+        self.statements = []
+
+    async def execute(self, stmt, params=None):
+        self.statements.append(stmt)
+        class Result:
+            def scalars(self):
+                return self
+            def all(self):
+                return []
+        return Result()
+
+def test_lexical_mode_makes_no_embedding_call(monkeypatch):
+    """Test the lexical fast path only runs full-text SQL"""
+    async def fail(*args, **kwargs):
+        raise AssertionError("embedding requested")
+    monkeypatch.setattr("app.services.search_service.brain_service.get_embedding", fail)
+
+    db = RecordingDB()
+    hits = asyncio.run(SearchService().search(db, "CS1101 assignment", [uuid.uuid4()], mode="lexical"))
+    assert hits == []
+    sql = str(db.statements[0].compile(dialect=postgresql.dialect()))
+    assert "websearch_to_tsquery" in sql
+    assert "attachments.search_vector @@" in sql
+    assert "emails.account_id IN" in sql
+
+def test_empty_scope_returns_nothing():
+    """Test a user without accounts gets no results and no queries"""
+    db = RecordingDB()
+    assert asyncio.run(SearchService().search(db, "anything", [])) == []
+    assert db.statements == []
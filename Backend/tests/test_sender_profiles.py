@@ -0,0 +1,71 @@
+import datetime
+import uuid
+from sqlalchemy.dialects import postgresql
+from app.db.models import SenderProfile
+from app.services.sender_profiles import SenderProfileService, SenderStats, merge_updates, sender_address, sender_address_sql
+
+USER = uuid.uuid4()
+
+def test_sender_address_is_normalized():
+    """Test display names and case are dropped from the profile key"""
+    assert sender_address("Exam Cell <COE@SRMist.edu.in>") == "coe@srmist.edu.in"
+    assert sender_address("prof@lab.org") == "prof@lab.org"
+    assert sender_address("") == ""
+
+def test_updates_for_one_sender_are_merged_into_one_row():
+    """Test a batch touching the same sender twice becomes a single upsert row"""
+    service = SenderProfileService()
+    t1 = datetime.datetime(2026, 1, 1, tzinfo=datetime.timezone.utc)
+    t2 = t1 + datetime.timedelta(hours=1)
+    rows = merge_updates([
+        service.email_update(USER, "Prof <prof@lab.org>", 70, at=t1),
+        service.email_update(USER, "prof@lab.org", 80, at=t2),
+        service.email_update(USER, "other@lab.org", None, at=t1),
+        service.interaction_update(USER, "prof@lab.org", "reply", at=t1),
+    ])
+    assert len(rows) == 2
+    prof = next(r for r in rows if r["sender"] == "prof@lab.org")
+    assert prof["emails_received"] == 2 and prof["scored"] == 2
+    assert prof["score_sum"] == 150 and prof["replies"] == 1 and prof["engagement"] == 1.0
+    assert prof["decayed_at"] == t2 and prof["domain"] == "lab.org"
+    other = next(r for r in rows if r["sender"] == "other@lab.org")
+    assert other["scored"] == 0 and other["emails_received"] == 1
+
+def test_unknown_actions_are_ignored():
+    """Test only actions that carry signal update a profile"""
+    assert SenderProfileService().interaction_update(USER, "a@b.com", "hover") is None
+
+def test_upsert_decays_then_increments_in_one_statement():
+    """Test the upsert adds counters and decays recency-weighted figures server side"""
+    rows = merge_updates([SenderProfileService().email_update(USER, "a@b.com", 40)])
+    sql = str(SenderProfileService().upsert_statement(rows).compile(dialect=postgresql.dialect()))
+    assert "ON CONFLICT (user_id, sender) DO UPDATE" in sql
+    assert "sender_profiles.emails_received + excluded.emails_received" in sql
+    assert "power" in sql and "sender_profiles.exposure *" in sql
+
+def test_stats_are_read_from_stored_sums():
+    """Test mean, spread and rates come straight from the profile row"""
+    profile = SenderProfile(
+        emails_received=4, scored=4, score_sum=280.0, score_sq_sum=4 * 70.0 ** 2 + 4 * 25.0,
+        exposure=4.0, engagement=3.0, dismissals=0.0
+    )
+    stats = SenderStats.from_profile(profile)
+    assert stats.mean_score == 70.0
+    assert round(stats.spread, 6) == 5.0
+    assert stats.engagement_rate == 0.75
+
+def test_rank_boost_needs_enough_history():
+    """Test ranking ignores senders with too few emails and penalizes archived ones"""
+    service = SenderProfileService()
+    assert service.rank_boost(SenderStats(emails_received=1, engagement_rate=1.0)) == 0.0
+    assert service.rank_boost(SenderStats(emails_received=10, engagement_rate=1.0)) > 0
+    assert service.rank_boost(SenderStats(emails_received=10, dismiss_rate=1.0)) < 0
+
+def test_rank_boost_sql_orders_pages_server_side():
+    """Test the SQL boost mirrors rank_boost: history threshold and capped rates"""
+    sql = str(SenderProfileService().rank_boost_sql().compile(dialect=postgresql.dialect()))
+    assert "sender_profiles.emails_received >=" in sql
+    assert "least(sender_profiles.engagement / CAST(nullif(sender_profiles.exposure" in sql
+    assert "ELSE" in sql
+    address = str(sender_address_sql(SenderProfile.sender).compile(dialect=postgresql.dialect()))
+    assert address.startswith("lower(trim(coalesce(SUBSTRING(sender_profiles.sender FROM")
@@ -0,0 +1,95 @@
+import asyncio
+import json
+import re
+from types import SimpleNamespace
+from unittest.mock import patch
+from app.core.metrics import metrics
+from app.schemas.llm import EmailClassification, IntentResult
+from app.services import structured_output
+from app.services.brain import BrainService
+
+class ScriptedModels:
+    """Stands in for client.aio.models; each request gets the next scripted answer for its IDs"""
+    def __init__(self, *answers):
+        self.answers = list(answers)
+        self.requests = []
+
+    async def generate_content(self, model, contents, config=None):
+        ids = re.findall(r"ID: (\S+)", contents[-1]) if isinstance(contents, list) else []
+        self.requests.append(ids)
+        answer = self.answers.pop(0)
+        return SimpleNamespace(text=answer(ids) if callable(answer) else answer, usage_metadata=None)
+
+def make_brain(*answers):
+    brain = BrainService()
+    models = ScriptedModels(*answers)
+    brain.client = SimpleNamespace(aio=SimpleNamespace(models=models))
+    return brain, models
+
+def docs(n):
+    return [{"gmail_id": f"m{i}", "metadata": {"from": "a@b.com", "subject": "s"}, "content": {"raw_snippet": "x"}} for i in range(n)]
+
+def good(ids):
+    return json.dumps({i: {"score": 40, "category": "FYI", "explanation": "ok", "confidence": 0.8} for i in ids})
+
+def test_parse_tolerates_fences_and_prose():
+    """Test fenced or wrapped JSON is recovered and garbage gives None"""
+    assert structured_output.parse_json('```json\n{"a": 1}\n```') == {"a": 1}
+    assert structured_output.parse_json('Here you go: {"a": 1} hope it helps') == {"a": 1}
+    assert structured_output.parse_json('{"a": 1, "b": ') is None
+
+def test_keyed_validation_separates_valid_missing_and_invalid():
+    """Test each id is judged on its own against the schema"""
+    parsed = {"m0": {"score": 50}, "m1": {"score": 250}, "extra": {"score": 1}}
+    valid, missing, invalid = structured_output.validate_keyed(parsed, ["m0", "m1", "m2"], EmailClassification)
+    assert set(valid) == {"m0"} and valid["m0"]["category"] == "Uncategorized"
+    assert missing == {"m2"} and invalid == {"m1"}
+
+def test_bad_task_does_not_invalidate_the_classification():
+    """Test a malformed task is dropped while the classification is kept"""
+    parsed = {
+        "m0": {"score": 60, "task": {"is_task": True, "type": "errand"}},
+        "m1": {"score": 60, "task": None},
+        "m2": {"score": 60, "task": {"is_task": True, "type": "meeting"}},
+    }
+    valid, missing, invalid = structured_output.validate_keyed(parsed, ["m0", "m1", "m2"], EmailClassification)
+    assert not missing and not invalid
+    assert valid["m0"]["score"] == 60 and "task" not in valid["m0"]
+    assert valid["m1"]["task"] == {"is_task": False}
+    assert valid["m2"]["task"]["type"] == "meeting"
+
+def test_only_missing_and_invalid_items_are_requested_again():
+    """Test a partly bad batch re-requests just the bad items and keeps the rest"""
+    metrics.reset()
+    first = lambda ids: json.dumps({"m0": {"score": 10}, "m1": {"score": "high"}, "m2": {"score": 90}})
+    brain, models = make_brain(first, good)
+    result = asyncio.run(brain.classify_emails_batch(docs(4)))
+
+    assert set(result) == {"m0", "m1", "m2", "m3"}
+    assert models.requests == [["m0", "m1", "m2", "m3"], ["m1", "m3"]]
+    stats = structured_output.stats()
+    assert stats["repaired"] == 2 and stats["dropped"] == 0 and stats["repair_rate"] == 1.0
+
+def test_malformed_response_is_retried_in_halves_and_bounded():
+    """Test unparseable output splits the retry, and retries stop at the limit"""
+    metrics.reset()
+    brain, models = make_brain('{"m0": {"score": 1', good, "not json", "not json")
+    with patch("app.services.brain.settings.LLM_OUTPUT_MAX_RETRIES", 1):
+        result = asyncio.run(brain.classify_emails_batch(docs(4)))
+
+    assert models.requests[0] == ["m0", "m1", "m2", "m3"]
+    assert sorted(map(len, models.requests[1:])) == [2, 2]
+    assert len(result) == 2
+    assert structured_output.stats()["dropped"] == 2
+    assert metrics.get("llm_output.malformed_responses") == 2
+
+def test_single_object_answers_are_validated_and_retried():
+    """Test an invalid intent is asked again, and the fallback is used when retries run out"""
+    brain, models = make_brain('{"intent": "dance"}', '{"intent": "filter", "confidence": "high"}')
+    assert asyncio.run(brain.classify_intent("show me lab mails"))["intent"] == "filter"
+    assert len(models.requests) == 2
+
+    brain, models = make_brain("nope", "nope", "nope")
+    result = asyncio.run(brain.classify_intent("hello"))
+    assert result["intent"] == "chat" and result["reasoning"] == "Classification error"
+    assert structured_output.validate_object([{"intent": "teach"}], IntentResult)["intent"] == "teach"
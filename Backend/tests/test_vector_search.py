@@ -0,0 +1,33 @@
+import uuid
+from sqlalchemy.dialects import postgresql
+from app.services.vector_search import VectorSearchService
+
+def compile_sql(stmt) -> str:
+    return str(stmt.compile(dialect=postgresql.dialect()))
+
+def test_scoped_query_filters_by_account():
+    """Test retrieval is restricted to the caller's accounts"""
+    service = VectorSearchService()
+    stmt = service.build_query([0.1] * 768, [uuid.uuid4()], limit=5, exact=False)
+    sql = compile_sql(stmt)
+    assert "emails.account_id IN" in sql
+    assert "ORDER BY emails.embedding <=> " in sql
+    assert "LIMIT" in sql
+
+def test_exact_query_hides_distance_operator_from_ann_index():
+    """Test small scopes sort an expression the HNSW index cannot serve, forcing pre-filtering"""
+    service = VectorSearchService()
+    sql = compile_sql(service.build_query([0.1] * 768, [uuid.uuid4()], limit=5, exact=True))
+    assert "ORDER BY (emails.embedding <=> " in sql and "+" in sql.split("ORDER BY")[1]
+
+def test_unscoped_query_has_no_account_filter():
+    """Test account_ids=None keeps the global search used by admin tooling"""
+    sql = compile_sql(VectorSearchService().build_query([0.1] * 768, None, limit=5, exact=False))
+    assert "WHERE emails.embedding IS NOT NULL ORDER BY" in " ".join(sql.split())
+
+def test_chunk_query_is_scoped_on_the_chunk_table():
+    """Test the chunk store is searched with the same account scoping"""
+    from app.db.models import Chunk
+    sql = compile_sql(VectorSearchService().build_query([0.1] * 768, [uuid.uuid4()], limit=8, exact=False, model=Chunk))
+    assert "chunks.account_id IN" in sql
+    assert "ORDER BY chunks.embedding <=> " in sql
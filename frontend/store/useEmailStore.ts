@@ -67,7 +67,17 @@ export const useEmailStore = create<EmailState>((set, get) => ({
         toast.info("Syncing with Gmail...");
         set({ isLoading: true });
         try {
-            await api.get('/gmail/sync', { params: { email } });
+            // Sync runs as a background job; poll until it finishes
+            const { data } = await api.get('/gmail/sync', { params: { email } });
+            let job = data;
+            while (job.status === 'queued' || job.status === 'running' || job.status === 'retrying') {
+                await new Promise((resolve) => setTimeout(resolve, 2000));
+                const res = await api.get(`/gmail/sync/jobs/${data.job_id}`);
+                job = res.data;
+            }
+            if (job.status === 'failed') {
+                throw new Error(job.error || 'Sync job failed');
+            }
             toast.success("Sync complete");
             // Refresh list
             await get().fetchEmails(get().selectedCategory);